@@ -0,0 +1,87 @@
+"""
+Benchmark da deduplicação: releitura completa (SHA-256 de todos os PDFs salvos a cada busca)
+contra o índice em duas camadas (``modules/indice_hashes.py``: tamanho e, só na colisão, SHA-256).
+
+Uso: python benchmark_hashes.py [pasta_dos_boletos] [pasta_dos_anexos]
+Padrão: Boletos_Salvos/boletos_baixados como pasta salva e todo o Boletos_Salvos como anexos.
+O índice é criado numa pasta temporária; nenhum arquivo dos boletos é alterado.
+"""
+
+import os
+import sys
+import time
+import hashlib
+import tempfile
+from pathlib import Path
+
+# Add EGS_Suite root to path to allow absolute imports
+current_dir = Path(__file__).parent
+sys.path.append(str(current_dir.parent.parent.parent))
+
+from EGS_Suite.apps.buscador_boletos.modules.indice_hashes import IndiceHashes
+from EGS_Suite.apps.buscador_boletos.modules.utils import hash_fluxo
+
+
+def _cronometrar(funcao):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    return resultado, time.perf_counter() - inicio
+
+
+def _pdfs(pasta):
+    return sorted(str(p) for p in Path(pasta).rglob("*.pdf"))
+
+
+def caminho_antigo(pasta, anexos):
+    """Como ``carregar_hashes_existentes``: SHA-256 de toda a pasta, depois de cada anexo."""
+    salvos = set()
+    for caminho in _pdfs(pasta):
+        with open(caminho, "rb") as f: salvos.add(hash_fluxo(f))
+    return sum(1 for dados in anexos if hashlib.sha256(dados).hexdigest() in salvos)
+
+
+def caminho_novo(indice, anexos):
+    """Como ``buscar_e_salvar_boletos``: reconciliação, índice de mensagens (``conhecidos``) e ``contem``."""
+    hashes = indice.reconciliar()
+    hashes.conhecidos()
+    return sum(1 for dados in anexos if hashes.contem(hashlib.sha256(dados).hexdigest(), len(dados)))
+
+
+def main(argv):
+    base = current_dir / "Boletos_Salvos"
+    pasta = argv[0] if argv else str(base / "boletos_baixados")
+    salvos = set(_pdfs(pasta))
+    caminhos = _pdfs(argv[1] if len(argv) > 1 else base)
+    anexos = [open(p, "rb").read() for p in caminhos]
+    # Anexos que não estão na pasta salva: o caso comum de uma busca (boletos novos)
+    novos = [a for p, a in zip(caminhos, anexos) if p not in salvos]
+    total_mb = sum(len(a) for a in anexos) / 1024 / 1024
+    print(f"Pasta salva: {pasta} ({len(salvos)} PDFs); anexos simulados: {len(anexos)} ({total_mb:.1f} MB), "
+          f"{len(novos)} fora da pasta salva")
+
+    print("\n--- Algoritmos (anexos em memória) ---")
+    for nome, funcao in (("sha256", hashlib.sha256), ("blake2b", hashlib.blake2b), ("blake2s", hashlib.blake2s)):
+        _, duracao = _cronometrar(lambda: [funcao(a).digest() for a in anexos])
+        print(f"{nome:8} {duracao * 1000:8.1f} ms  ({total_mb / max(duracao, 1e-9):.0f} MB/s)")
+
+    for rotulo, lote in (("todos os anexos", anexos), ("só anexos novos", novos)):
+        print(f"\n--- Deduplicação por busca ({rotulo}) ---")
+        duplicatas, duracao = _cronometrar(lambda: caminho_antigo(pasta, lote))
+        print(f"{'releitura completa':34} {duracao * 1000:8.1f} ms  ({duplicatas} duplicatas)")
+        with tempfile.TemporaryDirectory() as tmp:
+            indice = IndiceHashes(caminho=os.path.join(tmp, "indice.sqlite3"), pasta=pasta)
+            for cenario, preparar in (
+                    ("índice: 1ª execução (vazio)", None),
+                    ("índice: sem alterações", None),
+                    # Simula a pasta sincronizada trocando o mtime de todos os arquivos
+                    ("índice: mtime de todos alterado", lambda: indice._conexao.execute(
+                        "UPDATE arquivos SET mtime_ns = mtime_ns + 1") and indice._conexao.commit())):
+                if preparar: preparar()
+                duplicatas, duracao = _cronometrar(lambda: caminho_novo(indice, lote))
+                print(f"{cenario:34} {duracao * 1000:8.1f} ms  ({duplicatas} duplicatas, "
+                      f"{indice.lidos_sob_demanda} PDFs salvos lidos)")
+            indice.fechar()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
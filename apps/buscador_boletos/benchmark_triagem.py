@@ -0,0 +1,114 @@
+"""
+Benchmark e conferência da triagem por metadados (``modules/tabela_mapi.py``) sem Outlook.
+
+Monta uma caixa em memória (``FonteMemoria``) com e-mails de outros remetentes, compromissos,
+e-mails fora do período e sem anexo, e alguns boletos válidos. A mesma pasta é varrida pela
+leitura tabular (``ProvedorTabelaFake``: colunas + ``GetArray`` em blocos de ``TAMANHO_LOTE``)
+e item a item. Confere que a tabela descarta os mesmos e-mails pelos mesmos motivos e só
+abre os candidatos; sai com código 1 se algo divergir. Em memória ler uma propriedade não
+custa nada, então o número que importa é o de itens abertos: no Outlook cada um custa
+várias chamadas COM, enquanto a tabela traz 500 linhas por ``GetArray``.
+
+Uso: python benchmark_triagem.py [quantidade_de_emails]
+Padrão: 20000 e-mails (40 blocos da tabela). Nenhum arquivo é gravado.
+"""
+
+import sys
+import time
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add EGS_Suite root to path to allow absolute imports
+current_dir = Path(__file__).parent
+sys.path.append(str(current_dir.parent.parent.parent))
+
+from EGS_Suite.apps.buscador_boletos.modules.config import DOMINIO_REMETENTE_VALIDO
+from EGS_Suite.apps.buscador_boletos.modules.mail_source import (
+    AnexoEmail, MensagemEmail, PastaMemoria, FonteMemoria, CLASSE_EMAIL)
+from EGS_Suite.apps.buscador_boletos.modules.processamento import novos_motivos, selecionar_anexos, varrer_pasta
+from EGS_Suite.apps.buscador_boletos.modules.tabela_mapi import TAMANHO_LOTE
+
+DT_INICIO = datetime(2025, 11, 1)
+DT_FIM = datetime(2025, 11, 30, 23, 59, 59)
+MOTIVOS_DA_TABELA = ("nao_mail", "fora_periodo", "remetente", "sem_anexo_valido")
+
+
+class PastaItemAItem(PastaMemoria):
+    """A mesma pasta sem leitura tabular: cada item é aberto e filtrado pelas propriedades."""
+
+    def metadados(self, dt_inicio, dt_fim):
+        return None
+
+
+def _pdf_de_exemplo():
+    pdfs = sorted((current_dir / "Boletos_Salvos" / "boletos_baixados").glob("*.pdf"))
+    return pdfs[0].read_bytes() if pdfs else b"%PDF-1.4\n" + b"0" * 50_000
+
+
+def gerar_mensagens(quantidade, semente=7):
+    """E-mails sintéticos e o conjunto de Message-IDs que devem passar pela triagem."""
+    aleatorio = random.Random(semente)
+    pdf = _pdf_de_exemplo()
+    mensagens, validos = [], set()
+    for i in range(quantidade):
+        tipo = aleatorio.choices(("outro_remetente", "compromisso", "fora_periodo", "sem_anexo", "boleto"),
+                                 weights=(80, 5, 5, 5, 5))[0]
+        recebido = DT_INICIO + timedelta(minutes=aleatorio.randrange(30 * 24 * 60))
+        remetente = f"noreply{DOMINIO_REMETENTE_VALIDO}"
+        anexos = [AnexoEmail("boleto.pdf", pdf, mime="application/pdf")]
+        classe = CLASSE_EMAIL
+        if tipo == "outro_remetente":
+            remetente = f"contato{i}@exemplo.com"
+        elif tipo == "compromisso":
+            classe = 26  # olAppointment
+        elif tipo == "fora_periodo":
+            recebido = DT_INICIO - timedelta(days=1 + aleatorio.randrange(60))
+        elif tipo == "sem_anexo":
+            anexos = []
+        message_id = f"<m{i}@benchmark>"
+        if tipo == "boleto":
+            validos.add(message_id)
+        mensagens.append(MensagemEmail(f"ICTUS BANK - Solicitação de pagamento {i}", recebido, remetente,
+                                       "<p>Solicitação de pagamento</p>", anexos, message_id, classe=classe))
+    return mensagens, validos
+
+
+def varrer(pasta):
+    """Varre ``pasta`` como a busca; devolve (motivos, Message-IDs com boleto, itens abertos, segundos)."""
+    motivos, com_boleto, abertos = novos_motivos(), set(), [0]
+
+    def consumir(item):
+        abertos[0] += 1
+        for carga in selecionar_anexos(item, DT_INICIO, DT_FIM, motivos):
+            carga.conteudo.fechar()
+            com_boleto.add(item.message_id)
+        return 0, 0
+
+    inicio = time.perf_counter()
+    varrer_pasta(pasta, DT_INICIO, DT_FIM, motivos, consumir, lambda msg: None, lambda *a: None)
+    return motivos, com_boleto, abertos[0], time.perf_counter() - inicio
+
+
+def main(argv):
+    quantidade = int(argv[0]) if argv else 20000
+    mensagens, validos = gerar_mensagens(quantidade)
+    fonte = FonteMemoria(PastaMemoria("Caixa de Entrada", mensagens))
+    print(f"{quantidade} e-mails em memória ({len(validos)} boletos); tabela em blocos de {TAMANHO_LOTE} linhas")
+
+    tabela = varrer(fonte.pasta_raiz())
+    item_a_item = varrer(PastaItemAItem("Caixa de Entrada", mensagens))
+    for rotulo, (motivos, com_boleto, abertos, duracao) in (("triagem por tabela", tabela), ("item a item", item_a_item)):
+        descartes = ", ".join(f"{m}={motivos[m]}" for m in MOTIVOS_DA_TABELA)
+        print(f"{rotulo:20} {duracao * 1000:8.1f} ms  {abertos:6} itens abertos, {len(com_boleto)} com boleto ({descartes})")
+
+    divergencias = [m for m in MOTIVOS_DA_TABELA if tabela[0][m] != item_a_item[0][m]]
+    if divergencias or tabela[1] != validos or item_a_item[1] != validos or tabela[2] != len(validos):
+        print(f"DIVERGÊNCIA entre a triagem por tabela e a leitura item a item (motivos: {', '.join(divergencias) or '-'})")
+        return 1
+    print("OK: a tabela descartou os mesmos e-mails e só abriu os boletos.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
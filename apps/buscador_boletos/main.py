@@ -1,20 +1,30 @@
 import sys
 from pathlib import Path
-import tkinter as tk
 
 # Add EGS_Suite root to path to allow absolute imports
 current_dir = Path(__file__).parent
 suite_root = current_dir.parent.parent.parent
 sys.path.append(str(suite_root))
 
-from EGS_Suite.apps.buscador_boletos.modules.gui import App
 from EGS_Suite.common.logging import setup_logger
 
 if __name__ == "__main__":
+    # Leitura dos PDFs em processos auxiliares (processos_pdf): necessário no executável congelado
+    import multiprocessing
+    multiprocessing.freeze_support()
+
     # Setup logger with UI callback support (if needed, or just basic)
     # The App class will likely hook into the logger later, for now just setup file logging
     setup_logger('buscador_boletos', queue_callback=None)
-    
+
+    # Com argumentos: modo linha de comando (sem Tk), ex. reprocessar exportações .eml/.mbox
+    if len(sys.argv) > 1:
+        from EGS_Suite.apps.buscador_boletos.modules.cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+
+    import tkinter as tk
+    from EGS_Suite.apps.buscador_boletos.modules.gui import App
+
     root = tk.Tk()
     app = App(root)
     root.mainloop()
@@ -0,0 +1,303 @@
+"""
+Acervo de boletos endereçado pelo conteúdo.
+
+Cada PDF é guardado uma única vez em ``PASTA_ACERVO/objetos/ab/<sha256>.pdf`` (``ab``: dois
+primeiros caracteres do hash), e um catálogo SQLite ao lado indexa os objetos por UC,
+competência (``AAAAMM`` do recebimento do e-mail, o mesmo critério do nome dos arquivos),
+cliente e mensagem de origem (Message-ID e nome do anexo). ``por_uc``, ``por_competencia``,
+``por_cliente`` e ``por_mensagem`` respondem pelos índices, sem listar pastas nem interpretar
+nomes de arquivo.
+
+A pasta ``boletos_baixados`` (``{uc}_{cliente}_{data}.pdf``) continua existindo para quem
+a usa (unificador, conferência manual), mas como vista materializada: cada nome é um
+hardlink para o objeto (``MATERIALIZACAO_ACERVO``; cópia onde o sistema de arquivos não tem
+hardlink), então o mesmo conteúdo com dois nomes não ocupa o disco duas vezes. ``materializar``
+recria a vista ou exporta uma cópia dela (ex.: só uma competência) para outra pasta;
+``importar`` (só pela linha de comando, ``--importar-acervo``) traz para o acervo os boletos
+gravados antes dele.
+"""
+
+import os
+import re
+import shutil
+import sqlite3
+import itertools
+import logging
+import threading
+from datetime import datetime
+
+from .config import PASTA_ACERVO, PASTA_SAIDA_BOLETOS, MATERIALIZACAO_ACERVO
+from .utils import hash_fluxo
+from .indice_hashes import indice_hashes
+from .gravacao_disco import publicar_exclusivo
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS objetos (
+    hash TEXT PRIMARY KEY,
+    tamanho INTEGER NOT NULL,
+    uc TEXT,
+    cliente TEXT,
+    competencia TEXT,       -- AAAAMM do recebimento do e-mail
+    recebido_em TEXT,
+    guardado_em TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS objetos_uc ON objetos (uc, competencia);
+CREATE INDEX IF NOT EXISTS objetos_competencia ON objetos (competencia);
+CREATE INDEX IF NOT EXISTS objetos_cliente ON objetos (cliente);
+CREATE TABLE IF NOT EXISTS origens (
+    hash TEXT NOT NULL,
+    message_id TEXT NOT NULL,
+    anexo TEXT NOT NULL,
+    PRIMARY KEY (hash, message_id, anexo)
+);
+CREATE INDEX IF NOT EXISTS origens_mensagem ON origens (message_id);
+CREATE TABLE IF NOT EXISTS nomes (
+    nome TEXT PRIMARY KEY,  -- nome na vista materializada (boletos_baixados)
+    hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS nomes_hash ON nomes (hash);
+"""
+
+# Nomes gravados pelo buscador: {uc}_{cliente}_{AAAAMMDD}.pdf (atual) ou {uc}.pdf (correção de PDFs antigos)
+_PADRAO_NOME = re.compile(r"^(\d+)(?:_(.*)_(\d{8}))?\.pdf$", re.I)
+
+def metadados_do_nome(nome):
+    """``(uc, cliente, recebido_em)`` de um nome gravado pelo buscador (None onde não houver)."""
+    encontrado = _PADRAO_NOME.match(nome)
+    if not encontrado:
+        return None, None, None
+    uc, cliente, data = encontrado.groups()
+    try:
+        recebido_em = datetime.strptime(data, "%Y%m%d") if data else None
+    except ValueError:
+        recebido_em = None
+    return uc, cliente, recebido_em
+
+
+def _mesmo_conteudo(objeto, destino, hash_conteudo):
+    """``destino`` já é o objeto (hardlink) ou uma cópia dele."""
+    try:
+        if os.path.samefile(objeto, destino):
+            return True
+        with open(destino, "rb") as f:
+            return hash_fluxo(f) == hash_conteudo
+    except OSError:
+        return False
+
+
+class Acervo:
+    """Objetos + catálogo (thread-safe; uma conexão compartilhada sob lock, como ``indice_hashes``)."""
+
+    def __init__(self, pasta=None, pasta_nomes=None, materializacao=None):
+        self.pasta = pasta or PASTA_ACERVO
+        self.pasta_nomes = pasta_nomes or PASTA_SAIDA_BOLETOS
+        self.materializacao = materializacao or MATERIALIZACAO_ACERVO
+        self.caminho = os.path.join(self.pasta, "acervo.sqlite3")
+        self._lock = threading.Lock()
+        self._sem_hardlink = set()  # pastas em que o hardlink falhou: cópia direto
+        os.makedirs(self.pasta, exist_ok=True)
+        self._conexao = sqlite3.connect(self.caminho, check_same_thread=False)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        self._conexao.executescript(_ESQUEMA)
+
+    def caminho_objeto(self, hash_conteudo):
+        return os.path.join(self.pasta, "objetos", hash_conteudo[:2], f"{hash_conteudo}.pdf")
+
+    def __len__(self):
+        with self._lock:
+            return self._conexao.execute("SELECT COUNT(*) FROM objetos").fetchone()[0]
+
+    # ---------------- Entrada ----------------
+    def catalogar(self, hash_conteudo, tamanho, uc=None, cliente=None, recebido_em=None, origem=None):
+        """
+        Registra (ou completa) o objeto ``hash_conteudo``, já gravado em ``caminho_objeto``.
+        ``origem``: ``(message_id, nome_do_anexo)`` do e-mail de onde veio.
+        """
+        competencia = recebido_em.strftime("%Y%m") if recebido_em else None
+        with self._lock, self._conexao:
+            self._conexao.execute(
+                "INSERT INTO objetos VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (hash) DO UPDATE SET "
+                "uc = COALESCE(uc, excluded.uc), cliente = COALESCE(cliente, excluded.cliente), "
+                "competencia = COALESCE(competencia, excluded.competencia), recebido_em = COALESCE(recebido_em, excluded.recebido_em)",
+                (hash_conteudo, tamanho, uc, cliente, competencia, recebido_em.isoformat(timespec="seconds") if recebido_em else None,
+                 datetime.now().isoformat(timespec="seconds")))
+            if origem is not None and origem[0]:
+                self._conexao.execute("INSERT OR IGNORE INTO origens VALUES (?, ?, ?)", (hash_conteudo, origem[0], origem[1] or ""))
+
+    def _ligar(self, objeto, destino, materializacao=None):
+        """Hardlink (ou cópia) de ``objeto`` em ``destino``, que não pode existir. Devolve o modo usado."""
+        pasta = os.path.dirname(destino)
+        if (materializacao or self.materializacao) == "hardlink" and pasta not in self._sem_hardlink:
+            try:
+                os.link(objeto, destino)
+                return "hardlink"
+            except FileExistsError:
+                raise
+            except OSError as e:
+                # FAT/exFAT, alguns compartilhamentos de rede: a vista vira cópia (ocupa disco de novo)
+                self._sem_hardlink.add(pasta)
+                logging.warning(f"Hardlink indisponível em '{pasta}' ({e}); a vista do acervo será materializada com cópias.")
+        tmp = destino + ".parcial"
+        shutil.copyfile(objeto, tmp)
+        try:
+            publicar_exclusivo(tmp, destino)
+        except FileExistsError:
+            os.remove(tmp)
+            raise
+        return "copia"
+
+    def vincular(self, hash_conteudo, nome, uc=None):
+        """
+        Materializa ``nome`` em ``pasta_nomes`` para o objeto e registra no índice de hashes. Um
+        nome já ocupado por outro conteúdo (gravado por fora do acervo) fica intacto e o objeto
+        recebe o próximo livre (``nome_2.pdf``...). Devolve o caminho.
+        """
+        objeto = self.caminho_objeto(hash_conteudo)
+        base, extensao = os.path.splitext(nome)
+        for numero in itertools.count(1):
+            nome_final = nome if numero == 1 else f"{base}_{numero}{extensao}"
+            destino = os.path.join(self.pasta_nomes, nome_final)
+            try:
+                self._ligar(objeto, destino)
+                break
+            except FileExistsError:
+                if _mesmo_conteudo(objeto, destino, hash_conteudo):
+                    break
+        if nome_final != nome:
+            logging.warning(f"'{nome}' já existe com outro conteúdo na vista do acervo; materializado como '{nome_final}'.")
+        with self._lock, self._conexao:
+            self._conexao.execute("INSERT OR REPLACE INTO nomes VALUES (?, ?)", (nome_final, hash_conteudo))
+        indice_hashes().registrar(destino, hash_conteudo, uc)
+        return destino
+
+    def incorporar(self, caminho, hash_conteudo, nome, uc=None, cliente=None, recebido_em=None, origem=None):
+        """
+        Leva um arquivo já em disco (ex.: da pasta de falhas) para o acervo e o materializa como
+        ``nome``: vira o objeto se o conteúdo ainda não estava no acervo, senão é apagado.
+        """
+        objeto = self.caminho_objeto(hash_conteudo)
+        tamanho = os.path.getsize(caminho)
+        if os.path.exists(objeto):
+            os.remove(caminho)
+        else:
+            os.makedirs(os.path.dirname(objeto), exist_ok=True)
+            shutil.move(caminho, objeto)
+        self.catalogar(hash_conteudo, tamanho, uc, cliente, recebido_em, origem)
+        return self.vincular(hash_conteudo, nome, uc)
+
+    def importar(self, pasta=None):
+        """
+        Traz para o acervo os PDFs de ``pasta`` (padrão: a vista) que ainda não estão no catálogo,
+        com UC, cliente e data tirados do nome. O arquivo original vira o objeto por hardlink; uma
+        segunda cópia do mesmo conteúdo é trocada por um hardlink para ele. Devolve ``(importados, duplicatas)``.
+        """
+        pasta = pasta or self.pasta_nomes
+        if not os.path.isdir(pasta):
+            return 0, 0
+        with self._lock:
+            conhecidos = {nome for (nome,) in self._conexao.execute("SELECT nome FROM nomes")}
+        importados, duplicatas = 0, 0
+        for nome in sorted(os.listdir(pasta)):
+            caminho = os.path.join(pasta, nome)
+            if not nome.lower().endswith(".pdf") or nome in conhecidos or not os.path.isfile(caminho):
+                continue
+            try:
+                with open(caminho, "rb") as f:
+                    hash_conteudo = hash_fluxo(f)
+                objeto = self.caminho_objeto(hash_conteudo)
+                uc, cliente, recebido_em = metadados_do_nome(nome)
+                if os.path.exists(objeto):
+                    if not os.path.samefile(objeto, caminho):
+                        duplicatas += 1
+                        tmp = caminho + ".parcial"
+                        if self._ligar(objeto, tmp) == "hardlink":
+                            os.replace(tmp, caminho)
+                        else:
+                            os.remove(tmp)
+                else:
+                    os.makedirs(os.path.dirname(objeto), exist_ok=True)
+                    self._ligar(caminho, objeto)
+                self.catalogar(hash_conteudo, os.path.getsize(caminho), uc, cliente, recebido_em)
+                with self._lock, self._conexao:
+                    self._conexao.execute("INSERT OR REPLACE INTO nomes VALUES (?, ?)", (nome, hash_conteudo))
+                importados += 1
+            except OSError as e:
+                logging.error(f"Erro ao importar '{caminho}' para o acervo: {e}")
+        if importados:
+            logging.info(f"Acervo: {importados} PDFs importados de '{pasta}' ({duplicatas} cópias repetidas trocadas por hardlink).")
+        return importados, duplicatas
+
+    # ---------------- Consultas ----------------
+    def _consultar(self, onde, parametros):
+        with self._lock:
+            linhas = self._conexao.execute(
+                "SELECT hash, tamanho, uc, cliente, competencia, recebido_em FROM objetos WHERE " + onde +
+                " ORDER BY competencia, uc", parametros).fetchall()
+        return [{"hash": h, "tamanho": tamanho, "uc": uc, "cliente": cliente, "competencia": competencia,
+                 "recebido_em": recebido_em, "caminho": self.caminho_objeto(h)}
+                for h, tamanho, uc, cliente, competencia, recebido_em in linhas]
+
+    def por_uc(self, uc, competencia=None):
+        if competencia is None:
+            return self._consultar("uc = ?", (uc,))
+        return self._consultar("uc = ? AND competencia = ?", (uc, competencia))
+
+    def por_competencia(self, competencia):
+        """Boletos recebidos no mês ``AAAAMM``."""
+        return self._consultar("competencia = ?", (competencia,))
+
+    def por_cliente(self, cliente):
+        return self._consultar("cliente = ?", (cliente,))
+
+    def por_mensagem(self, message_id):
+        return self._consultar("hash IN (SELECT hash FROM origens WHERE message_id = ?)", (message_id,))
+
+    # ---------------- Vista materializada ----------------
+    def materializar(self, pasta_destino=None, materializacao=None, competencia=None):
+        """
+        Cria em ``pasta_destino`` (padrão: a própria vista) os nomes ``{uc}_{cliente}_{data}.pdf``
+        que faltarem, por hardlink ou cópia; com ``competencia``, só os desse mês. Devolve ``(criados, existentes)``.
+        """
+        pasta_destino = pasta_destino or self.pasta_nomes
+        os.makedirs(pasta_destino, exist_ok=True)
+        consulta = "SELECT n.nome, n.hash FROM nomes n"
+        parametros = ()
+        if competencia:
+            consulta += " JOIN objetos o ON o.hash = n.hash WHERE o.competencia = ?"
+            parametros = (competencia,)
+        with self._lock:
+            nomes = self._conexao.execute(consulta, parametros).fetchall()
+        criados, existentes = 0, 0
+        for nome, hash_conteudo in nomes:
+            destino = os.path.join(pasta_destino, nome)
+            if os.path.exists(destino):
+                existentes += 1; continue
+            try:
+                self._ligar(self.caminho_objeto(hash_conteudo), destino, materializacao)
+                criados += 1
+            except OSError as e:
+                logging.error(f"Erro ao materializar '{nome}' do acervo: {e}")
+        return criados, existentes
+
+    def resumo(self):
+        with self._lock:
+            objetos, tamanho = self._conexao.execute("SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM objetos").fetchone()
+            nomes = self._conexao.execute("SELECT COUNT(*) FROM nomes").fetchone()[0]
+        return f"Acervo: {objetos} boletos ({tamanho / 1024 / 1024:.1f} MB) e {nomes} nomes na vista materializada."
+
+    def fechar(self):
+        with self._lock:
+            self._conexao.close()
+
+
+_acervo = None
+_lock_acervo = threading.Lock()
+
+
+def acervo():
+    global _acervo
+    with _lock_acervo:
+        if _acervo is None:
+            _acervo = Acervo()
+        return _acervo
@@ -0,0 +1,124 @@
+"""
+Execução sem interface gráfica do buscador de boletos.
+
+Exemplo (reprocessar uma exportação de e-mails no Linux):
+    python -m EGS_Suite.apps.buscador_boletos.main --arquivos /dados/export.mbox --inicio 01/11/2025 --fim 30/11/2025
+
+Várias caixas em paralelo (Outlook):
+    python -m EGS_Suite.apps.buscador_boletos.main --contas atendimento@egsenergia.com.br "Caixa Compartilhada" --inicio 01/11/2025 --fim 30/11/2025
+
+Serviço residente (a GUI passa a usá-lo automaticamente enquanto estiver no ar):
+    python -m EGS_Suite.apps.buscador_boletos.main --servico
+    python -m EGS_Suite.apps.buscador_boletos.main --via-servico --inicio 01/11/2025 --fim 30/11/2025
+    python -m EGS_Suite.apps.buscador_boletos.main --estado-servico
+
+Correção dos PDFs antigos da pasta de falhas (com --simular, só grava o plano em CSV):
+    python -m EGS_Suite.apps.buscador_boletos.main --corrigir-antigos --simular
+
+Acervo (boletos por hash, com catálogo por UC/competência; ACERVO_ATIVO na configuração): importação dos
+boletos já salvos (uma vez, ao ativar), consulta e exportação de um mês para o unificador:
+    python -m EGS_Suite.apps.buscador_boletos.main --importar-acervo
+    python -m EGS_Suite.apps.buscador_boletos.main --consultar-uc 1052027
+    python -m EGS_Suite.apps.buscador_boletos.main --exportar-acervo /dados/unificar/boletos --competencia 202511 --copiar
+"""
+
+import os
+import argparse
+import logging
+
+from .mail_source import FonteArquivos
+from .outlook_service import buscar_e_salvar_boletos, ESTRATEGIA_AUTO, ESTRATEGIA_INDEXADA, ESTRATEGIA_RECURSIVA
+from .marcas import MODO_COMPLETO, MODO_INCREMENTAL
+from .janelas import TAMANHOS_JANELA
+from .servico import ServicoBuscador, ClienteServico, formatar_estado
+from .correcao_pdfs import corrigir_pdfs_antigos
+from .acervo import acervo
+
+
+def _status(msg): print(msg)
+def _progresso(valor, maximo, texto): pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Buscador de Boletos EGS (modo linha de comando)")
+    parser.add_argument("--inicio", help="Data inicial (dd/mm/aaaa)")
+    parser.add_argument("--fim", help="Data final (dd/mm/aaaa)")
+    parser.add_argument("--arquivos", nargs="+",
+                        help="Arquivo(s) .eml/.mbox ou diretório(s) (Maildir/.eml) exportados. Sem esta opção, usa o Outlook.")
+    parser.add_argument("--contas", nargs="+", help="Contas/caixas compartilhadas do Outlook (padrão: CONTAS_OUTLOOK do config)")
+    parser.add_argument("--incremental", action="store_true", help="Lê apenas os e-mails posteriores à última sincronização de cada pasta")
+    parser.add_argument("--estrategia", choices=(ESTRATEGIA_AUTO, ESTRATEGIA_INDEXADA, ESTRATEGIA_RECURSIVA), default=ESTRATEGIA_AUTO,
+                        help="Descoberta dos e-mails: busca indexada na conta, varredura recursiva ou automático")
+    parser.add_argument("--serial", action="store_true", help="Desativa o pipeline paralelo (tudo na thread principal)")
+    parser.add_argument("--janela", choices=TAMANHOS_JANELA,
+                        help="Divide o período em janelas independentes e retomáveis (backfill)")
+    parser.add_argument("--janelas-simultaneas", type=int, default=1, help="Quantas janelas processar ao mesmo tempo")
+    servico = parser.add_argument_group("serviço residente (Outlook e hashes aquecidos entre buscas)")
+    servico.add_argument("--servico", action="store_true", help="Inicia o serviço e fica atendendo buscas até ser encerrado")
+    servico.add_argument("--via-servico", action="store_true", help="Envia a busca ao serviço em execução")
+    servico.add_argument("--estado-servico", action="store_true", help="Mostra o estado do serviço em execução")
+    servico.add_argument("--encerrar-servico", action="store_true", help="Encerra o serviço em execução")
+    correcao = parser.add_argument_group("correção dos PDFs antigos da pasta de falhas")
+    correcao.add_argument("--corrigir-antigos", action="store_true", help="Renomeia pela UC os PDFs de boletos_sem_uc")
+    correcao.add_argument("--simular", action="store_true", help="Só grava o plano (movidos/removidos) em CSV na pasta de logs")
+    grupo_acervo = parser.add_argument_group("acervo de boletos (endereçado pelo conteúdo)")
+    grupo_acervo.add_argument("--importar-acervo", action="store_true", help="Incorpora ao acervo os PDFs de boletos_baixados fora do catálogo")
+    grupo_acervo.add_argument("--consultar-uc", metavar="UC", help="Lista os boletos da UC no acervo")
+    grupo_acervo.add_argument("--exportar-acervo", metavar="PASTA",
+                              help="Materializa os nomes {uc}_{cliente}_{data}.pdf do acervo em PASTA (hardlinks)")
+    grupo_acervo.add_argument("--competencia", metavar="AAAAMM", help="Com --consultar-uc/--exportar-acervo: só este mês")
+    grupo_acervo.add_argument("--copiar", action="store_true", help="Com --exportar-acervo: cópias em vez de hardlinks")
+    args = parser.parse_args(argv)
+
+    if args.servico:
+        ServicoBuscador().executar()
+        return 0
+    if args.importar_acervo or args.consultar_uc or args.exportar_acervo:
+        if args.importar_acervo:
+            importados, duplicatas = acervo().importar()
+            print(f"{importados} PDFs incorporados ao acervo ({duplicatas} cópias repetidas trocadas por hardlink).")
+        if args.consultar_uc:
+            for boleto in acervo().por_uc(args.consultar_uc, args.competencia):
+                print(f"{boleto['competencia'] or '------'}  {boleto['cliente'] or '-'}  {boleto['caminho']}")
+        if args.exportar_acervo:
+            criados, existentes = acervo().materializar(args.exportar_acervo, "copia" if args.copiar else None, args.competencia)
+            print(f"{criados} boletos exportados para '{args.exportar_acervo}' ({existentes} já estavam lá).")
+        print(acervo().resumo())
+        return 0
+    if args.corrigir_antigos:
+        print(corrigir_pdfs_antigos(simular=args.simular))
+        return 0
+    if args.estado_servico or args.encerrar_servico:
+        cliente = ClienteServico()
+        if not cliente.disponivel():
+            print("Serviço residente não está em execução.")
+            return 1
+        if args.estado_servico: print(formatar_estado(cliente.estado()))
+        if args.encerrar_servico: cliente.encerrar(); print("Serviço residente encerrado.")
+        return 0
+    if not args.inicio or not args.fim:
+        parser.error("--inicio e --fim são obrigatórios para uma busca")
+
+    resultado = {}
+
+    def _fim(sucesso, falha, erro=False):
+        resultado.update(sucesso=sucesso, falha=falha, erro=erro)
+        print(f"\n--- FIM DA BUSCA ---\nBoletos com UC identificada: {sucesso}\nBoletos sem UC (para análise): {falha}")
+
+    modo = MODO_INCREMENTAL if args.incremental else MODO_COMPLETO
+    opcoes = dict(modo=modo, estrategia=args.estrategia, paralelo=not args.serial, janela=args.janela,
+                  janelas_simultaneas=args.janelas_simultaneas, contas=args.contas)
+    if args.via_servico:
+        cliente = ClienteServico()
+        if not cliente.disponivel():
+            print("Serviço residente não está em execução (inicie com --servico).")
+            return 1
+        arquivos = [os.path.abspath(caminho) for caminho in args.arquivos] if args.arquivos else None
+        cliente.buscar(args.inicio, args.fim, _status, _progresso, _fim, arquivos=arquivos, **opcoes)
+    else:
+        fonte = [FonteArquivos(caminho) for caminho in args.arquivos] if args.arquivos else None
+        buscar_e_salvar_boletos(args.inicio, args.fim, _status, _progresso, _fim, fonte=fonte, **opcoes)
+    if resultado.get("erro"):
+        logging.error("Busca finalizada com erro. Veja o log.")
+        return 1
+    return 0
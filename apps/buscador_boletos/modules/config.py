@@ -3,6 +3,8 @@ import os
 # ---------------- Configurações de Busca ----------------
 # ---------------- Configurações de Busca ----------------
 NOME_CONTA_OUTLOOK = "atendimento@egsenergia.com.br"
+# Caixas pesquisadas (contas ou caixas compartilhadas, pelo nome exibido no Outlook); buscadas em paralelo
+CONTAS_OUTLOOK = [NOME_CONTA_OUTLOOK]
 
 # Define a pasta base relativa ao diretório raiz do projeto (onde está o script principal)
 # O arquivo config.py está em /modules/config.py, então subimos um nível para chegar na raiz
@@ -11,10 +13,81 @@ PASTA_SAIDA_BASE = os.path.join(PROJETO_ROOT, "Boletos_Salvos")
 PASTA_LOGS = os.path.join(PROJETO_ROOT, "logs")
 PASTA_SAIDA_BOLETOS = os.path.join(PASTA_SAIDA_BASE, "boletos_baixados")
 PASTA_SAIDA_FALHAS = os.path.join(PASTA_SAIDA_BASE, "boletos_sem_uc")
+# Acervo endereçado pelo conteúdo (objetos/<sha256>.pdf + catálogo por UC, competência, cliente e mensagem);
+# boletos_baixados passa a ser a vista materializada dele. Opcional: antes de ativar, rode --importar-acervo
+# uma vez para trazer os boletos já salvos. False: boletos gravados direto em boletos_baixados
+ACERVO_ATIVO = False
+PASTA_ACERVO = os.path.join(PASTA_SAIDA_BASE, "acervo")
+MATERIALIZACAO_ACERVO = "hardlink"  # ou "copia" (sem hardlink no sistema de arquivos, a cópia é automática)
 SENHAS_COMUNS = ["", "123456", "000000", "pinbank"] 
+PROFUNDIDADE_MAXIMA_ZIP = 3  # níveis de .zip dentro de .zip abertos na busca de boletos
+
+# --- Estado persistido entre execuções (marcas de sincronização, índices) ---
+PASTA_CACHE = os.path.join(PROJETO_ROOT, "cache")
+ARQUIVO_MARCAS = os.path.join(PASTA_CACHE, "marcas_pastas.json")
+ARQUIVO_JANELAS = os.path.join(PASTA_CACHE, "janelas_pendentes.json")
+ARQUIVO_PERFIS = os.path.join(PASTA_CACHE, "perfis_pastas.json")
+ARQUIVO_INDICE_MENSAGENS = os.path.join(PASTA_CACHE, "indice_mensagens.bin")
+ARQUIVO_INDICE_HASHES = os.path.join(PASTA_CACHE, "indice_hashes.sqlite3")
+ARQUIVO_CHAVE_SERVICO = os.path.join(PASTA_CACHE, "servico.chave")
+ARQUIVO_SENHAS_PDF = os.path.join(PASTA_CACHE, "senhas_pdf.json")
+PASTA_CACHE_OCR = os.path.join(PASTA_CACHE, "ocr")  # texto do OCR por SHA-256 do PDF
+ARQUIVO_VEREDITOS_CORRECAO = os.path.join(PASTA_CACHE, "vereditos_correcao.json")
 
 # --- CRITÉRIOS DE BUSCA ---
 DOMINIO_REMETENTE_VALIDO = "@pinbank.com.br"
+# Palavra buscada no assunto/corpo pelo próprio Outlook (ci_phrasematch). None desativa.
+PALAVRA_CHAVE_DASL = "pagamento"
+
+# --- Estratégia de descoberta dos e-mails ---
+# "auto": busca indexada na conta inteira (AdvancedSearch), com a varredura recursiva como fallback
+# "indexada" / "recursiva": força uma das estratégias
+ESTRATEGIA_BUSCA = "auto"
+TIMEOUT_BUSCA_INDEXADA = 120  # segundos
+
+# --- Pipeline paralelo: produtores COM -> trabalhadores de PDF -> gravador ---
+PIPELINE_PARALELO = True
+PRODUTORES_COM = 1        # >1: cada produtor abre sua própria sessão do Outlook (resultado pode variar na ordem)
+TRABALHADORES_PDF = 4
+TAMANHO_FILA_PIPELINE = 32
+# Processos dedicados à leitura dos PDFs (fora do GIL). None: núcleos - 1 (até 8); 0: na própria thread
+PROCESSOS_PDF = None
+
+# --- Cache de perfis das pastas: pula pastas inalteradas ou que nunca renderam boleto ---
+DIAS_VARREDURA_COMPLETA_PASTAS = 7      # a cada N dias uma execução lê todas as pastas
+EXECUCOES_SEM_BOLETO_PARA_PULAR = 3     # leituras sem nenhum boleto antes de a pasta passar a ser pulada
+
+# --- Serviço residente (sessão do Outlook e hashes aquecidos entre buscas) ---
+HOST_SERVICO = "127.0.0.1"
+PORTA_SERVICO = 47831
+
+# --- Pré-filtro de anexos: metadados (tamanho, tipo MIME, Content-ID) conferidos antes de baixar ---
+# Faixa de tamanho aceita por extensão (bytes). Abaixo do mínimo o anexo é rejeitado; acima do
+# máximo é adiado (só é baixado se o e-mail não tiver outro boleto)
+LIMITES_TAMANHO_ANEXO = {".pdf": (1024, 1024 * 1024), ".zip": (100, 50 * 1024 * 1024)}
+MIME_ANEXO_REJEITADOS = ("image/", "text/", "audio/", "video/")  # prefixos de tipos que nunca são boleto
+
+# --- Anexos: acima deste tamanho o conteúdo vai para arquivo temporário em vez de ficar na memória ---
+LIMITE_ANEXO_EM_MEMORIA = 1024 * 1024  # bytes
+
+# --- Gravação dos boletos em segundo plano: temporário + fsync + renomeação atômica ---
+TAMANHO_FILA_GRAVACAO = 64  # anexos aguardando o disco; com a fila cheia, quem grava espera
+LOTE_GRAVACAO = 16          # arquivos por lote: escritos, sincronizados numa passada e renomeados juntos
+ESPERA_LOTE_GRAVACAO = 0.2  # segundos esperando mais anexos antes de gravar um lote incompleto
+FSYNC_GRAVACAO = True       # False: mais rápido em pastas de rede, mas uma queda pode perder os últimos boletos
+
+# --- OCR em segundo plano dos boletos escaneados (PDF só com imagem); requer pdf2image e pytesseract ---
+OCR_ATIVO = True
+TRABALHADORES_OCR = 2
+DPIS_OCR = (150, 300)      # resolução crescente: a maior só é usada se a UC não aparecer na menor
+RECORTE_OCR = 0.5          # fração superior da 1ª página lida antes da página inteira (onde ficam UC e pagador)
+IDIOMA_OCR = "por"
+CAMINHO_TESSERACT = None   # ex.: r"C:\Program Files\Tesseract-OCR\tesseract.exe"; None: o do PATH
+CAMINHO_POPPLER = None     # pasta bin do Poppler (pdf2image); None: a do PATH
+
+# --- Backfills: divisão do período em janelas independentes e retomáveis ---
+JANELA_BUSCA = None       # None (período inteiro de uma vez), "dia", "semana" ou "mes"
+JANELAS_SIMULTANEAS = 1   # >1: cada janela em andamento usa sua própria sessão do Outlook
 
 # --- MELHORIA: Lista de pastas a serem ignoradas na busca recursiva ---
 PASTAS_BANIDAS = {
@@ -0,0 +1,142 @@
+"""
+Conteúdo de anexos sem cópias inteiras na memória.
+
+``ConteudoAnexo`` mantém o anexo em memória até ``LIMITE_ANEXO_EM_MEMORIA`` bytes e, acima
+disso, em arquivo temporário (apagado em ``fechar``; ``caminho`` permite que outro processo
+o leia direto do disco). Hash, leitura do PDF e gravação usam a mesma visão de arquivo
+(``abrir``), sem ``BytesIO`` intermediários, então a memória ocupada não cresce com o
+tamanho dos anexos. ``pico_memoria`` informa o maior volume de
+anexos mantidos em memória ao mesmo tempo desde ``reiniciar_pico``.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+from io import BytesIO
+
+from .config import LIMITE_ANEXO_EM_MEMORIA
+from .utils import hash_fluxo
+
+TAMANHO_BLOCO = 256 * 1024
+
+_lock = threading.Lock()
+_em_memoria = 0
+_pico = 0
+_em_disco = 0  # anexos que passaram por arquivo temporário desde reiniciar_pico
+
+
+def _contabilizar(bytes_em_memoria, em_disco=0):
+    global _em_memoria, _pico, _em_disco
+    with _lock:
+        _em_memoria += bytes_em_memoria
+        _pico = max(_pico, _em_memoria)
+        _em_disco += em_disco
+
+
+def _arquivo_temporario():
+    fd, caminho = tempfile.mkstemp(prefix="boleto_", suffix=".tmp")
+    return os.fdopen(fd, "w+b"), caminho
+
+
+def reiniciar_pico():
+    global _pico, _em_disco
+    with _lock:
+        _pico, _em_disco = _em_memoria, 0
+
+
+def pico_memoria():
+    return _pico
+
+
+def anexos_em_disco():
+    return _em_disco
+
+
+class ConteudoAnexo:
+    """Bytes de um anexo em memória ou em arquivo temporário. Use ``with`` ou ``fechar()``."""
+
+    def __init__(self, fluxo, tamanho, em_memoria, caminho_temporario=None, apagar=True):
+        self._fluxo = fluxo
+        self.tamanho = tamanho
+        self.em_memoria = em_memoria
+        self._caminho_temporario = caminho_temporario
+        self._apagar = apagar
+        self._fechado = False
+        _contabilizar(tamanho if em_memoria else 0, 0 if em_memoria else 1)
+
+    @classmethod
+    def de_bytes(cls, dados, limite=None):
+        limite = LIMITE_ANEXO_EM_MEMORIA if limite is None else limite
+        if len(dados) <= limite:
+            return cls(BytesIO(dados), len(dados), True)
+        arquivo, caminho = _arquivo_temporario()
+        arquivo.write(dados); arquivo.flush()
+        return cls(arquivo, len(dados), False, caminho_temporario=caminho)
+
+    @classmethod
+    def de_fluxo(cls, origem, limite=None):
+        """Copia ``origem`` em blocos; passa para arquivo temporário ao atingir o limite."""
+        limite = LIMITE_ANEXO_EM_MEMORIA if limite is None else limite
+        destino, em_memoria, tamanho, caminho = BytesIO(), True, 0, None
+        try:
+            for bloco in iter(lambda: origem.read(TAMANHO_BLOCO), b""):
+                if em_memoria and tamanho + len(bloco) > limite:
+                    arquivo, caminho = _arquivo_temporario()
+                    arquivo.write(destino.getbuffer())
+                    destino, em_memoria = arquivo, False
+                destino.write(bloco)
+                tamanho += len(bloco)
+        except BaseException:
+            # Ex.: senha errada num zip só detectada no CRC, ao fim da leitura
+            destino.close()
+            if caminho: os.remove(caminho)
+            raise
+        destino.flush()
+        return cls(destino, tamanho, em_memoria, caminho_temporario=caminho)
+
+    @classmethod
+    def de_arquivo_temporario(cls, caminho):
+        """Arquivo já gravado em disco (ex.: ``Attachment.SaveAsFile``); é apagado em ``fechar``."""
+        return cls(open(caminho, "rb"), os.path.getsize(caminho), False, caminho_temporario=caminho)
+
+    @classmethod
+    def de_arquivo(cls, caminho):
+        """Arquivo que já existe e continua existindo (ex.: em ``boletos_sem_uc``); não é apagado em ``fechar``."""
+        return cls(open(caminho, "rb"), os.path.getsize(caminho), False, caminho_temporario=caminho, apagar=False)
+
+    @property
+    def caminho(self):
+        """Caminho do arquivo em disco (None se o conteúdo está em memória)."""
+        return self._caminho_temporario
+
+    def abrir(self):
+        """Visão de arquivo posicionada no início (a mesma a cada chamada: não usar em duas threads ao mesmo tempo)."""
+        self._fluxo.seek(0)
+        return self._fluxo
+
+    def ler(self):
+        return self.abrir().read()
+
+    def hash(self):
+        return hash_fluxo(self.abrir())
+
+    def copiar_para(self, destino):
+        shutil.copyfileobj(self.abrir(), destino, TAMANHO_BLOCO)
+
+    def fechar(self):
+        if self._fechado:
+            return
+        self._fechado = True
+        self._fluxo.close()
+        if self.em_memoria:
+            _contabilizar(-self.tamanho)
+        if self._caminho_temporario and self._apagar:
+            try: os.remove(self._caminho_temporario)
+            except OSError: pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
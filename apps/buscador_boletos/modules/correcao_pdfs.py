@@ -0,0 +1,214 @@
+"""
+Correção dos PDFs antigos da pasta de falhas (``boletos_sem_uc``).
+
+Os arquivos são analisados em paralelo (threads que entregam a leitura ao ``processos_pdf``)
+e as ações (mover para ``{uc}.pdf`` ou remover a duplicata) são aplicadas uma a uma, na
+ordem em que as análises terminam. O veredito de cada conteúdo fica em
+``ARQUIVO_VEREDITOS_CORRECAO`` pelo SHA-256 e pela ``versao_extrator``: numa nova correção,
+arquivos que não mudaram (mesmo tamanho e mtime) nem são relidos, e os que continuam sem UC
+são pulados até o extrator (padrões de UC ou ``SENHAS_COMUNS``) mudar. Com ``simular=True``
+nada é movido nem removido e nenhum estado é gravado (índice de hashes, vereditos, senhas
+aprendidas); o plano vai para um CSV em ``PASTA_LOGS``.
+"""
+
+import os
+import csv
+import json
+import time
+import shutil
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from EGS_Suite.common.logging import get_logger
+from .config import PASTA_LOGS, PASTA_SAIDA_BOLETOS, PASTA_SAIDA_FALHAS, ARQUIVO_VEREDITOS_CORRECAO, ACERVO_ATIVO
+from .utils import hash_fluxo
+from .conteudo import ConteudoAnexo
+from .pdf_processor import versao_extrator
+from .processos_pdf import analisador_pdf
+from .senhas_pdf import registro_senhas
+from .indice_hashes import IndiceHashes, indice_hashes
+from .acervo import acervo
+
+logger = get_logger('buscador_boletos')
+
+_COLUNAS_PLANO = ("arquivo", "acao", "destino", "uc", "motivo")
+
+
+class VereditosCorrecao:
+    """
+    ``{"arquivos": {caminho: [tamanho, mtime_ns, hash]}, "vereditos": {hash: {versao, uc, legivel, somente_imagem}}}``
+    em JSON (thread-safe): o hash evita reler arquivos inalterados e o veredito, reanalisá-los.
+    """
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or ARQUIVO_VEREDITOS_CORRECAO
+        self._lock = threading.Lock()
+        self._dados = {"arquivos": {}, "vereditos": {}}
+        if os.path.exists(self.caminho):
+            try:
+                with open(self.caminho, "r", encoding="utf-8") as f:
+                    self._dados = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Vereditos da correção ilegíveis em '{self.caminho}' ({e}). Iniciando do zero.")
+
+    def hash_salvo(self, caminho, st):
+        """SHA-256 já calculado para ``caminho`` se tamanho e mtime não mudaram (senão None)."""
+        with self._lock:
+            anterior = self._dados["arquivos"].get(os.path.abspath(caminho))
+        if anterior and anterior[:2] == [st.st_size, st.st_mtime_ns]:
+            return anterior[2]
+        return None
+
+    def veredito(self, hash_conteudo, versao):
+        with self._lock:
+            veredito = self._dados["vereditos"].get(hash_conteudo)
+        return veredito if veredito and veredito["versao"] == versao else None
+
+    def registrar(self, caminho, st, hash_conteudo, veredito=None):
+        with self._lock:
+            self._dados["arquivos"][os.path.abspath(caminho)] = [st.st_size, st.st_mtime_ns, hash_conteudo]
+            if veredito is not None:
+                self._dados["vereditos"][hash_conteudo] = veredito
+
+    def podar(self, caminhos):
+        """Mantém só os arquivos em ``caminhos`` (ainda na pasta de falhas) e os vereditos deles."""
+        with self._lock:
+            caminhos = {os.path.abspath(c) for c in caminhos}
+            arquivos = {c: v for c, v in self._dados["arquivos"].items() if c in caminhos}
+            hashes = {v[2] for v in arquivos.values()}
+            self._dados = {"arquivos": arquivos,
+                           "vereditos": {h: v for h, v in self._dados["vereditos"].items() if h in hashes}}
+
+    def salvar(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+            tmp = self.caminho + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._dados, f, ensure_ascii=False)
+            os.replace(tmp, self.caminho)
+
+
+def _analisar_arquivo(caminho, vereditos, versao, simular=False):
+    """Roda nas threads da correção: devolve ``(hash, veredito, do_cache)``."""
+    st = os.stat(caminho)
+    hash_pdf = vereditos.hash_salvo(caminho, st)
+    if hash_pdf is None:
+        with open(caminho, "rb") as f:
+            hash_pdf = hash_fluxo(f)
+    veredito = vereditos.veredito(hash_pdf, versao)
+    if veredito is not None:
+        vereditos.registrar(caminho, st, hash_pdf)
+        return hash_pdf, veredito, True
+    with ConteudoAnexo.de_arquivo(caminho) as conteudo:
+        resultado = analisador_pdf().analisar(conteudo, hash_pdf, aprender=not simular)
+    veredito = {"versao": versao, "uc": resultado["uc"], "legivel": resultado["legivel"],
+                "somente_imagem": resultado["somente_imagem"]}
+    vereditos.registrar(caminho, st, hash_pdf, veredito)
+    return hash_pdf, veredito, False
+
+
+def _motivo_sem_uc(veredito):
+    if veredito["somente_imagem"]:
+        return "PDF escaneado (sem texto)"
+    if not veredito["legivel"]:
+        return "PDF ilegível ou sem senha conhecida"
+    return "UC não encontrada no texto"
+
+
+def _gravar_plano(plano):
+    os.makedirs(PASTA_LOGS, exist_ok=True)
+    caminho = os.path.join(PASTA_LOGS, f"correcao_planejada_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    with open(caminho, "w", newline="", encoding="utf-8-sig") as f:
+        escritor = csv.writer(f, delimiter=";")
+        escritor.writerow(_COLUNAS_PLANO)
+        escritor.writerows(sorted(plano))
+    return caminho
+
+
+def corrigir_pdfs_antigos(pasta_origem=PASTA_SAIDA_FALHAS, pasta_destino=PASTA_SAIDA_BOLETOS, simular=False):
+    if not os.path.exists(pasta_origem):
+        return "Pasta de origem 'boletos_sem_uc' não encontrada."
+    if not simular:
+        os.makedirs(pasta_destino, exist_ok=True)
+
+    inicio = time.perf_counter()
+    versao = versao_extrator()
+    vereditos = VereditosCorrecao()
+    caminhos = sorted(os.path.join(pasta_origem, nome) for nome in os.listdir(pasta_origem)
+                      if nome.lower().endswith(".pdf"))
+    total, ok, fail, ja_existia, pulados = len(caminhos), 0, 0, 0, 0
+    plano, destinos, restantes = [], set(), []
+    # Simulação: índice da pasta só em memória (lê apenas os PDFs de mesmo tamanho), o persistido fica intacto
+    indice = IndiceHashes(":memory:", PASTA_SAIDA_BOLETOS) if simular else indice_hashes()
+    # Conteúdo já salvo com outro nome também é duplicata (só quando o destino é a pasta do índice)
+    hashes_salvos = indice.reconciliar() if os.path.abspath(pasta_destino) == os.path.abspath(indice.pasta) else None
+    # Destino é a vista do acervo: o PDF vira objeto do acervo e o nome, hardlink para ele
+    na_vista_do_acervo = not simular and ACERVO_ATIVO and os.path.abspath(pasta_destino) == os.path.abspath(acervo().pasta_nomes)
+
+    trabalhadores = max(1, analisador_pdf().processos)
+    with ThreadPoolExecutor(trabalhadores, thread_name_prefix="boletos-correcao") as executor:
+        futuros = {executor.submit(_analisar_arquivo, caminho, vereditos, versao, simular): caminho for caminho in caminhos}
+        for futuro in as_completed(futuros):
+            caminho = futuros[futuro]
+            nome = os.path.basename(caminho)
+            try:
+                hash_pdf, veredito, do_cache = futuro.result()
+                uc = veredito["uc"]
+                if not uc:
+                    fail += 1
+                    pulados += do_cache
+                    restantes.append(caminho)
+                    motivo = _motivo_sem_uc(veredito) + (" (veredito anterior)" if do_cache else "")
+                    plano.append((nome, "manter", "", "", motivo))
+                    if not do_cache:
+                        logger.warning(f"[corrigir] Sem UC em '{nome}'. Arquivo mantido na pasta de falhas.")
+                    continue
+                novo_nome = f"{uc}.pdf"
+                destino = os.path.join(pasta_destino, novo_nome)
+                mesmo_conteudo = hashes_salvos is not None and hashes_salvos.contem(hash_pdf, os.path.getsize(caminho))
+                if destino in destinos or os.path.exists(destino) or mesmo_conteudo:
+                    ja_existia += 1
+                    motivo = "conteúdo já salvo" if mesmo_conteudo else "destino já existe"
+                    plano.append((nome, "remover_duplicata", novo_nome, uc, motivo))
+                    if not simular:
+                        os.remove(caminho)
+                        logger.warning(f"[corrigir] {motivo.capitalize()} ('{novo_nome}'). Duplicata '{nome}' removida.")
+                else:
+                    ok += 1
+                    destinos.add(destino)
+                    plano.append((nome, "mover", novo_nome, uc, ""))
+                    if not simular:
+                        if na_vista_do_acervo:
+                            acervo().incorporar(caminho, hash_pdf, novo_nome, uc)
+                        else:
+                            shutil.move(caminho, destino)
+                            indice.registrar(destino, hash_pdf, uc)
+                        logger.info(f"[corrigir] Movido: {nome} -> {novo_nome}")
+                if simular:
+                    restantes.append(caminho)
+            except Exception as e:
+                fail += 1
+                restantes.append(caminho)
+                plano.append((nome, "erro", "", "", str(e)))
+                logger.error(f"[corrigir] Erro em '{nome}': {e}")
+
+    if not simular:
+        vereditos.podar(restantes)
+        try:
+            vereditos.salvar()
+            registro_senhas().salvar()
+        except OSError as e:
+            logger.warning(f"[corrigir] Não foi possível gravar os vereditos/senhas aprendidas: {e}")
+
+    resumo = (f"Total de arquivos verificados: {total}\n"
+              f"✅ Renomeados com sucesso: {ok}\n"
+              f"⚠️ Duplicatas encontradas (removidas): {ja_existia}\n"
+              f"❌ Falhas na extração (permanecem na pasta): {fail}\n"
+              f"⏭️ Sem UC em correção anterior, pulados sem reler: {pulados}\n"
+              f"⏱️ Tempo: {time.perf_counter() - inicio:.1f}s ({trabalhadores} em paralelo)")
+    if simular:
+        resumo = ("SIMULAÇÃO: nenhum arquivo foi movido ou removido.\n" + resumo +
+                  f"\n📄 Plano gravado em: {_gravar_plano(plano)}")
+    return resumo
@@ -0,0 +1,72 @@
+"""
+Expansão de anexos .zip que trazem vários boletos.
+
+Percorre todos os membros ``boleto*.pdf`` (não só o primeiro), inclusive os de zips dentro
+do zip até ``PROFUNDIDADE_MAXIMA_ZIP`` níveis. Membros protegidos são abertos tentando as
+``SENHAS_COMUNS`` (ZipCrypto); a senha que funcionou passa a ser a primeira tentada nos
+membros seguintes do mesmo anexo.
+"""
+
+import zlib
+import logging
+import zipfile
+
+from .config import SENHAS_COMUNS, PROFUNDIDADE_MAXIMA_ZIP
+from .conteudo import ConteudoAnexo
+
+
+def eh_boleto_pdf(nome):
+    nome = str(nome or "").replace("\\", "/").rsplit("/", 1)[-1].lower()
+    return nome.startswith("boleto") and nome.endswith(".pdf")
+
+
+def _abrir_membro(zf, info, senhas):
+    """``ConteudoAnexo`` do membro; None se estiver protegido e nenhuma senha abrir."""
+    if not info.flag_bits & 0x1:
+        with zf.open(info) as membro:
+            return ConteudoAnexo.de_fluxo(membro)
+    for senha in [s for s in senhas if s]:
+        try:
+            # Senha errada pode passar na checagem do cabeçalho e só falhar no CRC ao fim da leitura
+            with zf.open(info, pwd=senha.encode("utf-8")) as membro:
+                conteudo = ConteudoAnexo.de_fluxo(membro)
+        except (RuntimeError, zipfile.BadZipFile, zlib.error):
+            continue
+        senhas.remove(senha); senhas.insert(0, senha)
+        return conteudo
+    return None
+
+
+def expandir_zip(conteudo, nome_zip, email_id, profundidade=0, senhas=None):
+    """
+    Gera ``(caminho_do_membro, ConteudoAnexo)`` para cada boleto*.pdf de ``conteudo`` (um
+    ``conteudo.ConteudoAnexo`` com o .zip) e dos zips internos. Quem recebe fecha cada membro.
+    """
+    senhas = list(SENHAS_COMUNS) if senhas is None else senhas
+    try:
+        with zipfile.ZipFile(conteudo.abrir()) as zf:
+            for info in zf.infolist():
+                if info.is_dir():
+                    continue
+                caminho = f"{nome_zip}/{info.filename}"
+                eh_zip = info.filename.lower().endswith(".zip")
+                if not (eh_zip or eh_boleto_pdf(info.filename)):
+                    continue
+                if eh_zip and profundidade >= PROFUNDIDADE_MAXIMA_ZIP:
+                    logging.warning(f"ZIP '{caminho}' ignorado: mais de {PROFUNDIDADE_MAXIMA_ZIP} níveis de zips aninhados ({email_id}).")
+                    continue
+                try:
+                    membro = _abrir_membro(zf, info, senhas)
+                except (NotImplementedError, zipfile.BadZipFile, zlib.error) as e:
+                    logging.warning(f"Membro '{caminho}' ilegível no e-mail {email_id}: {e}")
+                    continue
+                if membro is None:
+                    logging.warning(f"Membro '{caminho}' protegido por senha desconhecida no e-mail {email_id}.")
+                    continue
+                if not eh_zip:
+                    yield caminho, membro
+                    continue
+                with membro:
+                    yield from expandir_zip(membro, caminho, email_id, profundidade + 1, senhas)
+    except (zipfile.BadZipFile, RuntimeError) as e:
+        logging.warning(f"ZIP inválido/protegido '{nome_zip}' no e-mail {email_id}: {e}")
@@ -0,0 +1,146 @@
+"""
+OCR em segundo plano dos boletos escaneados.
+
+PDFs que ``BoletoPdf.somente_imagem`` reconhece como escaneados vão para a pasta de falhas
+como antes e entram nesta fila; a busca não espera o OCR. Cada PDF é lido com
+pdf2image + pytesseract (o mesmo caminho de ``unificador_pdf/diagnostico.py``) em passadas
+crescentes: recorte superior da 1ª página (``RECORTE_OCR``) e página inteira em cada
+resolução de ``DPIS_OCR``, parando na primeira que trouxer a UC; por fim, todas as páginas
+na maior resolução. O texto fica em ``PASTA_CACHE_OCR`` pelo SHA-256 do PDF, então o mesmo
+boleto nunca passa duas vezes pelo OCR. Sem as bibliotecas, a fila fica desativada.
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from pdf2image import convert_from_path
+    import pytesseract
+except ImportError:  # OCR opcional: os escaneados só ficam na pasta de falhas
+    convert_from_path = pytesseract = None
+
+from .config import (OCR_ATIVO, TRABALHADORES_OCR, DPIS_OCR, RECORTE_OCR, IDIOMA_OCR, CAMINHO_TESSERACT,
+                     CAMINHO_POPPLER, PASTA_CACHE_OCR)
+from .pdf_processor import extrair_uc_do_texto
+
+
+def _ocr(imagem, recorte=1.0):
+    if recorte < 1.0:
+        largura, altura = imagem.size
+        imagem = imagem.crop((0, 0, largura, int(altura * recorte)))
+    return pytesseract.image_to_string(imagem, lang=IDIOMA_OCR)
+
+
+def _converter(caminho, dpi, senha=None, primeira=1, ultima=1):
+    return convert_from_path(caminho, dpi=dpi, userpw=senha or None, poppler_path=CAMINHO_POPPLER,
+                             first_page=primeira, last_page=ultima)
+
+
+def texto_por_ocr(caminho, senha=None):
+    """Texto do PDF em ``caminho`` pelas passadas de recorte/resolução descritas no módulo."""
+    if CAMINHO_TESSERACT:
+        pytesseract.pytesseract.tesseract_cmd = CAMINHO_TESSERACT
+    texto = ""
+    for dpi in sorted(DPIS_OCR):
+        imagem = _converter(caminho, dpi, senha)[0]
+        for recorte in ((RECORTE_OCR, 1.0) if RECORTE_OCR < 1.0 else (1.0,)):
+            texto = _ocr(imagem, recorte)
+            if extrair_uc_do_texto(texto):
+                logging.info(f"OCR achou a UC a {dpi} DPI (recorte {recorte:.0%}).")
+                return texto
+    # Sem UC na 1ª página: demais páginas (se houver) na maior resolução
+    demais = _converter(caminho, max(DPIS_OCR), senha, primeira=2, ultima=None)
+    return "\n".join([texto] + [_ocr(p) for p in demais])
+
+
+class FilaOcr:
+    """Trabalhadores de OCR (threads: o trabalho pesado é do Poppler e do Tesseract, em outros processos)."""
+
+    def __init__(self, trabalhadores=None, pasta_cache=None):
+        self.trabalhadores = trabalhadores or TRABALHADORES_OCR
+        self.pasta_cache = pasta_cache or PASTA_CACHE_OCR
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pendentes = 0  # não zera com as estatísticas: o OCR de uma busca pode seguir durante a próxima
+        self.reiniciar_estatisticas()
+
+    @property
+    def disponivel(self):
+        return OCR_ATIVO and convert_from_path is not None
+
+    def reiniciar_estatisticas(self):
+        with self._lock:
+            self._contagem = {"enfileirados": 0, "com_uc": 0, "sem_uc": 0, "do_cache": 0, "erros": 0}
+
+    def _contar(self, chave):
+        with self._lock:
+            self._contagem[chave] += 1
+
+    def _texto(self, caminho, hash_conteudo, senha):
+        arquivo_cache = os.path.join(self.pasta_cache, f"{hash_conteudo}.txt")
+        if os.path.exists(arquivo_cache):
+            self._contar("do_cache")
+            with open(arquivo_cache, "r", encoding="utf-8") as f:
+                return f.read()
+        texto = texto_por_ocr(caminho, senha)
+        os.makedirs(self.pasta_cache, exist_ok=True)
+        tmp = arquivo_cache + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(texto)
+        os.replace(tmp, arquivo_cache)
+        return texto
+
+    def _executar(self, caminho, hash_conteudo, ao_concluir, senha):
+        try:
+            texto = self._texto(caminho, hash_conteudo, senha)
+            self._contar("com_uc" if ao_concluir(texto) else "sem_uc")
+        except Exception as e:
+            self._contar("erros")
+            logging.error(f"Erro no OCR de '{caminho}': {e}")
+        finally:
+            with self._lock:
+                self._pendentes -= 1
+
+    def enfileirar(self, caminho, hash_conteudo, ao_concluir, senha=None):
+        """
+        Agenda o OCR do PDF em ``caminho``; ``ao_concluir(texto)`` roda na thread de OCR e
+        devolve True se resolveu o boleto. Retorna False se o OCR não está disponível.
+        """
+        if not self.disponivel:
+            return False
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.trabalhadores, thread_name_prefix="boletos-ocr")
+            self._contagem["enfileirados"] += 1
+            self._pendentes += 1
+            self._executor.submit(self._executar, caminho, hash_conteudo, ao_concluir, senha)
+        logging.info(f"PDF escaneado '{os.path.basename(caminho)}' enviado para o OCR em segundo plano.")
+        return True
+
+    def resumo(self):
+        c = self._contagem
+        if not c["enfileirados"]:
+            return None
+        return (f"OCR de PDFs escaneados: {c['enfileirados']} na fila ({c['com_uc']} com UC, {c['sem_uc']} sem UC, "
+                f"{c['erros']} com erro, {c['do_cache']} do cache; {self._pendentes} ainda em andamento).")
+
+    def aguardar(self):
+        """Espera a fila esvaziar (encerramento do serviço)."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+_fila = None
+_lock_fila = threading.Lock()
+
+
+def fila_ocr():
+    global _fila
+    with _lock_fila:
+        if _fila is None:
+            _fila = FilaOcr()
+        return _fila
@@ -0,0 +1,96 @@
+"""
+Montagem das restrições DASL (@SQL=) usadas em Items.Restrict e Folder.GetTable.
+
+Quanto mais predicados o servidor avalia, menos itens o Python precisa percorrer.
+Como nem toda store aceita todas as propriedades (ex.: ``ci_phrasematch`` exige
+indexação), os filtros são gerados em níveis, do mais restrito ao mais amplo;
+quem aplica o filtro desce de nível quando a store rejeita a cláusula.
+"""
+
+import logging
+from datetime import timedelta
+
+from .config import DOMINIO_REMETENTE_VALIDO, PALAVRA_CHAVE_DASL
+from .utils import _iso
+
+PROP_DATA = "urn:schemas:httpmail:datereceived"
+PROP_CLASSE = "urn:schemas:httpmail:messageclass"
+PROP_REMETENTE = "urn:schemas:httpmail:fromemail"
+PROP_REMETENTE_SMTP = "http://schemas.microsoft.com/mapi/proptag/0x5D01001F"
+PROP_TEM_ANEXO = "urn:schemas:httpmail:hasattachment"
+PROP_ASSUNTO = "urn:schemas:httpmail:subject"
+PROP_CORPO = "urn:schemas:httpmail:textdescription"
+
+# Do mais restrito ao mais amplo; "data" é o filtro original e sempre existe
+NIVEIS = ("completo", "remetente_anexo", "remetente", "data")
+
+
+def _literal(valor):
+    return str(valor).replace("'", "''")
+
+
+def clausula_data(dt_inicio, dt_fim):
+    # Margem de um dia: o servidor compara em UTC, o Python refaz a checagem exata
+    dt_inicio_sql = (dt_inicio - timedelta(days=1)); dt_fim_sql = (dt_fim + timedelta(days=1))
+    return (f"\"{PROP_DATA}\" >= '{_iso(dt_inicio_sql)}' AND "
+            f"\"{PROP_DATA}\" <= '{_iso(dt_fim_sql)}' AND "
+            f"\"{PROP_CLASSE}\" = 'IPM.Note'")
+
+
+def clausula_remetente(dominio=DOMINIO_REMETENTE_VALIDO):
+    padrao = _literal(f"%{dominio}")
+    return f"(\"{PROP_REMETENTE}\" LIKE '{padrao}' OR \"{PROP_REMETENTE_SMTP}\" LIKE '{padrao}')"
+
+
+def clausula_anexo():
+    return f"\"{PROP_TEM_ANEXO}\" = 1"
+
+
+def clausula_palavra_chave(palavra):
+    palavra = _literal(palavra)
+    return f"(\"{PROP_ASSUNTO}\" ci_phrasematch '{palavra}' OR \"{PROP_CORPO}\" ci_phrasematch '{palavra}')"
+
+
+def montar_filtro(dt_inicio, dt_fim, remetente=True, anexo=True, palavra_chave=None):
+    clausulas = [f"({clausula_data(dt_inicio, dt_fim)})"]
+    if remetente: clausulas.append(clausula_remetente())
+    if anexo: clausulas.append(clausula_anexo())
+    if palavra_chave: clausulas.append(clausula_palavra_chave(palavra_chave))
+    return "@SQL=(" + " AND ".join(clausulas) + ")"
+
+
+def filtro_data_dasl(dt_inicio, dt_fim):
+    return montar_filtro(dt_inicio, dt_fim, remetente=False, anexo=False)
+
+
+def filtros_em_cascata(dt_inicio, dt_fim, palavra_chave=PALAVRA_CHAVE_DASL):
+    """Lista ``[(nivel, filtro), ...]`` do mais restrito ao mais amplo."""
+    filtros = []
+    if palavra_chave:
+        filtros.append(("completo", montar_filtro(dt_inicio, dt_fim, palavra_chave=palavra_chave)))
+    filtros.append(("remetente_anexo", montar_filtro(dt_inicio, dt_fim)))
+    filtros.append(("remetente", montar_filtro(dt_inicio, dt_fim, anexo=False)))
+    filtros.append(("data", filtro_data_dasl(dt_inicio, dt_fim)))
+    return filtros
+
+
+def aplicar_em_cascata(aplicar, dt_inicio, dt_fim, descricao, nivel_inicial=None):
+    """
+    Chama ``aplicar(filtro)`` do nível mais restrito para o mais amplo até a store aceitar.
+    ``aplicar`` deve forçar a avaliação do filtro (ex.: ler ``Count``), pois algumas stores
+    só rejeitam a cláusula nesse momento. Retorna ``(resultado, nivel)``; se nenhum nível
+    funcionar, a exceção do último é propagada.
+    """
+    filtros = filtros_em_cascata(dt_inicio, dt_fim)
+    if nivel_inicial:
+        filtros = [f for f in filtros if NIVEIS.index(f[0]) >= NIVEIS.index(nivel_inicial)]
+    ultimo_erro = None
+    for nivel, filtro in filtros:
+        try:
+            resultado = aplicar(filtro)
+            logging.info(f"Filtro DASL nível '{nivel}' aplicado em '{descricao}'.")
+            return resultado, nivel
+        except Exception as e:
+            logging.warning(f"Store rejeitou o filtro DASL nível '{nivel}' em '{descricao}': {e}")
+            ultimo_erro = e
+    raise ultimo_erro
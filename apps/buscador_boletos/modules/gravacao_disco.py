@@ -0,0 +1,296 @@
+"""
+Gravação dos boletos em segundo plano (write-behind).
+
+Quem processa o e-mail (a thread do COM ou o gravador do pipeline) só escolhe o nome e
+entrega o conteúdo com ``agendar``; uma thread própria faz o trabalho de disco em lotes de
+até ``LOTE_GRAVACAO`` (esperando até ``ESPERA_LOTE_GRAVACAO`` segundos para completar o lote).
+Os arquivos do lote são escritos em temporários ``.parcial`` na pasta de destino,
+sincronizados numa só passada (os fsyncs seguidos, sem intercalar com escritas),
+publicados com os nomes finais (hardlink exclusivo: nunca sobrescreve, nem em corrida com
+outro processo; nome ocupado por outro conteúdo vira ``nome_2.pdf``) e cada pasta recebe um único fsync.
+Um PDF com nome final está sempre completo, e temporários deixados por uma queda são
+apagados no próximo uso da pasta. Só depois da renomeação o boleto entra no índice de
+hashes (``indice_hashes.registrar``) e roda o ``ao_confirmar`` de quem agendou. A fila é limitada (``TAMANHO_FILA_GRAVACAO``): se o disco (rede/OneDrive) não
+acompanhar, ``agendar`` espera em vez de acumular anexos na memória.
+"""
+
+import os
+import time
+import queue
+import logging
+import uuid
+import itertools
+import threading
+
+from .config import TAMANHO_FILA_GRAVACAO, LOTE_GRAVACAO, ESPERA_LOTE_GRAVACAO, FSYNC_GRAVACAO
+from .indice_hashes import indice_hashes
+from .metricas import medir
+from .utils import hash_fluxo
+
+SUFIXO_PARCIAL = ".parcial"
+
+
+def _fsync_pasta(pasta):
+    """Torna duráveis as renomeações da pasta. No Windows não há como abrir uma pasta (o NTFS já registra a renomeação)."""
+    if os.name == "nt":
+        return
+    fd = os.open(pasta, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def publicar_exclusivo(tmp, caminho):
+    """Dá a ``tmp`` o nome ``caminho``; FileExistsError se o nome já existir (checagem e criação numa só operação)."""
+    if os.name == "nt":
+        # MoveFileEx sem REPLACE_EXISTING: no Windows a renomeação já falha com o destino existente
+        os.rename(tmp, caminho)
+        return
+    try:
+        os.link(tmp, caminho)
+    except FileExistsError:
+        raise
+    except OSError:
+        # Sistema de arquivos sem hardlink (FAT, alguns compartilhamentos): reserva o nome com O_EXCL e renomeia por cima
+        os.close(os.open(caminho, os.O_WRONLY | os.O_CREAT | os.O_EXCL))
+        os.replace(tmp, caminho)
+        return
+    os.unlink(tmp)
+
+
+def _mesmo_conteudo(caminho, hash_conteudo):
+    try:
+        with open(caminho, "rb") as f:
+            return hash_fluxo(f) == hash_conteudo
+    except OSError:
+        return False
+
+
+class GravadorDisco:
+    """Fila limitada + thread ``boletos-disco``; ``aguardar`` espera o que já foi agendado chegar ao disco."""
+
+    def __init__(self, tamanho_fila=None, lote=None, espera_lote=None):
+        self.lote = lote or LOTE_GRAVACAO
+        self.espera_lote = ESPERA_LOTE_GRAVACAO if espera_lote is None else espera_lote
+        self._fila = queue.Queue(maxsize=tamanho_fila or TAMANHO_FILA_GRAVACAO)
+        self._lock = threading.Lock()
+        # Números de sequência: a fila é FIFO, então ``aguardar`` só precisa esperar o contador alcançar o seu
+        self._lock_agendar = threading.Lock()
+        self._confirmados = threading.Condition()
+        self._agendados = 0
+        self._concluidos = 0
+        self._thread = None
+        self._criado_em = time.time()
+        self._pastas_limpas = set()
+        self.reiniciar_estatisticas()
+
+    def reiniciar_estatisticas(self):
+        with self._lock:
+            self._contagem = {"gravados": 0, "lotes": 0, "ja_existiam": 0, "erros": 0}
+            self._espera = 0.0  # tempo em que ``agendar`` ficou parado com a fila cheia
+
+    def _contar(self, chave, quantidade=1):
+        with self._lock:
+            self._contagem[chave] += quantidade
+
+    def agendar(self, caminho, conteudo, hash_conteudo=None, uc=None, ao_confirmar=None, enderecado=False):
+        """
+        Entrega ``conteudo`` (``conteudo.ConteudoAnexo``; o gravador o fecha) para ser gravado em
+        ``caminho``. ``ao_confirmar(caminho_final)`` roda na thread do gravador depois da publicação
+        (outro nome se ``caminho`` foi ocupado por outro conteúdo; None: o mesmo conteúdo já
+        existia ou a gravação falhou). ``enderecado``: ``caminho`` é dado pelo conteúdo
+        (``acervo``), então um arquivo já existente conta como gravado.
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._executar, name="boletos-disco", daemon=True)
+                self._thread.start()
+        inicio = time.perf_counter()
+        with self._lock_agendar:
+            # put dentro do lock: a fila recebe os pedidos na ordem dos números de sequência
+            self._fila.put((caminho, conteudo, hash_conteudo, uc, ao_confirmar, enderecado))
+            self._agendados += 1
+        espera = time.perf_counter() - inicio
+        with self._lock:
+            self._espera += espera
+
+    def aguardar(self):
+        """Espera a gravação de tudo o que foi agendado até agora (antes de gravar marcas e índices)."""
+        with self._lock_agendar:
+            alvo = self._agendados
+        with self._confirmados:
+            self._confirmados.wait_for(lambda: self._concluidos >= alvo)
+
+    def _executar(self):
+        while True:
+            lote = [self._fila.get()]
+            # Espera um pouco pelos próximos anexos: um lote cheio divide os fsyncs das pastas
+            limite = time.monotonic() + self.espera_lote
+            while len(lote) < self.lote:
+                try: lote.append(self._fila.get(timeout=max(0.0, limite - time.monotonic())))
+                except queue.Empty: break
+            try:
+                with medir("gravacao_disco"):
+                    self._gravar_lote(lote)
+            except Exception as e:
+                logging.error(f"Erro inesperado no gravador de boletos: {e}", exc_info=True)
+            finally:
+                with self._confirmados:
+                    self._concluidos += len(lote)
+                    self._confirmados.notify_all()
+
+    def _limpar_parciais(self, pasta):
+        """Cria a pasta e apaga temporários de gravações interrompidas (anteriores a este processo) na 1ª gravação nela."""
+        if pasta in self._pastas_limpas:
+            return
+        self._pastas_limpas.add(pasta)
+        try:
+            os.makedirs(pasta, exist_ok=True)
+            with os.scandir(pasta) as entradas:
+                for entrada in entradas:
+                    if entrada.name.endswith(SUFIXO_PARCIAL) and entrada.stat().st_mtime < self._criado_em:
+                        os.remove(entrada.path)
+                        logging.warning(f"Gravação interrompida descartada: '{entrada.path}'.")
+        except OSError as e:
+            logging.warning(f"Não foi possível limpar os temporários de '{pasta}': {e}")
+
+    def _escrever(self, caminho, conteudo):
+        """Escreve ``conteudo`` num temporário na pasta de ``caminho`` e devolve ``(tmp, arquivo aberto)`` para o fsync do lote."""
+        pasta, nome = os.path.split(caminho)
+        self._limpar_parciais(pasta)
+        # Nome único ("x": falha se existir); ao contrário de tempfile.mkstemp, respeita a umask como o open comum
+        tmp = os.path.join(pasta, f".{nome}.{uuid.uuid4().hex[:12]}{SUFIXO_PARCIAL}")
+        f = open(tmp, "xb")
+        try:
+            conteudo.copiar_para(f)
+            f.flush()
+        except BaseException:
+            f.close()
+            try: os.remove(tmp)
+            except OSError: pass
+            raise
+        return tmp, f
+
+    @staticmethod
+    def _confirmar(ao_confirmar, caminho):
+        if ao_confirmar is None:
+            return
+        try:
+            ao_confirmar(caminho)
+        except Exception as e:
+            logging.error(f"Erro na confirmação de uma gravação: {e}", exc_info=True)
+
+    @staticmethod
+    def _publicar(tmp, caminho, hash_conteudo, enderecado):
+        """
+        Publica ``tmp`` como ``caminho`` sem sobrescrever. Nome ocupado por outro conteúdo: o
+        próximo livre (``nome_2.pdf``, ``nome_3.pdf``...). Devolve o nome final, ou None se o
+        mesmo conteúdo já estava lá (``tmp`` é apagado).
+        """
+        base, extensao = os.path.splitext(caminho)
+        for numero in itertools.count(1):
+            final = caminho if numero == 1 else f"{base}_{numero}{extensao}"
+            try:
+                publicar_exclusivo(tmp, final)
+                return final
+            except FileExistsError:
+                if enderecado or (hash_conteudo and _mesmo_conteudo(final, hash_conteudo)):
+                    os.remove(tmp)
+                    return None
+
+    def _sincronizar(self, escritos):
+        """fsync e fechamento de todos os temporários do lote, numa só passada; devolve os que chegaram ao disco."""
+        sincronizados = []
+        for tmp, arquivo, caminho, hash_conteudo, uc, ao_confirmar, enderecado in escritos:
+            if arquivo is None:
+                sincronizados.append((tmp, caminho, hash_conteudo, uc, ao_confirmar, enderecado))
+                continue
+            try:
+                with arquivo:
+                    if FSYNC_GRAVACAO:
+                        os.fsync(arquivo.fileno())
+            except OSError as e:
+                self._contar("erros")
+                logging.error(f"Erro ao gravar '{caminho}': {e}")
+                try: os.remove(tmp)
+                except OSError: pass
+                self._confirmar(ao_confirmar, None)
+                continue
+            sincronizados.append((tmp, caminho, hash_conteudo, uc, ao_confirmar, enderecado))
+        return sincronizados
+
+    def _gravar_lote(self, lote):
+        escritos = []
+        for caminho, conteudo, hash_conteudo, uc, ao_confirmar, enderecado in lote:
+            try:
+                with conteudo:
+                    if enderecado and os.path.exists(caminho):
+                        # Mesmo conteúdo já no acervo: nada a escrever
+                        escritos.append((None, None, caminho, hash_conteudo, uc, ao_confirmar, enderecado))
+                        continue
+                    escritos.append((*self._escrever(caminho, conteudo), caminho, hash_conteudo, uc, ao_confirmar, enderecado))
+            except Exception as e:
+                self._contar("erros")
+                logging.error(f"Erro ao gravar '{caminho}': {e}")
+                self._confirmar(ao_confirmar, None)
+
+        confirmados, pastas = [], set()
+        with medir("gravacao_disco_fsync"):
+            escritos = self._sincronizar(escritos)
+        for tmp, caminho, hash_conteudo, uc, ao_confirmar, enderecado in escritos:
+            try:
+                if tmp is None:
+                    confirmados.append((caminho, hash_conteudo, uc, ao_confirmar))
+                    continue
+                final = self._publicar(tmp, caminho, hash_conteudo, enderecado)
+            except OSError as e:
+                self._contar("erros")
+                logging.error(f"Erro ao renomear '{tmp}' para '{caminho}': {e}")
+                self._confirmar(ao_confirmar, None)
+                continue
+            if final is None:
+                if enderecado:
+                    # Objeto do acervo gravado por outro processo entre o agendamento e agora: mesmo conteúdo
+                    confirmados.append((caminho, hash_conteudo, uc, ao_confirmar))
+                    continue
+                # Criado por fora depois do agendamento (ex.: correção de PDFs antigos) com o mesmo conteúdo
+                self._contar("ja_existiam")
+                logging.warning(f"-> AVISO: O arquivo '{caminho}' já existe no disco; gravação descartada.")
+                self._confirmar(ao_confirmar, None)
+                continue
+            if final != caminho:
+                logging.warning(f"-> AVISO: '{caminho}' foi ocupado por outro conteúdo; gravado como '{os.path.basename(final)}'.")
+            pastas.add(os.path.dirname(final))
+            confirmados.append((final, hash_conteudo, uc, ao_confirmar))
+
+        if FSYNC_GRAVACAO:
+            for pasta in pastas:
+                try: _fsync_pasta(pasta)
+                except OSError as e: logging.warning(f"fsync da pasta '{pasta}' falhou: {e}")
+        for caminho, hash_conteudo, uc, ao_confirmar in confirmados:
+            if hash_conteudo:
+                # Só agora o boleto vale para a deduplicação das próximas execuções
+                indice_hashes().registrar(caminho, hash_conteudo, uc)
+            self._confirmar(ao_confirmar, caminho)
+        self._contar("gravados", len(confirmados))
+        self._contar("lotes")
+
+    def resumo(self):
+        c = self._contagem
+        if not (c["gravados"] or c["erros"] or c["ja_existiam"]):
+            return None
+        return (f"Gravação em segundo plano: {c['gravados']} arquivos em {c['lotes']} lotes ({c['ja_existiam']} já existiam, "
+                f"{c['erros']} com erro; {self._espera:.1f}s de espera com a fila cheia).")
+
+
+_gravador = None
+_lock_gravador = threading.Lock()
+
+
+def gravador_disco():
+    global _gravador
+    with _lock_gravador:
+        if _gravador is None:
+            _gravador = GravadorDisco()
+        return _gravador
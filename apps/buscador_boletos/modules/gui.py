@@ -5,8 +5,11 @@ from datetime import datetime
 import calendar
 
 from .config import DOMINIO_REMETENTE_VALIDO
-from .file_manager import corrigir_pdfs_antigos
+from .correcao_pdfs import corrigir_pdfs_antigos
 from .outlook_service import buscar_e_salvar_boletos
+from .marcas import MODO_COMPLETO, MODO_INCREMENTAL
+from .janelas import TAMANHOS_JANELA
+from .servico import ClienteServico, formatar_estado
 
 class App:
     def __init__(self, root):
@@ -43,6 +46,17 @@ class App:
         self.create_date_selectors(date_frame, 0, 1)
         self.create_date_selectors(date_frame, 1, 1)
         self.set_default_dates()
+
+        # Padrão completo: o incremental só economiza quando o período começa dentro do já varrido
+        self.incremental_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(date_frame, text="Apenas e-mails novos desde a última busca (períodos anteriores são lidos inteiros)",
+                        variable=self.incremental_var).grid(row=2, column=0, columnspan=4, padx=10, pady=(10, 0), sticky=tk.W)
+
+        # Períodos longos: processa em janelas retomáveis (uma falha custa só a janela)
+        ttk.Label(date_frame, text="Dividir em janelas:").grid(row=3, column=0, padx=10, pady=(5, 0), sticky=tk.W)
+        self.janela_var = tk.StringVar(value="não dividir")
+        ttk.Combobox(date_frame, textvariable=self.janela_var, values=("não dividir",) + TAMANHOS_JANELA, width=12,
+                     state="readonly").grid(row=3, column=1, columnspan=3, padx=(0, 2), pady=(5, 0), sticky=tk.W)
         
         self.search_button = ttk.Button(main, text="▶ Iniciar Busca de Boletos", command=self.start_search_thread)
         self.search_button.pack(pady=10, ipady=8, fill=tk.X)
@@ -162,6 +176,17 @@ class App:
         self._limpar_e_preparar_ui()
         start_date_str = f"{self.day_var_0.get()}/{self.month_var_0.get()}/{self.year_var_0.get()}"
         end_date_str = f"{self.day_var_1.get()}/{self.month_var_1.get()}/{self.year_var_1.get()}"
-        self.update_status(f"Iniciando busca de boletos do domínio '{DOMINIO_REMETENTE_VALIDO}'...")
-        t = Thread(target=buscar_e_salvar_boletos, args=(start_date_str, end_date_str, self.update_status, self.update_progress, self.on_search_completion), daemon=True)
+        modo = MODO_INCREMENTAL if self.incremental_var.get() else MODO_COMPLETO
+        janela = self.janela_var.get() if self.janela_var.get() in TAMANHOS_JANELA else None
+        self.update_status(f"Iniciando busca de boletos do domínio '{DOMINIO_REMETENTE_VALIDO}' (modo {modo})...")
+        t = Thread(target=self._buscar_thread, args=(start_date_str, end_date_str, modo, janela), daemon=True)
         t.start()
+
+    def _buscar_thread(self, start_date_str, end_date_str, modo, janela):
+        # Com o serviço residente no ar, a busca já começa com o Outlook conectado e os hashes carregados
+        cliente = ClienteServico()
+        buscar = buscar_e_salvar_boletos
+        if cliente.disponivel():
+            self.update_status(formatar_estado(cliente.estado()))
+            buscar = cliente.buscar
+        buscar(start_date_str, end_date_str, self.update_status, self.update_progress, self.on_search_completion, modo=modo, janela=janela)
@@ -0,0 +1,209 @@
+"""
+Índice persistido dos boletos salvos: SHA-256 -> arquivo, tamanho, mtime e UC (SQLite).
+
+Substitui a releitura de todos os PDFs de ``boletos_baixados`` a cada busca. ``reconciliar``
+compara a pasta com o índice só pelos metadados do ``os.scandir``; arquivos que sumiram
+saem do índice e os novos ou alterados (tamanho/mtime diferentes) ficam pendentes, sem
+serem lidos. A deduplicação é em duas camadas: ``contem(hash, tamanho)`` só calcula o
+SHA-256 de um pendente quando um anexo tem exatamente o mesmo tamanho; sem colisão de
+tamanho, nada é lido do disco. Arquivos só com o mtime trocado (ex.: sincronização do
+OneDrive) nunca são relidos sem necessidade; arquivos novos são lidos uma vez, na
+reconciliação do índice de mensagens (``conhecidos``). Boletos novos só são registrados
+(``registrar``) depois de renomeados para o nome final (``gravacao_disco``): se o registro
+falhar, a próxima reconciliação encontra o arquivo como novo.
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+from .config import ARQUIVO_INDICE_HASHES, PASTA_SAIDA_BOLETOS
+from .utils import hash_fluxo
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS arquivos (
+    nome TEXT PRIMARY KEY,
+    hash TEXT,              -- NULL: pendente (arquivo novo/alterado ainda não lido)
+    tamanho INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    uc TEXT,
+    hash_anterior TEXT      -- hash antes da alteração (só mtime mudou, ex. sincronização do OneDrive)
+);
+CREATE INDEX IF NOT EXISTS arquivos_hash ON arquivos (hash);
+CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT);
+"""
+_VERSAO = "2"
+
+
+class IndiceHashes:
+    """
+    Índice de uma pasta de boletos (thread-safe; uma conexão compartilhada sob lock). Depois
+    de ``reconciliar`` é o ``hashes_salvos`` da busca: ``contem``, ``add`` e ``descartar``.
+    """
+
+    def __init__(self, caminho=None, pasta=None):
+        self.caminho = caminho or ARQUIVO_INDICE_HASHES
+        self.pasta = pasta or PASTA_SAIDA_BOLETOS
+        self._lock = threading.Lock()
+        self.atualizado_em = None
+        self._hashes = set()
+        self._pendentes = {}  # tamanho -> [nome]
+        self.lidos_sob_demanda = 0
+        if self.caminho != ":memory:":
+            os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+        try:
+            self._conexao = self._abrir()
+        except sqlite3.DatabaseError as e:
+            logging.warning(f"Índice de hashes ilegível em '{self.caminho}' ({e}). Recriando.")
+            os.remove(self.caminho)
+            self._conexao = self._abrir()
+
+    def _abrir(self):
+        conexao = sqlite3.connect(self.caminho, check_same_thread=False)
+        # WAL sem fsync a cada transação: um registro perdido numa queda de energia volta como arquivo novo
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.execute("PRAGMA synchronous=NORMAL")
+        conexao.executescript("CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT);")
+        meta = dict(conexao.execute("SELECT chave, valor FROM meta"))
+        if meta.get("pasta") != os.path.abspath(self.pasta) or meta.get("versao") != _VERSAO:
+            # Outra pasta de boletos (configuração alterada) ou formato antigo: o conteúdo não vale
+            with conexao:
+                conexao.execute("DROP TABLE IF EXISTS arquivos")
+                conexao.execute("INSERT OR REPLACE INTO meta VALUES ('pasta', ?)", (os.path.abspath(self.pasta),))
+                conexao.execute("INSERT OR REPLACE INTO meta VALUES ('versao', ?)", (_VERSAO,))
+        conexao.executescript(_ESQUEMA)
+        return conexao
+
+    def __len__(self):
+        with self._lock:
+            return self._conexao.execute("SELECT COUNT(*) FROM arquivos").fetchone()[0]
+
+    def reconciliar(self):
+        """Atualiza o índice com a pasta só por metadados e devolve o próprio índice (``hashes_salvos``)."""
+        with self._lock:
+            conhecidos = {nome: (tamanho, mtime_ns, h or anterior) for nome, tamanho, mtime_ns, h, anterior
+                          in self._conexao.execute("SELECT nome, tamanho, mtime_ns, hash, hash_anterior FROM arquivos")}
+            alterados, vistos = [], set()
+            if os.path.exists(self.pasta):
+                with os.scandir(self.pasta) as entradas:
+                    for entrada in entradas:
+                        if not entrada.name.lower().endswith(".pdf") or not entrada.is_file():
+                            continue
+                        vistos.add(entrada.name)
+                        st = entrada.stat()
+                        anterior = conhecidos.get(entrada.name)
+                        if anterior is not None and anterior[:2] == (st.st_size, st.st_mtime_ns):
+                            continue
+                        # Só o mtime mudou: o hash antigo ainda vale como provável; com outro tamanho o conteúdo é outro
+                        mesmo_tamanho = anterior is not None and anterior[0] == st.st_size
+                        alterados.append((entrada.name, st.st_size, st.st_mtime_ns, anterior[2] if mesmo_tamanho else None))
+            removidos = [(nome,) for nome in conhecidos if nome not in vistos]
+            with self._conexao:
+                self._conexao.executemany("DELETE FROM arquivos WHERE nome = ?", removidos)
+                # Pendentes: o SHA-256 só é calculado se aparecer anexo do mesmo tamanho (contem)
+                self._conexao.executemany("INSERT OR REPLACE INTO arquivos (nome, hash, tamanho, mtime_ns, hash_anterior) "
+                                          "VALUES (?, NULL, ?, ?, ?)", alterados)
+            self._hashes, self._pendentes = set(), {}
+            for nome, h, tamanho in self._conexao.execute("SELECT nome, hash, tamanho FROM arquivos"):
+                if h: self._hashes.add(h)
+                else: self._pendentes.setdefault(tamanho, []).append(nome)
+            self.lidos_sob_demanda = 0
+            pendentes = sum(len(n) for n in self._pendentes.values())
+        self.atualizado_em = datetime.now()
+        logging.info(f"{len(self._hashes) + pendentes} PDFs no índice de hashes ({len(alterados)} novos/alterados, "
+                     f"{len(removidos)} removidos; {pendentes} pendentes de leitura).")
+        return self
+
+    def _ler_pendentes(self, tamanho, nomes=None):
+        """SHA-256 dos pendentes com ``tamanho`` (ou só ``nomes`` entre eles); chamado sob o lock."""
+        lidos, restantes = [], []
+        for nome in self._pendentes.pop(tamanho, []):
+            if nomes is not None and nome not in nomes:
+                restantes.append(nome); continue
+            try:
+                with open(os.path.join(self.pasta, nome), "rb") as f:
+                    h = hash_fluxo(f)
+            except OSError as e:
+                logging.warning(f"Falha ao carregar hash de '{nome}': {e}")
+                continue
+            lidos.append((h, nome)); self._hashes.add(h)
+        if restantes:
+            self._pendentes[tamanho] = restantes
+        if lidos:
+            with self._conexao:
+                self._conexao.executemany("UPDATE arquivos SET hash = ?, hash_anterior = NULL WHERE nome = ?", lidos)
+            self.lidos_sob_demanda += len(lidos)
+
+    def contem(self, hash_conteudo, tamanho):
+        """True se um boleto com este conteúdo já está salvo. Lê do disco só pendentes do mesmo tamanho."""
+        with self._lock:
+            if hash_conteudo in self._hashes:
+                return True
+            if tamanho in self._pendentes:
+                self._ler_pendentes(tamanho)
+            return hash_conteudo in self._hashes
+
+    def add(self, hash_conteudo):
+        with self._lock:
+            self._hashes.add(hash_conteudo)
+
+    def descartar(self, hash_conteudo):
+        """Desfaz um ``add`` cuja gravação não chegou ao disco (o mesmo conteúdo pode voltar a ser salvo)."""
+        with self._lock:
+            self._hashes.discard(hash_conteudo)
+
+    def conhecidos(self):
+        """
+        Todos os hashes da pasta, para reconciliar o índice de mensagens: pendentes alterados
+        entram pelo hash anterior (sem leitura); só arquivos novos, sem hash anterior, são lidos.
+        """
+        with self._lock:
+            novos = {}
+            for nome, tamanho in self._conexao.execute(
+                    "SELECT nome, tamanho FROM arquivos WHERE hash IS NULL AND hash_anterior IS NULL"):
+                novos.setdefault(tamanho, set()).add(nome)
+            for tamanho, nomes in novos.items():
+                self._ler_pendentes(tamanho, nomes)
+            anteriores = {h for (h,) in self._conexao.execute(
+                "SELECT hash_anterior FROM arquivos WHERE hash IS NULL AND hash_anterior IS NOT NULL")}
+            return self._hashes | anteriores
+
+    def resumo(self):
+        pendentes = sum(len(n) for n in self._pendentes.values())
+        return (f"Índice de hashes: {self.lidos_sob_demanda} PDFs salvos lidos (novos ou com colisão de tamanho); "
+                f"{pendentes} alterados nem precisaram ser lidos.")
+
+    def _inserir(self, caminho, hash_conteudo, uc):
+        st = os.stat(caminho)
+        self._conexao.execute("INSERT OR REPLACE INTO arquivos VALUES (?, ?, ?, ?, ?, NULL)",
+                              (os.path.basename(caminho), hash_conteudo, st.st_size, st.st_mtime_ns, uc))
+        self._hashes.add(hash_conteudo)
+
+    def _na_pasta(self, caminho):
+        return os.path.abspath(os.path.dirname(caminho)) == os.path.abspath(self.pasta)
+
+    def registrar(self, caminho, hash_conteudo, uc=None):
+        """Registra um boleto já gravado na pasta (``gravacao_disco``) ou movido para ela (ex.: da pasta de falhas)."""
+        if not self._na_pasta(caminho):
+            return
+        with self._lock, self._conexao:
+            self._inserir(caminho, hash_conteudo, uc)
+
+    def fechar(self):
+        with self._lock:
+            self._conexao.close()
+
+
+_indice = None
+_lock_indice = threading.Lock()
+
+
+def indice_hashes():
+    """Índice de ``PASTA_SAIDA_BOLETOS`` compartilhado pelo processo (aberto no primeiro uso)."""
+    global _indice
+    with _lock_indice:
+        if _indice is None:
+            _indice = IndiceHashes()
+        return _indice
@@ -0,0 +1,98 @@
+"""
+Índice de mensagens já processadas, consultado antes de baixar qualquer anexo.
+
+A mesma notificação da Pinbank costuma existir em várias pastas (regras, cópias).
+Sem o índice, o anexo é baixado e passa pelo SHA-256 só para ser descartado como
+``duplicata_hash``. Chaves guardadas:
+
+- Internet Message-ID + nome + tamanho do anexo: conferida antes de ``ler()``;
+- Internet Message-ID sozinho: conferida na triagem por metadados, antes de abrir o item;
+  só entra quando todos os boletos do e-mail estão salvos (um anexo com falha de UC a impede).
+
+Cada chave é um digest BLAKE2b de 8 bytes ligado ao prefixo do SHA-256 dos boletos que
+ela produziu (um .zip pode trazer vários); o arquivo tem registros fixos de 16 bytes. Ao
+carregar, as chaves com algum boleto fora de ``boletos_baixados`` são descartadas (os
+boletos voltam a ser baixados).
+Só entram no índice anexos cujo conteúdo já está salvo; falhas de UC são sempre refeitas.
+"""
+
+import os
+import logging
+import hashlib
+import threading
+
+from .config import ARQUIVO_INDICE_MENSAGENS
+
+_TAMANHO_REGISTRO = 16
+
+
+def _digest(*partes):
+    return hashlib.blake2b("\x1f".join(str(p) for p in partes).encode("utf-8", errors="ignore"), digest_size=8).digest()
+
+
+def _prefixo(hash_conteudo):
+    return bytes.fromhex(hash_conteudo[:16])
+
+
+class IndiceMensagens:
+    """Conjunto persistido de chaves de mensagem/anexo (thread-safe)."""
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or ARQUIVO_INDICE_MENSAGENS
+        self._lock = threading.Lock()
+        self._chaves = {}
+        self._alterado = False
+        if os.path.exists(self.caminho):
+            try:
+                with open(self.caminho, "rb") as f:
+                    dados = f.read()
+                for i in range(0, len(dados) - _TAMANHO_REGISTRO + 1, _TAMANHO_REGISTRO):
+                    self._chaves.setdefault(dados[i:i + 8], set()).add(dados[i + 8:i + _TAMANHO_REGISTRO])
+            except OSError as e:
+                logging.warning(f"Índice de mensagens ilegível em '{self.caminho}' ({e}). Iniciando do zero.")
+
+    def __len__(self):
+        return len(self._chaves)
+
+    def reconciliar(self, hashes_salvos):
+        """Descarta as chaves com algum boleto fora de ``hashes_salvos`` (arquivo apagado ou movido)."""
+        prefixos = {_prefixo(h) for h in hashes_salvos}
+        with self._lock:
+            antes = len(self._chaves)
+            self._chaves = {k: v for k, v in self._chaves.items() if v <= prefixos}
+            removidas = antes - len(self._chaves)
+            self._alterado = self._alterado or removidas > 0
+        logging.info(f"Índice de mensagens: {len(self._chaves)} chaves válidas ({removidas} descartadas na reconciliação).")
+
+    def contem_mensagem(self, message_id):
+        return bool(message_id) and _digest(message_id) in self._chaves
+
+    def contem_anexo(self, message_id, nome, tamanho):
+        if not message_id or tamanho is None:
+            return False
+        return _digest(message_id, nome.lower(), tamanho) in self._chaves
+
+    def registrar(self, message_id, nome=None, tamanho=None, hash_conteudo=None):
+        """Chave de um anexo (``message_id, nome, tamanho``) ou, só com ``message_id``, do e-mail inteiro."""
+        if not message_id or not hash_conteudo:
+            return
+        if nome is None:
+            chave = _digest(message_id)
+        elif tamanho is None:
+            return
+        else:
+            chave = _digest(message_id, nome.lower(), tamanho)
+        with self._lock:
+            self._chaves.setdefault(chave, set()).add(_prefixo(hash_conteudo))
+            self._alterado = True
+
+    def salvar(self):
+        with self._lock:
+            if not self._alterado:
+                return
+            os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+            tmp = self.caminho + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(b"".join(k + v for k, prefixos in self._chaves.items() for v in prefixos))
+            os.replace(tmp, self.caminho)
+            self._alterado = False
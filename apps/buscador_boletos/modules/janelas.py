@@ -0,0 +1,193 @@
+"""
+Divisão de períodos longos (backfills) em janelas de datas.
+
+Cada janela (dia, semana ou mês) é uma busca independente: as coleções do Outlook
+ficam do tamanho da janela e um erro custa só aquela janela. As janelas concluídas
+são registradas em disco; repetir o mesmo backfill (mesma fonte, período e tamanho
+de janela) depois de uma falha retoma apenas as pendentes. Quando todas terminam, o
+registro do backfill é apagado.
+"""
+
+import os
+import json
+import logging
+import threading
+import queue
+from datetime import datetime, timedelta
+
+from .config import ARQUIVO_JANELAS
+from .pipeline import ProgressoAgregado
+from .gravacao_disco import gravador_disco
+
+JANELA_DIA = "dia"
+JANELA_SEMANA = "semana"
+JANELA_MES = "mes"
+TAMANHOS_JANELA = (JANELA_DIA, JANELA_SEMANA, JANELA_MES)
+
+
+class JanelaIncompleta(Exception):
+    """Janela que terminou com pastas com erro: os boletos dela contam, mas ela fica pendente para a retomada."""
+
+    def __init__(self, sucesso, falha, pastas):
+        super().__init__(f"{len(pastas)} pasta(s) com erro: {', '.join(sorted(set(pastas)))}")
+        self.sucesso, self.falha = sucesso, falha
+
+
+def dividir_periodo(dt_inicio, dt_fim, tamanho):
+    """Lista de ``(inicio, fim)`` cobrindo ``[dt_inicio, dt_fim]``; cada fim é o último segundo da janela."""
+    if tamanho not in TAMANHOS_JANELA:
+        raise ValueError(f"Tamanho de janela inválido: {tamanho!r} (use {', '.join(TAMANHOS_JANELA)}).")
+    janelas = []
+    inicio = dt_inicio.replace(hour=0, minute=0, second=0, microsecond=0)
+    while inicio <= dt_fim:
+        if tamanho == JANELA_DIA:
+            proximo = inicio + timedelta(days=1)
+        elif tamanho == JANELA_SEMANA:
+            proximo = inicio + timedelta(days=7)
+        else:
+            proximo = (inicio.replace(day=1) + timedelta(days=32)).replace(day=1)
+        fim = min(proximo - timedelta(seconds=1), dt_fim)
+        janelas.append((max(inicio, dt_inicio), fim))
+        inicio = proximo
+    return janelas
+
+
+def _rotulo(janela):
+    inicio, fim = janela
+    return f"{inicio:%d/%m/%Y}-{fim:%d/%m/%Y}"
+
+
+class RegistroJanelas:
+    """Janelas concluídas de cada backfill em andamento (JSON, thread-safe)."""
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or ARQUIVO_JANELAS
+        self._lock = threading.Lock()
+        self._dados = {}
+        if os.path.exists(self.caminho):
+            try:
+                with open(self.caminho, "r", encoding="utf-8") as f:
+                    self._dados = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Registro de janelas ilegível em '{self.caminho}' ({e}). Iniciando do zero.")
+
+    @staticmethod
+    def chave(nome_fonte, dt_inicio, dt_fim, tamanho):
+        return f"{nome_fonte}|{dt_inicio:%Y%m%d}|{dt_fim:%Y%m%d}|{tamanho}"
+
+    def concluidas(self, chave):
+        with self._lock:
+            return dict(self._dados.get(chave, {}))
+
+    def concluir(self, chave, janela, sucesso, falha):
+        with self._lock:
+            self._dados.setdefault(chave, {})[_rotulo(janela)] = {
+                "sucesso": sucesso, "falha": falha, "concluida_em": datetime.now().isoformat(timespec="seconds"),
+            }
+            self._salvar()
+
+    def encerrar(self, chave):
+        with self._lock:
+            self._dados.pop(chave, None)
+            self._salvar()
+
+    def _salvar(self):
+        os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+        tmp = self.caminho + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._dados, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.caminho)
+
+
+def processar_em_janelas(fonte, dt_inicio, dt_fim, tamanho, simultaneas, executar_janela, status_callback, progress_callback,
+                         registro=None):
+    """
+    Executa ``executar_janela(sessao, inicio, fim, status_callback, progress_callback)`` para cada
+    janela pendente; deve devolver ``(sucesso, falha)`` ou levantar ``JanelaIncompleta`` se alguma
+    pasta não terminou (a janela fica pendente). Com ``simultaneas`` > 1, cada thread abre
+    sua própria sessão da fonte. Retorna ``(sucesso, falha, janelas_com_erro)``.
+    """
+    registro = registro or RegistroJanelas()
+    chave = RegistroJanelas.chave(fonte.nome, dt_inicio, dt_fim, tamanho)
+    janelas = dividir_periodo(dt_inicio, dt_fim, tamanho)
+    ja_concluidas = registro.concluidas(chave)
+    pendentes = [j for j in janelas if _rotulo(j) not in ja_concluidas]
+
+    sucesso_total = sum(r["sucesso"] for r in ja_concluidas.values())
+    falha_total = sum(r["falha"] for r in ja_concluidas.values())
+    if ja_concluidas:
+        status_callback(f"Retomando backfill: {len(ja_concluidas)} de {len(janelas)} janelas já concluídas.")
+    status_callback(f"Período dividido em {len(janelas)} janelas ({tamanho}); {len(pendentes)} a processar.")
+
+    progresso = ProgressoAgregado(progress_callback)
+    lock = threading.Lock()
+    resultados = {}
+    incompletas = [0, 0]  # boletos salvos em janelas que ficaram pendentes
+    com_erro = []
+    fila = queue.Queue()
+    for j in pendentes:
+        fila.put(j)
+
+    def rodar(sessao, janela):
+        numero = janelas.index(janela) + 1
+        rotulo = _rotulo(janela)
+        status_callback(f"--- Janela {numero}/{len(janelas)} ({rotulo}) ---")
+        try:
+            s, f = executar_janela(sessao, janela[0], janela[1], status_callback, progresso.da_pasta(numero))
+        except JanelaIncompleta as e:
+            logging.warning(f"Janela {rotulo} incompleta: {e}")
+            status_callback(f"⚠️ Janela {rotulo} incompleta ({e}); fica pendente: repita a busca para retomá-la.")
+            with lock:
+                com_erro.append(rotulo)
+                incompletas[0] += e.sucesso; incompletas[1] += e.falha
+            return
+        except Exception as e:
+            logging.error(f"Janela {rotulo} falhou: {e}", exc_info=True)
+            status_callback(f"⚠️ Janela {rotulo} falhou: {e}. As demais continuam; repita a busca para retomá-la.")
+            with lock: com_erro.append(rotulo)
+            return
+        # Janela concluída só com os boletos dela já no disco
+        gravador_disco().aguardar()
+        registro.concluir(chave, janela, s, f)
+        with lock: resultados[janela] = (s, f)
+        status_callback(f"Janela {rotulo} concluída: {s} boletos com UC, {f} sem UC.")
+
+    def trabalhador(compartilha_sessao):
+        sessao = None
+        if not compartilha_sessao: fonte.iniciar_thread()
+        try:
+            sessao = fonte if compartilha_sessao else fonte.nova_sessao()
+            while True:
+                try: janela = fila.get_nowait()
+                except queue.Empty: break
+                rodar(sessao, janela)
+        except Exception as e:
+            logging.error(f"Erro ao abrir sessão para processar janelas: {e}", exc_info=True)
+        finally:
+            if not compartilha_sessao:
+                if sessao is not None: sessao.fechar()
+                fonte.encerrar_thread()
+
+    if simultaneas <= 1:
+        trabalhador(compartilha_sessao=True)
+    else:
+        threads = [threading.Thread(target=trabalhador, args=(False,), name=f"boletos-janela-{i}", daemon=True)
+                   for i in range(min(simultaneas, max(1, len(pendentes))))]
+        for t in threads: t.start()
+        for t in threads: t.join()
+
+    # Janelas que sobraram na fila (sessões que não abriram) também ficam pendentes
+    while not fila.empty():
+        com_erro.append(_rotulo(fila.get_nowait()))
+    com_erro.sort(key=lambda r: datetime.strptime(r[:10], "%d/%m/%Y"))
+
+    for janela, (s, f) in sorted(resultados.items()):
+        logging.info(f"RESUMO DA JANELA {_rotulo(janela)}: Sucesso={s}, Falha={f}")
+        sucesso_total += s; falha_total += f
+    sucesso_total += incompletas[0]; falha_total += incompletas[1]
+
+    if com_erro:
+        logging.warning(f"Janelas pendentes após erro: {', '.join(com_erro)}")
+    else:
+        registro.encerrar(chave)
+    return sucesso_total, falha_total, com_erro
@@ -0,0 +1,351 @@
+"""
+Abstração de fontes de e-mail para o buscador de boletos.
+
+O pipeline de processamento (filtro de remetente, verificação do corpo, extração
+de anexos/zip, UC e gravação) trabalha apenas com as classes base deste módulo.
+Implementações disponíveis:
+
+- Outlook (``outlook_service.FonteOutlook``): pastas e itens vivos via COM.
+- Arquivos (``FonteArquivos``): arquivos .eml, .mbox e pastas Maildir exportados,
+  lidos direto do disco (roda sem Outlook, inclusive em Linux).
+- Memória (``FonteMemoria``): mensagens montadas em código, para benchmarks e
+  execuções reproduzíveis.
+"""
+
+import os
+import logging
+import mailbox
+from functools import cached_property
+from email import policy
+from email.parser import BytesParser
+from email.utils import parsedate_to_datetime, parseaddr
+
+from .tabela_mapi import ProvedorTabelaFake, ler_metadados
+from .conteudo import ConteudoAnexo
+
+CLASSE_EMAIL = 43  # olMail
+
+
+class AnexoEmail:
+    """
+    Anexo de uma mensagem. ``ler()`` só é chamado quando o conteúdo é necessário; nome,
+    tamanho, ``mime`` e ``content_id`` são metadados (pré-filtro antes do download).
+    """
+
+    def __init__(self, nome, conteudo=None, tamanho=None, mime="", content_id=""):
+        self.nome = nome or ""
+        self._conteudo = conteudo
+        self.tamanho = tamanho if tamanho is not None else (len(conteudo) if conteudo is not None else None)
+        self.mime = (mime or "").lower()
+        self.content_id = content_id or ""
+
+    def ler(self):
+        return self._conteudo
+
+    def conteudo(self):
+        """``conteudo.ConteudoAnexo`` com os bytes do anexo (None se vazio); quem recebe deve fechá-lo."""
+        dados = self.ler()
+        return ConteudoAnexo.de_bytes(dados) if dados else None
+
+
+class MensagemEmail:
+    """Visão neutra de um e-mail. As subclasses podem resolver os campos sob demanda."""
+
+    def __init__(self, assunto="", recebido_em=None, remetente="", corpo="", anexos=None,
+                 message_id="", entry_id="", classe=CLASSE_EMAIL):
+        self.assunto = assunto or ""
+        self.recebido_em = recebido_em
+        self.remetente = (remetente or "").lower()
+        self.corpo = corpo or ""
+        self.anexos = anexos or []
+        self.message_id = message_id or ""
+        self.entry_id = entry_id or ""
+        self.classe = classe
+
+    @property
+    def eh_email(self):
+        return self.classe == CLASSE_EMAIL
+
+
+class PastaEmails:
+    """Pasta de uma fonte. ``itens`` devolve ``(iterável, total)`` já restrito ao período quando possível."""
+
+    nome = ""
+    caminho = ""
+
+    @property
+    def chave(self):
+        """Identificador estável da pasta entre execuções (marcas de sincronização, caches)."""
+        return self.caminho
+
+    def itens(self, dt_inicio, dt_fim):
+        raise NotImplementedError
+
+    def metadados(self, dt_inicio, dt_fim):
+        """
+        Triagem em lote (``tabela_mapi.LinhaMetadados``): devolve ``(iterável, total)``
+        ou None se a fonte não oferece leitura tabular.
+        """
+        return None
+
+    def abrir(self, linha):
+        """Abre a mensagem completa de uma linha aprovada na triagem (None = descartar)."""
+        raise NotImplementedError
+
+    def subpastas(self):
+        return []
+
+    def estado(self):
+        """
+        ``{"itens": n, "modificada_em": texto}`` barato de obter, que muda quando o conteúdo
+        da pasta muda (``perfis.RegistroPerfis``). None se a fonte não sabe informar.
+        """
+        return None
+
+    def referencia(self):
+        """Token para reabrir esta pasta em outra sessão/thread (``FonteEmails.abrir_pasta``)."""
+        return self
+
+
+class FonteEmails:
+    """Ponto de entrada de uma fonte de e-mails (conta Outlook, exportação em disco...)."""
+
+    nome = ""
+    usa_com = False
+
+    def pasta_raiz(self):
+        raise NotImplementedError
+
+    def busca_indexada(self):
+        """
+        Pasta virtual com o resultado de uma busca única na conta inteira, ou None se a
+        fonte não oferece busca indexada (nesse caso a árvore é percorrida pasta a pasta).
+        """
+        return None
+
+    def nova_sessao(self):
+        """
+        Instância utilizável na thread atual. Fontes COM criam uma conexão própria (cada thread
+        tem seu apartment); as demais são compartilháveis e devolvem a si mesmas.
+        """
+        return self
+
+    def abrir_pasta(self, referencia):
+        """Reabre nesta sessão uma pasta obtida por ``PastaEmails.referencia()``."""
+        return referencia
+
+    def iniciar_thread(self):
+        """Preparação de uma thread nova antes de ``nova_sessao`` (ex.: CoInitialize)."""
+        pass
+
+    def encerrar_thread(self):
+        pass
+
+    def fechar(self):
+        pass
+
+
+# ---------------- Fonte em memória ----------------
+
+class PastaMemoria(PastaEmails):
+    def __init__(self, nome, mensagens=None, subpastas=None, caminho=None):
+        self.nome = nome
+        self.caminho = caminho or nome
+        self.mensagens = list(mensagens or [])
+        self._subpastas = list(subpastas or [])
+
+    def itens(self, dt_inicio, dt_fim):
+        return iter(self.mensagens), len(self.mensagens)
+
+    def metadados(self, dt_inicio, dt_fim):
+        # Mesma leitura tabular do Outlook, sobre um provedor fake
+        registros = [ProvedorTabelaFake.registro_de(m, str(i)) for i, m in enumerate(self.mensagens)]
+        return ler_metadados(ProvedorTabelaFake(registros), "")
+
+    def abrir(self, linha):
+        return self.mensagens[int(linha.entry_id)]
+
+    def subpastas(self):
+        return list(self._subpastas)
+
+    def estado(self):
+        return {"itens": len(self.mensagens), "modificada_em": None}
+
+
+class FonteMemoria(FonteEmails):
+    def __init__(self, raiz, nome="memoria"):
+        self.nome = nome
+        self._raiz = raiz
+
+    def pasta_raiz(self):
+        return self._raiz
+
+
+# ---------------- Fonte de arquivos (.eml / .mbox / Maildir) ----------------
+
+def _data_local(valor):
+    """Converte o cabeçalho Date para datetime local sem tzinfo (mesma convenção do Outlook)."""
+    if not valor:
+        return None
+    try:
+        dt = parsedate_to_datetime(str(valor))
+    except (TypeError, ValueError, IndexError):
+        return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone().replace(tzinfo=None)
+    return dt
+
+
+class MensagemArquivo(MensagemEmail):
+    """Mensagem RFC 822 vinda de .eml/.mbox/Maildir; o corpo e os anexos são decodificados sob demanda."""
+
+    def __init__(self, msg):
+        self._msg = msg
+        self.assunto = str(msg.get("Subject", "") or "")
+        self.recebido_em = _data_local(msg.get("Date"))
+        self.remetente = parseaddr(str(msg.get("From", "") or ""))[1].lower()
+        self.message_id = str(msg.get("Message-ID", "") or "").strip()
+        self.entry_id = ""
+        self.classe = CLASSE_EMAIL
+
+    @cached_property
+    def corpo(self):
+        parte = self._msg.get_body(preferencelist=("html", "plain"))
+        if parte is None:
+            return ""
+        try:
+            return parte.get_content()
+        except (LookupError, ValueError):
+            return (parte.get_payload(decode=True) or b"").decode("utf-8", errors="ignore")
+
+    @cached_property
+    def anexos(self):
+        anexos = []
+        for parte in self._msg.walk():
+            nome = parte.get_filename()
+            if not nome or parte.is_multipart():
+                continue
+            anexos.append(AnexoEmail(nome, parte.get_payload(decode=True) or b"", mime=parte.get_content_type(),
+                                     content_id=parte.get("Content-ID", "")))
+        return anexos
+
+
+def _parse_bytes(dados):
+    return BytesParser(policy=policy.default).parsebytes(dados)
+
+
+class PastaArquivos(PastaEmails):
+    """
+    Diretório exportado. Mensagens: arquivos .eml do diretório e, se for um Maildir,
+    os itens de cur/new. Subpastas: subdiretórios e arquivos .mbox (cada .mbox vira uma pasta).
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        # Subpastas Maildir++ são diretórios ".Nome"
+        self.nome = os.path.basename(os.path.normpath(caminho)).lstrip(".")
+
+    def _eh_maildir(self):
+        return all(os.path.isdir(os.path.join(self.caminho, d)) for d in ("cur", "new", "tmp"))
+
+    def _arquivos_eml(self):
+        return sorted(
+            os.path.join(self.caminho, n) for n in os.listdir(self.caminho)
+            if n.lower().endswith(".eml") and os.path.isfile(os.path.join(self.caminho, n))
+        )
+
+    def itens(self, dt_inicio, dt_fim):
+        arquivos = self._arquivos_eml()
+        chaves_maildir = []
+        if self._eh_maildir():
+            md = mailbox.Maildir(self.caminho, factory=None, create=False)
+            chaves_maildir = sorted(md.keys())
+
+        def gerar():
+            for arq in arquivos:
+                try:
+                    with open(arq, "rb") as f:
+                        yield MensagemArquivo(_parse_bytes(f.read()))
+                except OSError as e:
+                    logging.warning(f"Falha ao ler '{arq}': {e}")
+            if chaves_maildir:
+                md = mailbox.Maildir(self.caminho, factory=None, create=False)
+                for chave in chaves_maildir:
+                    try:
+                        yield MensagemArquivo(_parse_bytes(md.get_bytes(chave)))
+                    except (OSError, KeyError) as e:
+                        logging.warning(f"Falha ao ler item '{chave}' do Maildir '{self.caminho}': {e}")
+
+        return gerar(), len(arquivos) + len(chaves_maildir)
+
+    def estado(self):
+        # Criar/remover arquivos altera o mtime do diretório (e de cur/new no Maildir)
+        diretorios = [self.caminho]
+        if self._eh_maildir():
+            diretorios += [os.path.join(self.caminho, d) for d in ("cur", "new")]
+        itens = len(self._arquivos_eml()) + sum(len(os.listdir(d)) for d in diretorios[1:])
+        return {"itens": itens, "modificada_em": str(max(os.stat(d).st_mtime for d in diretorios))}
+
+    def subpastas(self):
+        ignorar = {"cur", "new", "tmp"} if self._eh_maildir() else set()
+        pastas = []
+        for nome in sorted(os.listdir(self.caminho)):
+            caminho = os.path.join(self.caminho, nome)
+            if os.path.isdir(caminho) and nome not in ignorar:
+                pastas.append(PastaArquivos(caminho))
+            elif os.path.isfile(caminho) and nome.lower().endswith(".mbox"):
+                pastas.append(PastaMbox(caminho))
+        return pastas
+
+
+class PastaMbox(PastaEmails):
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.nome = os.path.splitext(os.path.basename(caminho))[0]
+
+    def itens(self, dt_inicio, dt_fim):
+        mb = mailbox.mbox(self.caminho, factory=None, create=False)
+        chaves = list(mb.keys())
+
+        def gerar():
+            for chave in chaves:
+                try:
+                    yield MensagemArquivo(_parse_bytes(mb.get_bytes(chave)))
+                except (OSError, KeyError) as e:
+                    logging.warning(f"Falha ao ler item '{chave}' do mbox '{self.caminho}': {e}")
+            mb.close()
+
+        return gerar(), len(chaves)
+
+    def estado(self):
+        # Contar as mensagens exigiria ler o mbox inteiro; tamanho e mtime bastam
+        st = os.stat(self.caminho)
+        return {"itens": None, "modificada_em": f"{st.st_mtime}:{st.st_size}"}
+
+
+class PastaEmlUnico(PastaEmails):
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.nome = os.path.basename(caminho)
+
+    def itens(self, dt_inicio, dt_fim):
+        with open(self.caminho, "rb") as f:
+            msg = MensagemArquivo(_parse_bytes(f.read()))
+        return iter([msg]), 1
+
+
+class FonteArquivos(FonteEmails):
+    """Fonte baseada em exportações no disco: um .eml, um .mbox, um Maildir ou uma árvore de diretórios."""
+
+    def __init__(self, caminho):
+        if not os.path.exists(caminho):
+            raise FileNotFoundError(f"Fonte de e-mails não encontrada: {caminho}")
+        self.caminho = caminho
+        self.nome = os.path.basename(os.path.normpath(caminho))
+
+    def pasta_raiz(self):
+        if os.path.isdir(self.caminho):
+            return PastaArquivos(self.caminho)
+        if self.caminho.lower().endswith(".mbox"):
+            return PastaMbox(self.caminho)
+        return PastaEmlUnico(self.caminho)
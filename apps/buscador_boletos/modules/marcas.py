@@ -0,0 +1,139 @@
+"""
+Marcas de sincronização incremental por pasta.
+
+Para cada pasta (chave = StoreID + EntryID no Outlook, caminho nas fontes de arquivo)
+guarda o ReceivedTime mais recente já processado, os identificadores dos itens
+recebidos exatamente nesse instante e o período contínuo já varrido (``coberto``). No
+modo incremental a busca começa na marca e ignora esses itens, em vez de reprocessar
+todo o período, mas só quando o período pedido começa dentro do já varrido: um período
+anterior (ex.: um mês antigo) é lido inteiro.
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from .config import ARQUIVO_MARCAS
+
+MODO_COMPLETO = "completo"
+MODO_INCREMENTAL = "incremental"
+
+_FORMATO = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+def id_item(item):
+    return item.entry_id or item.message_id
+
+
+def _unir_periodos(atual, novo):
+    """Período contínuo coberto depois de varrer ``novo``: a união se se tocam; senão o mais recente."""
+    if atual is None:
+        return novo
+    if novo is None:
+        return atual
+    if novo[0] <= atual[1] + timedelta(seconds=1) and atual[0] <= novo[1] + timedelta(seconds=1):
+        return min(atual[0], novo[0]), max(atual[1], novo[1])
+    return novo if novo[1] > atual[1] else atual
+
+
+class MarcaPasta:
+    def __init__(self, ultimo_recebido=None, ids_no_limite=None, coberto=None):
+        self.ultimo_recebido = ultimo_recebido
+        self.ids_no_limite = set(ids_no_limite or [])
+        # (inicio, fim) já varrido sem lacunas; a marca só vale para períodos que começam dentro dele
+        self.coberto = coberto
+
+    def cobre(self, dt_inicio):
+        """True se tudo entre ``dt_inicio`` e a marca já foi varrido (a leitura pode começar na marca)."""
+        if self.ultimo_recebido is None or self.coberto is None:
+            return False
+        return self.coberto[0] <= dt_inicio and self.ultimo_recebido <= self.coberto[1]
+
+    def cobrir(self, dt_inicio, dt_fim):
+        """Registra a varredura completa de ``[dt_inicio, dt_fim]`` (o futuro ainda não foi varrido)."""
+        self.coberto = _unir_periodos(self.coberto, (dt_inicio, min(dt_fim, datetime.now())))
+
+    def ja_processado(self, recebido_em, identificador):
+        if self.ultimo_recebido is None or recebido_em is None:
+            return False
+        if recebido_em < self.ultimo_recebido:
+            return True
+        return recebido_em == self.ultimo_recebido and identificador in self.ids_no_limite
+
+    def avancar(self, recebido_em, identificador):
+        if recebido_em is None:
+            return
+        if self.ultimo_recebido is None or recebido_em > self.ultimo_recebido:
+            self.ultimo_recebido = recebido_em
+            self.ids_no_limite = {identificador}
+        elif recebido_em == self.ultimo_recebido:
+            self.ids_no_limite.add(identificador)
+
+
+class RegistroMarcas:
+    """Marcas de todas as pastas, persistidas em JSON (gravação atômica, thread-safe)."""
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or ARQUIVO_MARCAS
+        self._lock = threading.RLock()
+        self._dados = {}
+        if os.path.exists(self.caminho):
+            try:
+                with open(self.caminho, "r", encoding="utf-8") as f:
+                    self._dados = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Marcas de sincronização ilegíveis em '{self.caminho}' ({e}). Iniciando do zero.")
+
+    def marca(self, pasta):
+        with self._lock:
+            d = self._dados.get(pasta.chave)
+        if not d or not d.get("ultimo_recebido"):
+            return MarcaPasta()
+        # Marcas antigas, sem "coberto", não valem para pular nada: a próxima leitura registra o período
+        coberto = tuple(datetime.strptime(x, _FORMATO) for x in d["coberto"]) if d.get("coberto") else None
+        return MarcaPasta(datetime.strptime(d["ultimo_recebido"], _FORMATO), d.get("ids_no_limite"), coberto)
+
+    def aplica(self, pasta, dt_inicio, modo):
+        """True se a leitura de ``pasta`` a partir de ``dt_inicio`` pode usar a marca (incremental e período já coberto)."""
+        return modo == MODO_INCREMENTAL and self.marca(pasta).cobre(dt_inicio)
+
+    def inicio_efetivo(self, pasta, dt_inicio, modo):
+        """Início da leitura da pasta: a marca no modo incremental (se posterior a ``dt_inicio`` e o intervalo já foi varrido)."""
+        marca = self.marca(pasta)
+        if self.aplica(pasta, dt_inicio, modo) and marca.ultimo_recebido > dt_inicio:
+            return marca.ultimo_recebido
+        return dt_inicio
+
+    def atualizar(self, pasta, marca):
+        """
+        Grava a marca da pasta; nunca recua (janelas antigas podem terminar depois das recentes)
+        e o período coberto é unido ao já gravado.
+        """
+        if marca.ultimo_recebido is None:
+            return
+        with self._lock:
+            atual = self.marca(pasta)
+            coberto = _unir_periodos(atual.coberto, marca.coberto)
+            if atual.ultimo_recebido is not None:
+                if atual.ultimo_recebido > marca.ultimo_recebido:
+                    marca = atual
+                elif atual.ultimo_recebido == marca.ultimo_recebido:
+                    marca = MarcaPasta(marca.ultimo_recebido, marca.ids_no_limite | atual.ids_no_limite)
+            self._dados[pasta.chave] = {
+                "pasta": pasta.caminho,
+                "entry_id": getattr(pasta, "entry_id", ""),
+                "store_id": getattr(pasta, "store_id", ""),
+                "ultimo_recebido": marca.ultimo_recebido.strftime(_FORMATO),
+                "ids_no_limite": sorted(marca.ids_no_limite),
+                "coberto": [d.strftime(_FORMATO) for d in coberto] if coberto else None,
+            }
+
+    def salvar(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+            tmp = self.caminho + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._dados, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.caminho)
@@ -0,0 +1,210 @@
+"""
+Tempo gasto em cada etapa da busca de boletos.
+
+``medir(etapa)`` cronometra um trecho e acumula contagem, tempo total, máximo e um
+histograma por ordem de grandeza, no total da execução e na pasta em andamento
+(``na_pasta`` vale para a thread atual; as cargas do pipeline levam a pasta consigo).
+Fora de uma execução (``iniciar_execucao``) nada é registrado. Ao final, ``exportar``
+grava o JSON ao lado do log e ``resumo`` lista as etapas que mais consumiram tempo.
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from .config import PASTA_LOGS
+
+ETAPAS = {
+    "restrict": "Restrict/GetTable (filtro no Outlook)",
+    "enumeracao": "Enumeração dos itens",
+    "abrir_item": "Abertura do item por EntryID",
+    "remetente": "Resolução do remetente",
+    "corpo": "Leitura e normalização do corpo",
+    "anexo": "Download do anexo",
+    "zip": "Extração de ZIP",
+    "hash": "SHA-256 do anexo",
+    "pdf_parse": "Leitura do texto do PDF",
+    "uc_regex": "Regex da UC",
+    "nome": "Extração do nome do cliente",
+    "gravacao": "Gravação em disco",
+}
+
+# Limites superiores (segundos) das faixas do histograma; a última faixa é ">= 10s"
+FAIXAS = (0.001, 0.01, 0.1, 1.0, 10.0)
+ROTULOS_FAIXAS = ("<1ms", "<10ms", "<100ms", "<1s", "<10s", ">=10s")
+
+
+class EstatisticaEtapa:
+    def __init__(self):
+        self.contagem = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self.histograma = [0] * len(ROTULOS_FAIXAS)
+
+    def registrar(self, segundos):
+        self.contagem += 1
+        self.total += segundos
+        self.maximo = max(self.maximo, segundos)
+        self.histograma[next((i for i, limite in enumerate(FAIXAS) if segundos < limite), len(FAIXAS))] += 1
+
+    def para_dict(self):
+        return {
+            "contagem": self.contagem,
+            "total_s": round(self.total, 4),
+            "media_ms": round(1000 * self.total / self.contagem, 3) if self.contagem else 0.0,
+            "maximo_ms": round(1000 * self.maximo, 3),
+            "histograma": dict(zip(ROTULOS_FAIXAS, self.histograma)),
+        }
+
+
+class Metricas:
+    """Métricas de uma execução (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.iniciado_em = datetime.now()
+        self._inicio = time.perf_counter()
+        self.por_etapa = {}
+        self.por_pasta = {}
+        self.anotacoes = {}
+        self.contagens = {}
+
+    def registrar(self, etapa, segundos, pasta=None):
+        with self._lock:
+            self.por_etapa.setdefault(etapa, EstatisticaEtapa()).registrar(segundos)
+            if pasta:
+                self.por_pasta.setdefault(pasta, {}).setdefault(etapa, EstatisticaEtapa()).registrar(segundos)
+
+    def anotar(self, chave, valor):
+        """Valor avulso exportado junto com as etapas (ex.: pico de memória)."""
+        with self._lock:
+            self.anotacoes[chave] = valor
+
+    def contar(self, chave, quantidade=1):
+        with self._lock:
+            self.contagens[chave] = self.contagens.get(chave, 0) + quantidade
+
+    def mais_lentas(self, n=5):
+        """``[(etapa, total_s, contagem), ...]`` em ordem decrescente de tempo total."""
+        with self._lock:
+            itens = [(etapa, e.total, e.contagem) for etapa, e in self.por_etapa.items()]
+        return sorted(itens, key=lambda x: -x[1])[:n]
+
+    def para_dict(self):
+        with self._lock:
+            return {
+                "iniciado_em": self.iniciado_em.isoformat(timespec="seconds"),
+                "duracao_s": round(time.perf_counter() - self._inicio, 3),
+                "etapas": {etapa: e.para_dict() for etapa, e in self.por_etapa.items()},
+                "pastas": {pasta: {etapa: e.para_dict() for etapa, e in etapas.items()}
+                           for pasta, etapas in self.por_pasta.items()},
+                "anotacoes": dict(self.anotacoes),
+                "contagens": dict(sorted(self.contagens.items())),
+                "descricoes": ETAPAS,
+            }
+
+    def exportar(self, pasta_logs=None):
+        """Grava ``metricas_buscador_AAAAMMDD_HHMMSS.json`` na pasta de logs e devolve o caminho."""
+        pasta_logs = pasta_logs or PASTA_LOGS
+        os.makedirs(pasta_logs, exist_ok=True)
+        caminho = os.path.join(pasta_logs, f"metricas_buscador_{self.iniciado_em:%Y%m%d_%H%M%S}.json")
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(self.para_dict(), f, ensure_ascii=False, indent=1)
+        return caminho
+
+    def resumo(self, n=5):
+        linhas = ["Etapas que mais consumiram tempo:"]
+        for etapa, total, contagem in self.mais_lentas(n):
+            linhas.append(f"   {ETAPAS.get(etapa, etapa)}: {total:.2f}s em {contagem} chamadas")
+        return "\n".join(linhas) if len(linhas) > 1 else "Nenhuma etapa cronometrada."
+
+
+class ColetaAmostras:
+    """Medições cruas de um processo auxiliar, repassadas ao processo principal (``incorporar``)."""
+
+    def __init__(self):
+        self.amostras = []
+        self.contagens = {}
+
+    def registrar(self, etapa, segundos, pasta=None):
+        self.amostras.append((etapa, segundos))
+
+    def contar(self, chave, quantidade=1):
+        self.contagens[chave] = self.contagens.get(chave, 0) + quantidade
+
+
+_execucao = None
+_local = threading.local()
+
+
+def iniciar_execucao():
+    global _execucao
+    _execucao = Metricas()
+    return _execucao
+
+
+def iniciar_coleta():
+    """Em um processo auxiliar: passa a guardar as medições em uma ``ColetaAmostras`` nova."""
+    global _execucao
+    _execucao = ColetaAmostras()
+    return _execucao
+
+
+def incorporar(amostras, contagens):
+    """Soma à execução atual (na pasta desta thread) as medições vindas de um processo auxiliar."""
+    if _execucao is None:
+        return
+    for etapa, segundos in amostras:
+        _execucao.registrar(etapa, segundos, pasta_atual())
+    for chave, quantidade in contagens.items():
+        _execucao.contar(chave, quantidade)
+
+
+def execucao_atual():
+    return _execucao
+
+
+def pasta_atual():
+    return getattr(_local, "pasta", None)
+
+
+@contextmanager
+def na_pasta(pasta):
+    """Atribui à ``pasta`` (caminho) as medições feitas nesta thread dentro do bloco."""
+    anterior = pasta_atual()
+    _local.pasta = pasta
+    try:
+        yield
+    finally:
+        _local.pasta = anterior
+
+
+def contar(chave, quantidade=1):
+    """Contador avulso da execução atual (ex.: página em que a UC foi achada)."""
+    if _execucao is not None:
+        _execucao.contar(chave, quantidade)
+
+
+@contextmanager
+def medir(etapa):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _execucao is not None:
+            _execucao.registrar(etapa, time.perf_counter() - inicio, pasta_atual())
+
+
+def medir_iteracao(iteravel, etapa):
+    """Repassa os elementos de ``iteravel`` cronometrando cada avanço (ex.: enumeração de Items do COM)."""
+    iterador = iter(iteravel)
+    while True:
+        with medir(etapa):
+            try:
+                elemento = next(iterador)
+            except StopIteration:
+                return
+        yield elemento
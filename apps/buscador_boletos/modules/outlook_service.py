@@ -1,20 +1,57 @@
 import os
-import re
+import time
 import logging
-import zipfile
-import win32com.client
-import pythoncom
-from pywintypes import com_error
-from datetime import datetime, timedelta
-from io import BytesIO
+import tempfile
+from threading import Thread
+from datetime import datetime
+from functools import cached_property
+
+try:
+    import win32com.client
+    import pythoncom
+    from pywintypes import com_error
+except ImportError:  # Sem pywin32 (ex.: Linux): apenas fontes de arquivo/memória ficam disponíveis
+    win32com = pythoncom = None
+
+    class com_error(Exception):
+        pass
 
 from .config import (
-    NOME_CONTA_OUTLOOK, PASTA_SAIDA_BOLETOS, PASTA_SAIDA_FALHAS,
-    DOMINIO_REMETENTE_VALIDO, PASTAS_BANIDAS
+    NOME_CONTA_OUTLOOK, CONTAS_OUTLOOK, PASTA_SAIDA_BOLETOS, PASTA_SAIDA_FALHAS, PASTAS_BANIDAS,
+    ESTRATEGIA_BUSCA, TIMEOUT_BUSCA_INDEXADA,
+    PIPELINE_PARALELO, PRODUTORES_COM, TRABALHADORES_PDF, TAMANHO_FILA_PIPELINE,
+    JANELA_BUSCA, JANELAS_SIMULTANEAS, LIMITE_ANEXO_EM_MEMORIA, ACERVO_ATIVO
 )
-from .utils import normaliza, _to_bytes, _iso, hash_bytes
-from .pdf_processor import extrair_uc_do_pdf, extrair_nome_do_pdf
-from .file_manager import salvar_bytes, carregar_hashes_existentes
+from .utils import _to_bytes
+from .indice_hashes import indice_hashes
+from .mail_source import AnexoEmail, MensagemEmail, PastaEmails, FonteEmails
+from .processamento import percorrer_e_processar_pasta, listar_pastas
+from .pipeline import executar_pipeline, ProgressoAgregado, StatusSincronizado
+from .tabela_mapi import ler_metadados, ler_tabela
+from .filtro_dasl import aplicar_em_cascata
+from .marcas import RegistroMarcas, MODO_COMPLETO
+from .perfis import RegistroPerfis
+from .janelas import processar_em_janelas, JanelaIncompleta, RegistroJanelas
+from .indice_mensagens import IndiceMensagens
+from .metricas import iniciar_execucao
+from .processos_pdf import analisador_pdf
+from .senhas_pdf import registro_senhas
+from .gravacao_disco import gravador_disco
+from .acervo import acervo
+from .fila_ocr import fila_ocr
+from .conteudo import ConteudoAnexo, reiniciar_pico, pico_memoria, anexos_em_disco
+
+ESTRATEGIA_AUTO = "auto"
+ESTRATEGIA_INDEXADA = "indexada"
+ESTRATEGIA_RECURSIVA = "recursiva"
+
+PROP_ATTACH_DATA_BIN = "http://schemas.microsoft.com/mapi/proptag/0x37010102"
+PROP_ATTACH_MIME_TAG = "http://schemas.microsoft.com/mapi/proptag/0x370E001F"
+PROP_ATTACH_CONTENT_ID = "http://schemas.microsoft.com/mapi/proptag/0x3712001F"
+PROP_CONTENT_COUNT = "http://schemas.microsoft.com/mapi/proptag/0x36020003"
+PROP_LOCAL_COMMIT_TIME_MAX = "http://schemas.microsoft.com/mapi/proptag/0x670A0040"
+PROP_LAST_MODIFICATION_TIME = "http://schemas.microsoft.com/mapi/proptag/0x30080040"
+
 
 def get_sender_smtp(message):
     try:
@@ -29,134 +66,256 @@ def get_sender_smtp(message):
         return (message.SenderEmailAddress or "").lower()
     except Exception: return ""
 
-def percorrer_e_processar_pasta(pasta, dt_inicio, dt_fim, status_callback, progress_callback, arquivos_salvos, hashes_salvos):
-    sucesso_total, falha_total = 0, 0
-    status_callback(f"Analisando pasta: {pasta.FolderPath}")
-    logging.info(f"--- ANALISANDO PASTA: {pasta.FolderPath} ---")
-    
-    motivos = {"nao_mail": 0, "fora_periodo": 0, "remetente": 0, "corpo": 0, "sem_anexo_valido": 0, "duplicata_hash": 0, "falha_uc": 0}
 
-    try:
-        items = pasta.Items
-        items.Sort("[ReceivedTime]", True)
-        
-        dt_inicio_sql = (dt_inicio - timedelta(days=1)); dt_fim_sql = (dt_fim + timedelta(days=1))
-        
-        filtro_data_dasl = (f"@SQL=(\"urn:schemas:httpmail:datereceived\" >= '{_iso(dt_inicio_sql)}' AND "
-                          f"\"urn:schemas:httpmail:datereceived\" <= '{_iso(dt_fim_sql)}' AND "
-                          f"\"urn:schemas:httpmail:messageclass\" = 'IPM.Note')")
-        
-        items = items.Restrict(filtro_data_dasl)
-        total_filtrado = items.Count
-        status_callback(f"   {total_filtrado} e-mails no período (pré-filtro por data). Processando...")
-        logging.info(f"{total_filtrado} e-mails pré-filtrados (apenas por data) encontrados na pasta.")
+# ---------------- Adaptadores COM -> mail_source ----------------
+# Cada propriedade é lida do COM apenas quando o pipeline a consulta, preservando
+# o descarte antecipado (itens rejeitados pelo remetente nunca têm o corpo lido).
 
-    except Exception as e:
-        logging.error(f"Erro ao aplicar filtro de data MAPI em '{pasta.Name}': {e}. Usando fallback (mais lento).")
-        items = pasta.Items; total_filtrado = items.Count
+class AnexoOutlook(AnexoEmail):
+    def __init__(self, att):
+        self._att = att
+        self.nome = str(att.FileName or "")
+        # Tamanho do anexo no store (metadado, não baixa o conteúdo); usado na chave do índice de mensagens
+        try: self.tamanho = int(att.Size)
+        except Exception: self.tamanho = None
 
-    progress_callback(0, total_filtrado, "")
-    for i, item in enumerate(items):
-        progress_callback(i + 1, total_filtrado, f"Analisando e-mail {i+1} de {total_filtrado}")
+    @cached_property
+    def _metadados(self):
+        # Uma ida ao COM para os dois; propriedades ausentes voltam como erro (não como exceção)
         try:
-            email_id = f"Assunto: '{getattr(item, 'Subject', 'N/A')}'"
-            
-            if getattr(item, "Class", 0) != 43:
-                motivos["nao_mail"] += 1; continue
-
-            received_time = item.ReceivedTime.replace(tzinfo=None)
-            if not (dt_inicio <= received_time <= dt_fim):
-                motivos["fora_periodo"] += 1; continue
-            
-            sender = get_sender_smtp(item)
-            if not sender.endswith(DOMINIO_REMETENTE_VALIDO):
-                motivos["remetente"] += 1; continue
-            
-            corpo_raw = (getattr(item, "HTMLBody", "") or "") or (item.Body or "")
-            if "solicitacao de pagamento" not in normaliza(corpo_raw):
-                motivos["corpo"] += 1; continue
-
-            anexo_alvo_bytes = None
-            if item.Attachments.Count > 0:
-                for att in item.Attachments:
-                    fname = str(att.FileName or "").lower()
-                    if (fname.startswith("boleto") and fname.endswith(".pdf")):
-                        anexo_alvo_bytes = _to_bytes(att.PropertyAccessor.GetProperty("http://schemas.microsoft.com/mapi/proptag/0x37010102"))
-                        if anexo_alvo_bytes: break
-                    
-                    if fname.endswith(".zip"):
-                        try:
-                            zbytes_data = _to_bytes(att.PropertyAccessor.GetProperty("http://schemas.microsoft.com/mapi/proptag/0x37010102"))
-                            if zbytes_data:
-                                with zipfile.ZipFile(BytesIO(zbytes_data)) as zf:
-                                    for n in zf.namelist():
-                                        if n.lower().startswith("boleto") and n.lower().endswith(".pdf"):
-                                            anexo_alvo_bytes = zf.read(n); break
-                        except (zipfile.BadZipFile, RuntimeError) as e:
-                            logging.warning(f"ZIP inválido/protegido '{fname}' no e-mail {email_id}: {e}")
-                        if anexo_alvo_bytes: break
-
-            if anexo_alvo_bytes:
-                h = hash_bytes(anexo_alvo_bytes)
-                if h in hashes_salvos:
-                    motivos["duplicata_hash"] += 1; continue
-                
-                logging.info(f"PROCESSANDO ANEXO VÁLIDO de {email_id}")
-                uc = extrair_uc_do_pdf(BytesIO(anexo_alvo_bytes))
-                
-                if uc:
-                    # Extrair nome do cliente para o arquivo
-                    nome_cliente = extrair_nome_do_pdf(BytesIO(anexo_alvo_bytes))
-                    nome_cliente_safe = re.sub(r'[\\/*?:"<>|]', "", nome_cliente)[:50].strip()
-                    
-                    # Data do recebimento do e-mail para evitar duplicatas de competência
-                    data_email_str = item.ReceivedTime.strftime("%Y%m%d")
-                    
-                    nome_arquivo = f"{uc}_{nome_cliente_safe}_{data_email_str}.pdf"
-                    caminho = os.path.join(PASTA_SAIDA_BOLETOS, nome_arquivo)
-                    
-                    if salvar_bytes(caminho, anexo_alvo_bytes):
-                        logging.info(f"-> SUCESSO: Boleto salvo em: {caminho}")
-                        arquivos_salvos.add(nome_arquivo); hashes_salvos.add(h); sucesso_total += 1
-                    else: logging.warning(f"-> AVISO: O arquivo com nome '{nome_arquivo}' já existe no disco.")
-                else:
-                    motivos["falha_uc"] += 1; falha_total += 1
-                    timestamp = item.ReceivedTime.strftime("%Y%m%d_%H%M%S"); safe_subject = re.sub(r'[\\/*?:"<>|]', "", item.Subject)[:50]
-                    nome_arquivo_falha = f"{timestamp}_{safe_subject}.pdf"; caminho_falha = os.path.join(PASTA_SAIDA_FALHAS, nome_arquivo_falha)
-                    if salvar_bytes(caminho_falha, anexo_alvo_bytes):
-                        logging.warning(f"-> FALHA DE UC: Salvo para análise em: {caminho_falha}")
-            else:
-                motivos["sem_anexo_valido"] += 1
-        except Exception as e_item:
-            logging.error(f"Erro inesperado ao processar um item individual: {e_item}")
-
-    logging.info(f"RESUMO DA PASTA '{pasta.Name}': Sucesso={sucesso_total}, Falha={falha_total}, Descartes={motivos}")
-    if sum(motivos.values()) > 0: status_callback(f"Descartes em '{pasta.Name}': {sum(motivos.values())} (Ver log)")
-
-    for subpasta in pasta.Folders:
-        if str(subpasta.Name).strip().lower() in PASTAS_BANIDAS:
-            logging.info(f"Ignorando pasta banida: {subpasta.FolderPath}")
-            continue
-        s, f = percorrer_e_processar_pasta(subpasta, dt_inicio, dt_fim, status_callback, progress_callback, arquivos_salvos, hashes_salvos)
-        sucesso_total += s; falha_total += f
-    return sucesso_total, falha_total
-
-def buscar_e_salvar_boletos(data_inicio_str, data_fim_str, status_callback, progress_callback, completion_callback):
-    pythoncom.CoInitialize()
-    try:
-        os.makedirs(PASTA_SAIDA_BOLETOS, exist_ok=True); os.makedirs(PASTA_SAIDA_FALHAS, exist_ok=True)
-        dt_inicio = datetime.strptime(data_inicio_str, "%d/%m/%Y")
-        dt_fim = datetime.strptime(data_fim_str, "%d/%m/%Y").replace(hour=23, minute=59, second=59)
-        logging.info(f"Iniciando busca de {data_inicio_str} a {data_fim_str}.")
-        status_callback("Conectando ao Outlook...")
-        outlook_ns = win32com.client.Dispatch("Outlook.Application").GetNamespace("MAPI")
-        
+            valores = self._att.PropertyAccessor.GetProperties([PROP_ATTACH_MIME_TAG, PROP_ATTACH_CONTENT_ID])
+        except Exception:
+            return "", ""
+        return tuple(v if isinstance(v, str) else "" for v in valores)
+
+    @cached_property
+    def mime(self): return self._metadados[0].lower()
+
+    @cached_property
+    def content_id(self): return self._metadados[1]
+
+    def ler(self):
+        return _to_bytes(self._att.PropertyAccessor.GetProperty(PROP_ATTACH_DATA_BIN))
+
+    def conteudo(self):
+        if self.tamanho is None or self.tamanho <= LIMITE_ANEXO_EM_MEMORIA:
+            return super().conteudo()
+        # Anexo grande: o Outlook grava direto em disco, sem passar o blob inteiro pelo COM/Python
+        fd, caminho = tempfile.mkstemp(prefix="boleto_", suffix=os.path.splitext(self.nome)[1])
+        os.close(fd)
+        try:
+            self._att.SaveAsFile(caminho)
+            return ConteudoAnexo.de_arquivo_temporario(caminho)
+        except Exception:
+            os.remove(caminho)
+            raise
+
+
+class MensagemOutlook(MensagemEmail):
+    def __init__(self, item, linha=None):
+        self._item = item
+        if linha is not None:
+            # Reaproveita as colunas já lidas na triagem em vez de consultar o COM de novo
+            self.__dict__.update(classe=43, recebido_em=linha.recebido_em, entry_id=linha.entry_id)
+            if linha.remetente: self.remetente = linha.remetente
+
+    @cached_property
+    def classe(self): return getattr(self._item, "Class", 0)
+
+    @cached_property
+    def assunto(self): return getattr(self._item, "Subject", "") or ""
+
+    @cached_property
+    def recebido_em(self): return self._item.ReceivedTime.replace(tzinfo=None)
+
+    @cached_property
+    def remetente(self): return get_sender_smtp(self._item)
+
+    @cached_property
+    def corpo(self): return (getattr(self._item, "HTMLBody", "") or "") or (self._item.Body or "")
+
+    @cached_property
+    def anexos(self):
+        if self._item.Attachments.Count == 0: return []
+        return [AnexoOutlook(att) for att in self._item.Attachments]
+
+    @cached_property
+    def message_id(self): return getattr(self._item, "InternetMessageID", "") or ""
+
+    @cached_property
+    def entry_id(self): return getattr(self._item, "EntryID", "") or ""
+
+
+class PastaOutlook(PastaEmails):
+    # Nível DASL aceito por cada store; as próximas pastas da mesma store começam por ele
+    _nivel_por_store = {}
+
+    def __init__(self, pasta):
+        self._pasta = pasta
+        self.nome = str(pasta.Name)
+        self.caminho = str(pasta.FolderPath)
+
+    @cached_property
+    def entry_id(self): return str(self._pasta.EntryID)
+
+    @cached_property
+    def store_id(self):
+        try: return str(self._pasta.StoreID)
+        except Exception: return ""
+
+    @property
+    def chave(self): return f"{self.store_id}:{self.entry_id}"
+
+    def _em_cascata(self, aplicar, dt_inicio, dt_fim):
+        store_id = self.store_id
+        resultado, nivel = aplicar_em_cascata(aplicar, dt_inicio, dt_fim, self.nome,
+                                              nivel_inicial=PastaOutlook._nivel_por_store.get(store_id))
+        PastaOutlook._nivel_por_store[store_id] = nivel
+        return resultado
+
+    def itens(self, dt_inicio, dt_fim):
+        def restringir(filtro):
+            items = self._pasta.Items
+            items.Sort("[ReceivedTime]", True)
+            items = items.Restrict(filtro)
+            return items, items.Count
+
+        try:
+            items, total_filtrado = self._em_cascata(restringir, dt_inicio, dt_fim)
+            logging.info(f"{total_filtrado} e-mails pré-filtrados encontrados na pasta.")
+
+        except Exception as e:
+            logging.error(f"Erro ao aplicar filtro de data MAPI em '{self.nome}': {e}. Usando fallback (mais lento).")
+            items = self._pasta.Items; total_filtrado = items.Count
+
+        return (MensagemOutlook(item) for item in items), total_filtrado
+
+    def metadados(self, dt_inicio, dt_fim):
+        try:
+            linhas, total = self._em_cascata(lambda filtro: ler_metadados(self._pasta, filtro), dt_inicio, dt_fim)
+            logging.info(f"{total} e-mails pré-filtrados (tabela MAPI) encontrados na pasta.")
+            return linhas, total
+        except Exception as e:
+            logging.warning(f"GetTable indisponível em '{self.nome}': {e}. Usando leitura item a item.")
+            return None
+
+    def abrir(self, linha):
+        item = self._pasta.Session.GetItemFromID(linha.entry_id, self._pasta.StoreID)
+        return MensagemOutlook(item, linha)
+
+    def subpastas(self):
+        return [PastaOutlook(p) for p in self._pasta.Folders]
+
+    def estado(self):
+        # Propriedades da própria pasta: não abre a coleção Items
+        try:
+            acessor = self._pasta.PropertyAccessor
+            itens = int(acessor.GetProperty(PROP_CONTENT_COUNT))
+        except Exception:
+            return None
+        for prop in (PROP_LOCAL_COMMIT_TIME_MAX, PROP_LAST_MODIFICATION_TIME):
+            try:
+                return {"itens": itens, "modificada_em": str(acessor.GetProperty(prop))}
+            except Exception:
+                continue
+        return {"itens": itens, "modificada_em": None}
+
+    def referencia(self):
+        return (self.entry_id, self.store_id)
+
+
+class _EventosOutlook:
+    """Recebe o AdvancedSearchComplete (a AdvancedSearch é assíncrona)."""
+    buscas_concluidas = set()
+
+    def OnAdvancedSearchComplete(self, search):
+        _EventosOutlook.buscas_concluidas.add(str(win32com.client.Dispatch(search).Tag))
+
+
+class PastaBuscaOutlook(PastaEmails):
+    """
+    Resultado de uma AdvancedSearch (índice do Outlook) sobre a Caixa de Entrada e todas as
+    subpastas, tratado como uma única pasta virtual. Itens de pastas em PASTAS_BANIDAS são
+    descartados ao abrir, pelo caminho da pasta de origem.
+    """
+
+    def __init__(self, fonte):
+        self._fonte = fonte
+        raiz = fonte.caixa_entrada
+        self._raiz_caminho = str(raiz.FolderPath)
+        self.nome = f"Busca indexada ({fonte.nome})"
+        self.caminho = f"{self._raiz_caminho} [busca indexada]"
+        self.entry_id = str(raiz.EntryID)
+        self.store_id = str(raiz.StoreID)
+        self._tabela = None
+        self._banida_por_pasta = {}
+
+    @property
+    def chave(self): return f"busca:{self.store_id}:{self.entry_id}"
+
+    def _buscar(self, filtro, timeout):
+        tag = f"egs_boletos_{time.time_ns()}"
+        escopo = f"'{self._raiz_caminho}'"
+        # AdvancedSearch recebe a condição DASL sem o prefixo @SQL=
+        busca = self._fonte.aplicacao.AdvancedSearch(escopo, filtro[len("@SQL="):], True, tag)
+        limite = time.monotonic() + timeout
+        while tag not in _EventosOutlook.buscas_concluidas:
+            if time.monotonic() > limite:
+                busca.Stop()
+                raise TimeoutError(f"Busca indexada não concluiu em {timeout}s.")
+            pythoncom.PumpWaitingMessages(); time.sleep(0.05)
+        _EventosOutlook.buscas_concluidas.discard(tag)
+        tabela = busca.GetTable()
+        return tabela, tabela.GetRowCount()
+
+    def executar(self, dt_inicio, dt_fim, timeout=TIMEOUT_BUSCA_INDEXADA):
+        self._tabela, total = aplicar_em_cascata(lambda filtro: self._buscar(filtro, timeout), dt_inicio, dt_fim, self.nome)[0]
+        logging.info(f"Busca indexada retornou {total} e-mails candidatos.")
+        return total
+
+    def metadados(self, dt_inicio, dt_fim):
+        return ler_tabela(self._tabela)
+
+    def itens(self, dt_inicio, dt_fim):
+        return iter(()), 0
+
+    def _pasta_banida(self, item):
+        caminho = str(item.Parent.FolderPath)
+        if caminho not in self._banida_por_pasta:
+            relativo = caminho[len(self._raiz_caminho):] if caminho.startswith(self._raiz_caminho) else caminho
+            self._banida_por_pasta[caminho] = any(p.strip().lower() in PASTAS_BANIDAS for p in relativo.split("\\") if p)
+        return self._banida_por_pasta[caminho]
+
+    def abrir(self, linha):
+        item = self._fonte.namespace.GetItemFromID(linha.entry_id, self.store_id)
+        if self._pasta_banida(item):
+            return None
+        return MensagemOutlook(item, linha)
+
+
+class FonteOutlook(FonteEmails):
+    """Caixa de entrada da conta ``nome_conta`` no Outlook. Exige CoInitialize na thread chamadora."""
+
+    usa_com = True
+
+    def __init__(self, nome_conta=NOME_CONTA_OUTLOOK):
+        self.nome_conta = nome_conta
+        self.nome = nome_conta
+        self.aplicacao = None
+        self.namespace = None
+        self.conta = None
+        self.caixa_entrada = None
+
+    def conectar(self):
+        self.aplicacao = win32com.client.DispatchWithEvents("Outlook.Application", _EventosOutlook)
+        self.namespace = self.aplicacao.GetNamespace("MAPI")
+
         caixa_entrada = None
         # Tentar obter caixa de entrada padrão primeiro (mais robusto)
         try:
-            default_inbox = outlook_ns.GetDefaultFolder(6) # 6 = Inbox
+            default_inbox = self.namespace.GetDefaultFolder(6) # 6 = Inbox
             # Verificar se a conta padrão é a que queremos
-            if NOME_CONTA_OUTLOOK.lower() in default_inbox.Parent.Name.lower():
+            if self.nome_conta.lower() in default_inbox.Parent.Name.lower():
                 caixa_entrada = default_inbox
                 conta_alvo = default_inbox.Parent
                 logging.info(f"Usando Caixa de Entrada padrão da conta '{conta_alvo.Name}'.")
@@ -165,24 +324,256 @@ def buscar_e_salvar_boletos(data_inicio_str, data_fim_str, status_callback, prog
 
         # Fallback: Procurar conta por nome se não for a padrão
         if not caixa_entrada:
-            conta_alvo = next((c for c in outlook_ns.Folders if str(c.Name).strip().lower() == NOME_CONTA_OUTLOOK.lower()), None)
-            if not conta_alvo: raise Exception(f"Conta '{NOME_CONTA_OUTLOOK}' não encontrada.")
-            
+            conta_alvo = next((c for c in self.namespace.Folders if str(c.Name).strip().lower() == self.nome_conta.lower()), None)
+            if not conta_alvo: raise Exception(f"Conta '{self.nome_conta}' não encontrada.")
+
             caixa_entrada = next((f for f in conta_alvo.Folders if str(f.Name).strip().lower() in ("caixa de entrada", "inbox")), None)
             if not caixa_entrada: raise Exception("Não foi possível localizar a 'Caixa de Entrada' pelo nome.")
-            
-        logging.info(f"Conectado à conta '{conta_alvo.Name}'.")
-        status_callback("Verificando boletos já salvos para evitar duplicatas...")
+
+        self.conta = conta_alvo
+        self.caixa_entrada = caixa_entrada
+        self.nome = str(conta_alvo.Name)
+        logging.info(f"Conectado à conta '{self.nome}'.")
+        return self
+
+    def conectada(self):
+        """True se a sessão ainda responde (o Outlook pode ter sido fechado depois de ``conectar``)."""
+        if self.namespace is None:
+            return False
+        try:
+            self.caixa_entrada.Name
+            return True
+        except Exception:
+            return False
+
+    def pasta_raiz(self):
+        return PastaOutlook(self.caixa_entrada)
+
+    def busca_indexada(self):
+        return PastaBuscaOutlook(self)
+
+    def iniciar_thread(self):
+        pythoncom.CoInitialize()
+
+    def encerrar_thread(self):
+        pythoncom.CoUninitialize()
+
+    def nova_sessao(self):
+        return FonteOutlook(self.nome_conta).conectar()
+
+    def abrir_pasta(self, referencia):
+        entry_id, store_id = referencia
+        return PastaOutlook(self.namespace.GetFolderFromID(entry_id, store_id))
+
+
+def _descobrir_e_processar(fonte, dt_inicio, dt_fim, status_callback, progress_callback, arquivos_salvos, hashes_salvos,
+                           marcas, modo, estrategia, paralelo, perfis=None, indice=None, pastas_com_erro=None):
+    """
+    Executa a busca indexada na conta (se disponível) ou a varredura recursiva. Retorna (sucesso, falha, estratégia).
+    ``perfis`` (``perfis.RegistroPerfis``) só vale na varredura recursiva: pula as pastas que o cache indicar.
+    ``pastas_com_erro`` (lista) recebe as pastas que não terminaram sem erros.
+    """
+    def processar(pastas_ou_raiz, produtores, perfis=None):
+        if paralelo:
+            return executar_pipeline(fonte, pastas_ou_raiz, dt_inicio, dt_fim, status_callback, progress_callback,
+                                     arquivos_salvos, hashes_salvos, marcas=marcas, modo=modo, produtores=produtores,
+                                     trabalhadores=TRABALHADORES_PDF, tamanho_fila=TAMANHO_FILA_PIPELINE, perfis=perfis,
+                                     indice=indice, pastas_com_erro=pastas_com_erro)
+        return percorrer_e_processar_pasta(pastas_ou_raiz[0], dt_inicio, dt_fim, status_callback, progress_callback,
+                                           arquivos_salvos, hashes_salvos, marcas=marcas, modo=modo, perfis=perfis,
+                                           indice=indice, pastas_com_erro=pastas_com_erro)
+
+    if estrategia != ESTRATEGIA_RECURSIVA:
+        pasta_busca = fonte.busca_indexada()
+        if pasta_busca is None:
+            if estrategia == ESTRATEGIA_INDEXADA: raise Exception(f"A fonte '{fonte.nome}' não oferece busca indexada.")
+        else:
+            try:
+                status_callback("Executando busca indexada na conta...")
+                pasta_busca.executar(marcas.inicio_efetivo(pasta_busca, dt_inicio, modo), dt_fim)
+            except Exception as e:
+                if estrategia == ESTRATEGIA_INDEXADA: raise
+                logging.warning(f"Busca indexada indisponível ({e}). Usando varredura recursiva das pastas.")
+            else:
+                # O resultado da busca vive na sessão atual: um único produtor
+                sucesso, falha = processar([pasta_busca], produtores=1)
+                return sucesso, falha, ESTRATEGIA_INDEXADA
+
+    raiz = fonte.pasta_raiz()
+    pastas = listar_pastas(raiz) if paralelo else [raiz]
+    if paralelo and perfis is not None:
+        pastas = perfis.filtrar(pastas, modo, (dt_inicio, dt_fim))
+    sucesso, falha = processar(pastas, produtores=PRODUTORES_COM, perfis=perfis)
+    return sucesso, falha, ESTRATEGIA_RECURSIVA
+
+
+def _buscar_na_fonte(fonte, dt_inicio, dt_fim, status_callback, progress_callback, arquivos_salvos, hashes_salvos,
+                     marcas, perfis, indice, registro_janelas, modo, estrategia, paralelo, janela, janelas_simultaneas):
+    """Busca completa em uma fonte já conectada. Retorna ``(sucesso, falha, janelas_com_erro)``."""
+    status_callback(f"--- Iniciando verificação em '{fonte.nome}' ---")
+    if janela:
+        estrategias = set()
+
+        def executar_janela(sessao, ini, fim, status_janela, progresso_janela):
+            inicio = time.perf_counter()
+            # Sempre completo: as marcas são por pasta, então a de uma janela posterior (ou simultânea)
+            # esconderia os e-mails de uma anterior que roda depois ou é retomada. Mensagens já
+            # processadas continuam sem ser baixadas pelo ``indice``; as marcas seguem avançando.
+            pastas_com_erro = []
+            s, f, usada = _descobrir_e_processar(sessao, ini, fim, status_janela, progresso_janela, arquivos_salvos,
+                                                 hashes_salvos, marcas, MODO_COMPLETO, estrategia, paralelo, perfis, indice,
+                                                 pastas_com_erro)
+            estrategias.add(usada)
+            logging.info(f"Janela {ini:%d/%m/%Y}-{fim:%d/%m/%Y}: estratégia {usada} ({time.perf_counter() - inicio:.1f}s).")
+            if pastas_com_erro:
+                # Erros de item/pasta não escapam de varrer_pasta: sem isto a janela seria dada como concluída
+                raise JanelaIncompleta(s, f, pastas_com_erro)
+            return s, f
+
+        sucesso, falha, com_erro = processar_em_janelas(fonte, dt_inicio, dt_fim, janela, janelas_simultaneas, executar_janela,
+                                                        status_callback, progress_callback, registro=registro_janelas)
+        logging.info(f"Estratégias de descoberta usadas nas janelas de '{fonte.nome}': {', '.join(sorted(estrategias)) or 'nenhuma'}.")
+        return sucesso, falha, com_erro
+
+    inicio = time.perf_counter()
+    sucesso, falha, usada = _descobrir_e_processar(fonte, dt_inicio, dt_fim, status_callback, progress_callback,
+                                                   arquivos_salvos, hashes_salvos, marcas, modo, estrategia, paralelo, perfis, indice)
+    duracao = time.perf_counter() - inicio
+    descricao = "busca indexada na conta" if usada == ESTRATEGIA_INDEXADA else "varredura recursiva das pastas"
+    logging.info(f"Estratégia de descoberta em '{fonte.nome}': {descricao} ({duracao:.1f}s).")
+    status_callback(f"Estratégia usada: {descricao} ({duracao:.1f}s)")
+    return sucesso, falha, []
+
+
+def buscar_e_salvar_boletos(data_inicio_str, data_fim_str, status_callback, progress_callback, completion_callback, fonte=None,
+                            modo=MODO_COMPLETO, estrategia=ESTRATEGIA_BUSCA, paralelo=PIPELINE_PARALELO,
+                            janela=JANELA_BUSCA, janelas_simultaneas=JANELAS_SIMULTANEAS, contas=None, hashes_salvos=None):
+    """
+    Busca e salva os boletos do período. ``fonte`` é uma ``mail_source.FonteEmails`` ou uma
+    lista delas; se omitida, usa as contas do Outlook de ``contas`` (padrão ``CONTAS_OUTLOOK``).
+    Com mais de uma fonte, cada uma roda na sua thread (e apartment COM), compartilhando o
+    conjunto de hashes, e o resumo final traz o resultado de cada caixa.
+    ``modo``: ``MODO_INCREMENTAL`` lê só os e-mails posteriores à última sincronização de cada
+    pasta; ``MODO_COMPLETO`` varre o período inteiro (auditoria) e também atualiza as marcas.
+    ``estrategia``: ``ESTRATEGIA_AUTO``, ``ESTRATEGIA_INDEXADA`` ou ``ESTRATEGIA_RECURSIVA``.
+    ``paralelo``: usa o pipeline produtor/consumidor (``pipeline.executar_pipeline``).
+    ``janela``: ``"dia"``, ``"semana"`` ou ``"mes"`` divide o período em janelas independentes e
+    retomáveis (``janelas.processar_em_janelas``), ``janelas_simultaneas`` por vez; cada janela
+    lê o seu período inteiro, mesmo em ``MODO_INCREMENTAL``.
+    ``hashes_salvos``: ``indice_hashes.IndiceHashes`` já reconciliado (ex.: pelo serviço residente); é atualizado com os novos boletos.
+    O tempo de cada etapa (``metricas``) é exportado em JSON na pasta de logs e as etapas
+    mais lentas aparecem no status final.
+    """
+    if fonte is None:
+        fontes = [FonteOutlook(conta) for conta in (contas or CONTAS_OUTLOOK)]
+    else:
+        fontes = list(fonte) if isinstance(fonte, (list, tuple)) else [fonte]
+    try:
+        os.makedirs(PASTA_SAIDA_BOLETOS, exist_ok=True); os.makedirs(PASTA_SAIDA_FALHAS, exist_ok=True)
+        dt_inicio = datetime.strptime(data_inicio_str, "%d/%m/%Y")
+        dt_fim = datetime.strptime(data_fim_str, "%d/%m/%Y").replace(hour=23, minute=59, second=59)
+        logging.info(f"Iniciando busca de {data_inicio_str} a {data_fim_str} (modo {modo}) em {len(fontes)} caixa(s).")
+        metricas = iniciar_execucao()
+        reiniciar_pico()
+        analisador_pdf().reiniciar_estatisticas()
+        registro_senhas().reiniciar_estatisticas()
+        fila_ocr().reiniciar_estatisticas()
+        gravador_disco().reiniciar_estatisticas()
+
         arquivos_salvos = set(os.listdir(PASTA_SAIDA_BOLETOS))
-        hashes_salvos = carregar_hashes_existentes(PASTA_SAIDA_BOLETOS)
-        status_callback(f"--- Iniciando verificação em '{conta_alvo.Name}' ---")
-        sucesso, falha = percorrer_e_processar_pasta(caixa_entrada, dt_inicio, dt_fim, status_callback, progress_callback, arquivos_salvos, hashes_salvos)
-        
+        if hashes_salvos is None:
+            status_callback("Verificando boletos já salvos para evitar duplicatas...")
+            hashes_salvos = indice_hashes().reconciliar()
+        marcas = RegistroMarcas()
+        perfis = RegistroPerfis()
+        indice = IndiceMensagens()
+        indice.reconciliar(hashes_salvos.conhecidos())
+        registro_janelas = RegistroJanelas()
+        status_sincronizado = StatusSincronizado(status_callback)
+        progresso = ProgressoAgregado(progress_callback)
+        resultados = {}
+
+        def buscar_caixa(posicao, fonte_caixa, propria_thread):
+            # Com várias caixas, as mensagens de status levam o nome da caixa
+            prefixo = f"[{fonte_caixa.nome}] " if len(fontes) > 1 else ""
+            status_caixa = lambda msg: status_sincronizado(f"{prefixo}{msg}")
+            inicio = time.perf_counter()
+            if propria_thread or fonte_caixa.usa_com: fonte_caixa.iniciar_thread()
+            try:
+                if isinstance(fonte_caixa, FonteOutlook) and fonte_caixa.namespace is None:
+                    status_caixa("Conectando ao Outlook...")
+                    fonte_caixa.conectar()
+                s, f, com_erro = _buscar_na_fonte(fonte_caixa, dt_inicio, dt_fim, status_caixa, progresso.da_pasta(posicao),
+                                                  arquivos_salvos, hashes_salvos, marcas, perfis, indice, registro_janelas,
+                                                  modo, estrategia, paralelo, janela, janelas_simultaneas)
+                erro = f"janelas pendentes: {', '.join(com_erro)}" if com_erro else None
+            except Exception as e:
+                logging.error(f"ERRO na caixa '{fonte_caixa.nome}': {e}", exc_info=True)
+                status_caixa(f"ERRO: {e}. As demais caixas continuam.")
+                s, f, erro = 0, 0, str(e)
+            finally:
+                fonte_caixa.fechar()
+                if propria_thread or fonte_caixa.usa_com: fonte_caixa.encerrar_thread()
+            resultados[posicao] = (fonte_caixa.nome, s, f, erro, time.perf_counter() - inicio)
+
+        if len(fontes) == 1:
+            buscar_caixa(0, fontes[0], propria_thread=False)
+        else:
+            threads = [Thread(target=buscar_caixa, args=(i, f, True), name=f"boletos-caixa-{i}", daemon=True)
+                       for i, f in enumerate(fontes)]
+            for t in threads: t.start()
+            for t in threads: t.join()
+
+        # Índices e perfis só são gravados com todos os boletos desta busca já no disco
+        gravador_disco().aguardar()
+        houve_erro = any(r[3] for r in resultados.values())
+        perfis.salvar(concluida=not houve_erro)
+        indice.salvar()
+        status_callback(perfis.resumo())
+        logging.info(hashes_salvos.resumo())
+        status_callback(hashes_salvos.resumo())
+        if analisador_pdf().resumo():
+            logging.info(analisador_pdf().resumo())
+            status_callback(analisador_pdf().resumo())
+        registro_senhas().salvar()
+        if registro_senhas().resumo():
+            logging.info(registro_senhas().resumo())
+            status_callback(registro_senhas().resumo())
+        if ACERVO_ATIVO:
+            logging.info(acervo().resumo())
+        if gravador_disco().resumo():
+            logging.info(gravador_disco().resumo())
+            status_callback(gravador_disco().resumo())
+        if fila_ocr().resumo():
+            logging.info(fila_ocr().resumo())
+            status_callback(fila_ocr().resumo())
+        metricas.anotar("pico_memoria_anexos_bytes", pico_memoria())
+        metricas.anotar("anexos_em_arquivo_temporario", anexos_em_disco())
+        status_callback(f"Pico de memória com anexos: {pico_memoria() / 1024 / 1024:.1f} MB "
+                        f"({anexos_em_disco()} anexos grandes tratados em arquivo temporário).")
+        try:
+            logging.info(f"Métricas por etapa gravadas em: {metricas.exportar()}")
+        except OSError as e:
+            logging.warning(f"Não foi possível gravar as métricas por etapa: {e}")
+        status_callback(metricas.resumo())
+        sucesso = sum(r[1] for r in resultados.values())
+        falha = sum(r[2] for r in resultados.values())
+
         logging.info("--- PROCESSO FINALIZADO ---")
+        if len(fontes) > 1:
+            for posicao in sorted(resultados):
+                nome, s, f, erro, duracao = resultados[posicao]
+                linha = f"'{nome}': {s} com UC, {f} sem UC ({duracao:.1f}s)" + (f" - ERRO: {erro}" if erro else "")
+                logging.info(f"RESUMO DA CAIXA {linha}")
+                status_callback(f"Caixa {linha}")
         logging.info(f"Total de boletos com UC identificada: {sucesso}")
         logging.info(f"Total de boletos sem UC (para análise): {falha}")
         logging.info("="*50 + "\n")
-        completion_callback(sucesso, falha)
+        if houve_erro:
+            status_callback("⚠️ Houve erros em parte da busca (veja acima e no log). Repita a busca para retomar.")
+            completion_callback(sucesso, falha, erro=True)
+        else:
+            completion_callback(sucesso, falha)
     except com_error as e:
         logging.error(f"ERRO COM ESPECÍFICO no processo principal: {e}", exc_info=True)
         status_callback(f"\nERRO COM (Outlook): {e}\nVeja o log.")
@@ -191,5 +582,3 @@ def buscar_e_salvar_boletos(data_inicio_str, data_fim_str, status_callback, prog
         logging.error(f"ERRO CRÍTICO no processo principal: {e}", exc_info=True)
         status_callback(f"\nERRO CRÍTICO: {e}\nVeja o log.")
         completion_callback(0, 0, erro=True)
-    finally:
-        pythoncom.CoUninitialize()
@@ -1,78 +1,209 @@
 import re
+import hashlib
 import logging
+from datetime import datetime
+from functools import cached_property
 import PyPDF2
 from .config import SENHAS_COMUNS
+from .metricas import medir, contar
+from .senhas_pdf import impressao_modelo
 
-def extrair_uc_do_pdf(stream_do_pdf):
-    try:
-        stream_do_pdf.seek(0)
-        reader = PyPDF2.PdfReader(stream_do_pdf)
-        
-        if reader.is_encrypted:
-            decrypted = False
-            for senha in SENHAS_COMUNS:
-                if reader.decrypt(senha) != 0:
-                    decrypted = True
-                    logging.info(f"PDF descriptografado com a senha: '{senha if senha else 'Vazia'}'.")
-                    break
-            if not decrypted:
-                logging.warning("PDF criptografado, não foi possível abri-lo.")
-                return None
-
-        # --- MELHORIA: Regex em duas etapas ---
-        padrao_uc_especifico = re.compile(r'(?:UC|Unidade\s+Consumidora)[:\s]*?(10\s*[/\-]\s*\d{3,9}\s*[-\s]*\d)', re.I | re.S)
-        padrao_uc_geral = re.compile(r'(10\s*[/\-]\s*\d{3,9}\s*[-\s]*\d)', re.S)
-        
-        texto_total = "\n".join((page.extract_text() or "") for page in reader.pages)
-
-        if not texto_total.strip():
-             logging.warning("PDF parece ser uma imagem (sem texto extraível).")
-             return None
-
-        # 1ª Tentativa: Padrão específico (mais seguro)
-        m = padrao_uc_especifico.search(texto_total)
-        if m:
-            uc_limpa = re.sub(r'\D', '', m.group(1))
-            logging.info(f"UC '{uc_limpa}' encontrada com padrão específico.")
-            return uc_limpa
+# --- MELHORIA: Regex em duas etapas ---
+PADRAO_UC_ESPECIFICO = re.compile(r'(?:UC|Unidade\s+Consumidora)[:\s]*?(10\s*[/\-]\s*\d{3,9}\s*[-\s]*\d)', re.I | re.S)
+PADRAO_UC_GERAL = re.compile(r'(10\s*[/\-]\s*\d{3,9}\s*[-\s]*\d)', re.S)
+# Regex baseado no exemplo do usuário: "Pagador: NOME CNPJ/CPF:"
+# Usa re.DOTALL (re.S) para pegar multilinhas se necessário, mas foca em travar no CNPJ
+PADRAO_NOME = re.compile(r'Pagador:\s*(.*?)\s*CNPJ\/CPF', re.IGNORECASE | re.DOTALL)
+# No texto extraído dos boletos da Pinbank o valor vem antes do rótulo
+PADRAO_VENCIMENTO = re.compile(r'(\d{2}/\d{2}/\d{4})\s*Data de Vencimento', re.I)
+PADRAO_VALOR = re.compile(r'(\d{1,3}(?:\.\d{3})*,\d{2})\s*\(=\)\s*Valor do Documento', re.I)
 
-        # 2ª Tentativa: Padrão geral (fallback)
-        m = padrao_uc_geral.search(texto_total)
-        if m:
-            uc_limpa = re.sub(r'\D', '', m.group(1))
-            logging.info(f"UC '{uc_limpa}' encontrada com padrão geral (fallback).")
-            return uc_limpa
-            
-    except Exception as e:
-        logging.error(f"Erro ao ler PDF: {e}")
-    
-    logging.warning("Nenhuma UC encontrada no PDF.")
-    return None
+NOME_DESCONHECIDO = "ClienteDesconhecido"
 
-def extrair_nome_do_pdf(stream_do_pdf):
-    try:
-        stream_do_pdf.seek(0)
-        reader = PyPDF2.PdfReader(stream_do_pdf)
-        
+# Aumentar ao mudar a lógica de extração fora das regex (padrões e senhas já entram em versao_extrator)
+VERSAO_EXTRATOR = 1
+
+
+def versao_extrator():
+    """Identifica o extrator atual: vereditos antigos (ex.: correção de PDFs) deixam de valer quando muda."""
+    partes = [str(VERSAO_EXTRATOR), PADRAO_UC_ESPECIFICO.pattern, PADRAO_UC_GERAL.pattern, *sorted(SENHAS_COMUNS)]
+    return hashlib.blake2b("\x1f".join(partes).encode("utf-8"), digest_size=6).hexdigest()
+
+
+class BoletoPdf:
+    """
+    Boleto lido uma única vez: o PDF é aberto e descriptografado na criação e o texto de cada
+    página é extraído só quando pedido (e guardado). UC, nome do cliente, vencimento e valor
+    saem todos do mesmo leitor. ``legivel`` é False quando o PDF não abre.
+
+    ``ordem_senhas`` (``senhas_pdf.RegistroSenhas.ordens``) define a ordem das senhas tentadas
+    por modelo; o resultado fica em ``decifragem`` para o registro aprender.
+    """
+
+    def __init__(self, stream_do_pdf, ordem_senhas=None):
+        self._paginas = {}
+        self.reader = None
+        # PDF criptografado: {"impressao", "senha" (None se nenhuma abriu), "tentativas"}
+        self.decifragem = None
+        # Onde a UC foi achada: página (1 = primeira) e padrão ("especifico"/"geral")
+        self.pagina_uc = None
+        self.padrao_uc = None
+        try:
+            with medir("pdf_parse"):
+                stream_do_pdf.seek(0)
+                reader = PyPDF2.PdfReader(stream_do_pdf)
+
+                if reader.is_encrypted:
+                    impressao = impressao_modelo(reader)
+                    ordem_senhas = ordem_senhas or {}
+                    senhas = ordem_senhas.get(impressao) or ordem_senhas.get("") or SENHAS_COMUNS
+                    self.decifragem = {"impressao": impressao, "senha": None, "tentativas": 0}
+                    for senha in senhas:
+                        self.decifragem["tentativas"] += 1
+                        if reader.decrypt(senha) != 0:
+                            self.decifragem["senha"] = senha
+                            logging.info(f"PDF descriptografado com a senha: '{senha if senha else 'Vazia'}' "
+                                         f"(tentativa {self.decifragem['tentativas']}).")
+                            break
+                    if self.decifragem["senha"] is None:
+                        logging.warning("PDF criptografado, não foi possível abri-lo.")
+                        return
+                self.reader = reader
+        except Exception as e:
+            logging.error(f"Erro ao ler PDF: {e}")
+
+    @property
+    def legivel(self):
+        return self.reader is not None
+
+    @property
+    def num_paginas(self):
+        return len(self.reader.pages) if self.legivel else 0
+
+    def texto_pagina(self, indice):
+        if indice not in self._paginas:
+            with medir("pdf_parse"):
+                try:
+                    self._paginas[indice] = self.reader.pages[indice].extract_text() or ""
+                except Exception as e:
+                    logging.error(f"Erro ao extrair o texto da página {indice + 1} do PDF: {e}")
+                    self._paginas[indice] = ""
+        return self._paginas[indice]
+
+    @cached_property
+    def somente_imagem(self):
+        """
+        Estrutura de PDF escaneado, sem extrair texto: nenhuma fonte e uma única imagem em cada
+        página. PDFs com texto saem na primeira página (têm ``/Font``).
+        """
+        if not self.legivel:
+            return False
+        try:
+            for pagina in self.reader.pages:
+                recursos = pagina.get("/Resources")
+                recursos = recursos.get_object() if recursos is not None else {}
+                if "/Font" in recursos:
+                    return False
+                xobjetos = recursos.get("/XObject")
+                xobjetos = xobjetos.get_object() if xobjetos is not None else {}
+                imagens = [x for x in xobjetos.values() if x.get_object().get("/Subtype") == "/Image"]
+                if len(imagens) != 1 or len(xobjetos) != 1:
+                    return False
+        except Exception as e:
+            logging.debug(f"Estrutura do PDF não verificada: {e}")
+            return False
+        return True
+
+    @property
+    def texto(self):
+        return "\n".join(self.texto_pagina(i) for i in range(self.num_paginas))
+
+    def _uc_encontrada(self, m, indice, padrao):
+        uc_limpa = re.sub(r'\D', '', m.group(1))
+        self.pagina_uc, self.padrao_uc = indice + 1, padrao
+        contar(f"uc_pagina_{indice + 1}")
+        contar(f"uc_padrao_{padrao}")
+        # Páginas que nunca precisaram ter o texto extraído
+        contar("paginas_nao_lidas", self.num_paginas - len(self._paginas))
+        return uc_limpa
+
+    @cached_property
+    def uc(self):
+        if not self.legivel:
+            return None
+        if self.somente_imagem:
+            contar("pdf_somente_imagem")
+            logging.warning("PDF escaneado (só imagem, sem fontes): texto não extraído, UC fica para o OCR.")
+            return None
+
+        # 1ª Tentativa: Padrão específico (mais seguro), página a página; para na primeira que tiver
+        for i in range(self.num_paginas):
+            texto = self.texto_pagina(i)
+            with medir("uc_regex"):
+                m = PADRAO_UC_ESPECIFICO.search(texto)
+            if m:
+                uc_limpa = self._uc_encontrada(m, i, "especifico")
+                logging.info(f"UC '{uc_limpa}' encontrada com padrão específico (página {i + 1}).")
+                return uc_limpa
+
+        if not any(t.strip() for t in self._paginas.values()):
+            logging.warning("PDF parece ser uma imagem (sem texto extraível).")
+            return None
+
+        # 2ª Tentativa: Padrão geral (fallback), só depois de esgotar todas as páginas
+        for i in range(self.num_paginas):
+            with medir("uc_regex"):
+                m = PADRAO_UC_GERAL.search(self.texto_pagina(i))
+            if m:
+                uc_limpa = self._uc_encontrada(m, i, "geral")
+                logging.info(f"UC '{uc_limpa}' encontrada com padrão geral (fallback, página {i + 1}).")
+                return uc_limpa
+
+        logging.warning("Nenhuma UC encontrada no PDF.")
+        return None
+
+    @cached_property
+    def nome_cliente(self):
         # Tentar extrair da primeira página (onde geralmente está o Pagador)
-        texto_pagina_1 = reader.pages[0].extract_text()
-        
-        if not texto_pagina_1:
-            return "ClienteDesconhecido"
-
-        # Regex baseado no exemplo do usuário: "Pagador: NOME CNPJ/CPF:"
-        # Usa re.DOTALL (re.S) para pegar multilinhas se necessário, mas foca em travar no CNPJ
-        padrao_nome = re.compile(r'Pagador:\s*(.*?)\s*CNPJ\/CPF', re.IGNORECASE | re.DOTALL)
-        
-        m = padrao_nome.search(texto_pagina_1)
+        if not self.num_paginas:
+            return NOME_DESCONHECIDO
+        texto_pagina_1 = self.texto_pagina(0)
+        with medir("nome"):
+            m = PADRAO_NOME.search(texto_pagina_1)
         if m:
             nome_sujo = m.group(1).replace('\n', ' ').strip()
             # Limpeza extra para evitar nomes muito longos ou caracteres estranhos
             nome_limpo = re.sub(r'\s+', ' ', nome_sujo) # Remove espaços duplos
             logging.info(f"Nome extraído: '{nome_limpo}'")
             return nome_limpo
-            
-    except Exception as e:
-        logging.error(f"Erro ao extrair nome do PDF: {e}")
-    
-    return "ClienteDesconhecido"
+        return NOME_DESCONHECIDO
+
+    @cached_property
+    def vencimento(self):
+        m = PADRAO_VENCIMENTO.search(self.texto_pagina(0)) if self.num_paginas else None
+        if m:
+            try: return datetime.strptime(m.group(1), "%d/%m/%Y").date()
+            except ValueError: pass
+        return None
+
+    @cached_property
+    def valor(self):
+        """Valor do documento como texto no formato do boleto (ex.: ``"1.183,73"``)."""
+        m = PADRAO_VALOR.search(self.texto_pagina(0)) if self.num_paginas else None
+        return m.group(1) if m else None
+
+
+def extrair_uc_do_texto(texto):
+    """UC de um texto solto (ex.: saída do OCR): padrão específico e, sem ele, o geral."""
+    m = PADRAO_UC_ESPECIFICO.search(texto or "") or PADRAO_UC_GERAL.search(texto or "")
+    return re.sub(r'\D', '', m.group(1)) if m else None
+
+def extrair_nome_do_texto(texto):
+    m = PADRAO_NOME.search(texto or "")
+    return re.sub(r'\s+', ' ', m.group(1)).strip() if m else NOME_DESCONHECIDO
+
+def extrair_uc_do_pdf(stream_do_pdf):
+    return BoletoPdf(stream_do_pdf).uc
+
+def extrair_nome_do_pdf(stream_do_pdf):
+    return BoletoPdf(stream_do_pdf).nome_cliente
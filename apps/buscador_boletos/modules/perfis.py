@@ -0,0 +1,115 @@
+"""
+Perfil persistido de cada pasta, para pular as que não vale a pena reler.
+
+Para cada pasta (mesma chave das marcas: StoreID + EntryID no Outlook) guarda o estado
+visto na última leitura (quantidade de itens e data da última modificação), o período de
+datas que ela cobriu, quantos boletos a pasta já rendeu e quanto tempo a leitura levou.
+No modo incremental, pastas inalteradas desde uma leitura que já cobriu o período pedido
+ou que nunca renderam boleto são puladas (a busca completa lê todas); a cada
+``DIAS_VARREDURA_COMPLETA_PASTAS`` dias uma execução lê todas, corrigindo desvios.
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from .config import ARQUIVO_PERFIS, DIAS_VARREDURA_COMPLETA_PASTAS, EXECUCOES_SEM_BOLETO_PARA_PULAR
+from .marcas import MODO_INCREMENTAL
+
+_FORMATO = "%Y-%m-%dT%H:%M:%S"
+
+
+class RegistroPerfis:
+    """
+    Perfis de todas as pastas (JSON, thread-safe). As decisões de uma execução usam o
+    estado lido no início, então janelas e produtores diferentes decidem igual.
+    """
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or ARQUIVO_PERFIS
+        self._lock = threading.Lock()
+        self._dados = {"pastas": {}, "ultima_varredura_completa": None}
+        if os.path.exists(self.caminho):
+            try:
+                with open(self.caminho, "r", encoding="utf-8") as f:
+                    self._dados = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Perfis de pastas ilegíveis em '{self.caminho}' ({e}). Iniciando do zero.")
+        self._anteriores = {chave: dict(p) for chave, p in self._dados["pastas"].items()}
+        ultima = self._dados.get("ultima_varredura_completa")
+        ultima = datetime.strptime(ultima, _FORMATO) if ultima else None
+        self.varredura_completa = ultima is None or datetime.now() - ultima >= timedelta(days=DIAS_VARREDURA_COMPLETA_PASTAS)
+        self.puladas = []  # (caminho, motivo, segundos economizados)
+
+    @staticmethod
+    def _periodo(perfil):
+        periodo = perfil.get("periodo")
+        return tuple(datetime.strptime(d, _FORMATO) for d in periodo) if periodo else None
+
+    def motivo_para_pular(self, pasta, modo, estado=None, periodo=None):
+        """
+        ``"inalterada"``, ``"sem_boletos"`` ou None (ler a pasta). ``periodo`` é o ``(dt_inicio, dt_fim)``
+        pedido: a pasta só é "inalterada" se a leitura anterior cobriu todo ele.
+        """
+        # Uma busca completa (auditoria) lê todas as pastas
+        if self.varredura_completa or modo != MODO_INCREMENTAL:
+            return None
+        anterior = self._anteriores.get(pasta.chave)
+        if anterior is None:
+            return None
+        lido = self._periodo(anterior)
+        if (estado is not None and anterior.get("estado") == estado
+                and periodo is not None and lido is not None and lido[0] <= periodo[0] and periodo[1] <= lido[1]):
+            return "inalterada"
+        if anterior.get("boletos", 0) == 0 and anterior.get("execucoes", 0) >= EXECUCOES_SEM_BOLETO_PARA_PULAR:
+            return "sem_boletos"
+        return None
+
+    def pular(self, pasta, motivo):
+        economia = self._anteriores.get(pasta.chave, {}).get("duracao", 0.0)
+        with self._lock:
+            self.puladas.append((pasta.caminho, motivo, economia))
+        logging.info(f"Pasta '{pasta.caminho}' pulada pelo cache de perfis ({motivo}, ~{economia:.1f}s).")
+
+    def filtrar(self, pastas, modo, periodo=None):
+        """Remove as pastas que podem ser puladas e ordena as demais pelas que mais renderam boletos."""
+        a_processar = []
+        for pasta in pastas:
+            motivo = self.motivo_para_pular(pasta, modo, pasta.estado(), periodo)
+            if motivo: self.pular(pasta, motivo)
+            else: a_processar.append(pasta)
+        return sorted(a_processar, key=lambda p: -self._anteriores.get(p.chave, {}).get("boletos", 0))
+
+    def registrar(self, pasta, estado, boletos, duracao, periodo=None):
+        """Registra uma leitura de ``periodo``; com a pasta inalterada, períodos contíguos se somam."""
+        with self._lock:
+            perfil = self._dados["pastas"].setdefault(pasta.chave, {"boletos": 0, "execucoes": 0})
+            lido = self._periodo(perfil)
+            if (periodo is not None and lido is not None and perfil.get("estado") == estado
+                    and lido[0] <= periodo[1] + timedelta(seconds=1) and periodo[0] <= lido[1] + timedelta(seconds=1)):
+                periodo = (min(lido[0], periodo[0]), max(lido[1], periodo[1]))
+            perfil["periodo"] = [d.strftime(_FORMATO) for d in periodo] if periodo is not None else None
+            perfil.update(pasta=pasta.caminho, estado=estado, duracao=round(duracao, 2),
+                          lida_em=datetime.now().strftime(_FORMATO))
+            perfil["boletos"] += boletos
+            perfil["execucoes"] += 1
+
+    def resumo(self):
+        """Texto com as pastas puladas e o tempo economizado (estimado pela última leitura de cada uma)."""
+        if self.varredura_completa:
+            return "Varredura completa das pastas (cache de perfis renovado)."
+        economia = sum(s for _, _, s in self.puladas)
+        return f"Pastas puladas pelo cache de perfis: {len(self.puladas)} (economia estimada: {economia:.1f}s)."
+
+    def salvar(self, concluida=True):
+        """Grava os perfis; ``concluida`` registra a varredura completa (só se a execução não teve erros)."""
+        with self._lock:
+            if self.varredura_completa and concluida:
+                self._dados["ultima_varredura_completa"] = datetime.now().strftime(_FORMATO)
+            os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+            tmp = self.caminho + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._dados, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.caminho)
@@ -0,0 +1,219 @@
+"""
+Pipeline produtor/consumidor da busca de boletos.
+
+Etapas, ligadas por filas limitadas (a memória fica estável mesmo com milhares de anexos):
+
+1. Produtores (``produtores`` threads): percorrem as pastas, aplicam os filtros do e-mail
+   e extraem o anexo. Em fontes COM cada produtor tem seu próprio CoInitialize e sessão;
+   com um único produtor a própria thread chamadora produz.
+2. Trabalhadores de PDF (``trabalhadores`` threads): SHA-256, UC e nome do cliente; a leitura
+   do PDF vai para os processos auxiliares de ``processos_pdf`` quando disponíveis.
+3. Gravador (1 thread): deduplicação, atualização de ``hashes_salvos``/``arquivos_salvos`` e
+   agendamento da escrita no ``gravacao_disco`` (o disco em si fica com a thread dele).
+
+O gravador confirma as cargas na ordem em que foram produzidas; com um produtor o
+resultado é idêntico ao da execução serial (``percorrer_e_processar_pasta``).
+"""
+
+import time
+import queue
+import logging
+import threading
+
+from .marcas import MODO_COMPLETO
+from .metricas import medir, na_pasta
+from .processos_pdf import analisador_pdf
+from .gravacao_disco import gravador_disco
+from .processamento import novos_motivos, selecionar_anexos, analisar_carga, gravar_carga, varrer_pasta
+
+_FIM = object()
+
+
+class ProgressoAgregado:
+    """Soma o progresso das pastas em andamento em um único ``progress_callback`` (thread-safe)."""
+
+    def __init__(self, progress_callback):
+        self._callback = progress_callback
+        self._lock = threading.Lock()
+        self._por_pasta = {}
+
+    def da_pasta(self, chave):
+        def callback(valor, maximo, texto):
+            with self._lock:
+                self._por_pasta[chave] = (valor, maximo)
+                feitos = sum(v for v, _ in self._por_pasta.values())
+                total = sum(m for _, m in self._por_pasta.values())
+            self._callback(feitos, total, f"Analisando e-mail {feitos} de {total}")
+        return callback
+
+
+class StatusSincronizado:
+    """Serializa as mensagens de status vindas de várias threads."""
+
+    def __init__(self, status_callback):
+        self._callback = status_callback
+        self._lock = threading.Lock()
+
+    def __call__(self, mensagem):
+        with self._lock:
+            self._callback(mensagem)
+
+
+def executar_pipeline(fonte, pastas, dt_inicio, dt_fim, status_callback, progress_callback, arquivos_salvos, hashes_salvos,
+                      marcas=None, modo=MODO_COMPLETO, produtores=1, trabalhadores=4, tamanho_fila=32, perfis=None,
+                      indice=None, pastas_com_erro=None):
+    """
+    Processa ``pastas`` (já sem as banidas, ver ``processamento.listar_pastas``) de ``fonte``
+    com as três etapas em paralelo. Com ``perfis`` o rendimento e a duração de cada pasta
+    lida são registrados (quem escolhe as pastas é ``RegistroPerfis.filtrar``); com ``indice``
+    (``indice_mensagens.IndiceMensagens``) mensagens já processadas não são baixadas. Com
+    ``pastas_com_erro`` (lista), recebe o caminho das pastas que não terminaram sem erros. Retorna ``(sucesso, falha)``.
+    """
+    pastas_com_erro = [] if pastas_com_erro is None else pastas_com_erro
+    status_callback = StatusSincronizado(status_callback)
+    progresso = ProgressoAgregado(progress_callback)
+    fila_pdf = queue.Queue(maxsize=tamanho_fila)
+    fila_escrita = queue.Queue(maxsize=tamanho_fila)
+    lock_seq = threading.Lock()
+    proximo_seq = [0]
+    marcas_pendentes = []
+    erros = []
+
+    # ---------------- Etapa 1: produtores ----------------
+    def produzir_pasta(pasta, posicao):
+        status_callback(f"Analisando pasta: {pasta.caminho}")
+        logging.info(f"--- ANALISANDO PASTA: {pasta.caminho} ---")
+        motivos = novos_motivos()
+        enviados = [0]
+        estado = pasta.estado() if perfis is not None else None
+        inicio = time.perf_counter()
+
+        def consumir(item):
+            # Cada boleto do e-mail (vários num .zip) segue como carga própria: os trabalhadores os processam em paralelo
+            for carga in selecionar_anexos(item, dt_inicio, dt_fim, motivos, indice):
+                with lock_seq:
+                    seq = proximo_seq[0]; proximo_seq[0] += 1
+                    # put dentro do lock: a fila recebe as cargas na ordem dos números de sequência
+                    fila_pdf.put((seq, carga))
+                enviados[0] += 1
+            return 0, 0
+
+        _, _, nova_marca = varrer_pasta(pasta, dt_inicio, dt_fim, motivos, consumir, status_callback,
+                                        progresso.da_pasta(posicao), marcas=marcas, modo=modo, indice=indice)
+        if nova_marca is None:
+            pastas_com_erro.append(pasta.caminho)
+        else:
+            marcas_pendentes.append((pasta, nova_marca))
+            if perfis is not None:
+                perfis.registrar(pasta, estado, enviados[0], time.perf_counter() - inicio, (dt_inicio, dt_fim))
+        logging.info(f"RESUMO DA PASTA '{pasta.nome}': Anexos enviados ao processamento={enviados[0]}, Descartes={motivos}")
+        if sum(motivos.values()) > 0: status_callback(f"Descartes em '{pasta.nome}': {sum(motivos.values())} (Ver log)")
+
+    fila_pastas = queue.Queue()
+    for posicao in range(len(pastas)):
+        fila_pastas.put(posicao)
+
+    def produtor(compartilha_sessao):
+        sessao = None
+        if not compartilha_sessao: fonte.iniciar_thread()
+        try:
+            sessao = fonte if compartilha_sessao else fonte.nova_sessao()
+            while True:
+                try: posicao = fila_pastas.get_nowait()
+                except queue.Empty: break
+                pasta = pastas[posicao] if compartilha_sessao else sessao.abrir_pasta(referencias[posicao])
+                try:
+                    produzir_pasta(pasta, posicao)
+                except Exception as e:
+                    erros.append(e); pastas_com_erro.append(pastas[posicao].caminho)
+                    logging.error(f"Erro ao processar a pasta '{pastas[posicao].caminho}': {e}", exc_info=True)
+        except Exception as e:
+            erros.append(e)
+            logging.error(f"Produtor encerrado por erro: {e}", exc_info=True)
+        finally:
+            if not compartilha_sessao:
+                if sessao is not None: sessao.fechar()
+                fonte.encerrar_thread()
+
+    # ---------------- Etapa 2: trabalhadores de PDF ----------------
+    def trabalhador():
+        while True:
+            pacote = fila_pdf.get()
+            if pacote is _FIM: break
+            seq, carga = pacote
+            try:
+                with na_pasta(carga.pasta):
+                    with medir("hash"):
+                        carga.hash = carga.conteudo.hash()
+                    # Duplicata conhecida: nem abre o PDF (o gravador confirma e contabiliza)
+                    if not hashes_salvos.contem(carga.hash, carga.conteudo.tamanho):
+                        analisar_carga(carga)
+            except Exception as e:
+                carga.erro = e
+                logging.error(f"Erro ao analisar o PDF de {carga.email_id}: {e}")
+            fila_escrita.put((seq, carga))
+
+    # ---------------- Etapa 3: gravador ----------------
+    resultado = {"sucesso": 0, "falha": 0}
+    motivos_gravacao = novos_motivos()
+
+    def gravar(carga):
+        if getattr(carga, "erro", None) is not None:
+            carga.conteudo.fechar()
+            erros.append(carga.erro); pastas_com_erro.append(carga.pasta); return
+        try:
+            with na_pasta(carga.pasta):
+                s, f = gravar_carga(carga, motivos_gravacao, arquivos_salvos, hashes_salvos, indice)
+            resultado["sucesso"] += s; resultado["falha"] += f
+        except Exception as e:
+            erros.append(e); pastas_com_erro.append(carga.pasta)
+            logging.error(f"Erro ao gravar o boleto de {carga.email_id}: {e}")
+
+    def gravador():
+        pendentes, esperado = {}, 0
+        while True:
+            pacote = fila_escrita.get()
+            if pacote is _FIM: break
+            seq, carga = pacote
+            pendentes[seq] = carga
+            while esperado in pendentes:
+                gravar(pendentes.pop(esperado)); esperado += 1
+        for seq in sorted(pendentes):
+            gravar(pendentes.pop(seq))
+
+    t_gravador = threading.Thread(target=gravador, name="boletos-gravador", daemon=True)
+    # Com processos de PDF, cada trabalhador espera um processo: um trabalhador por processo
+    trabalhadores = max(1, trabalhadores, analisador_pdf().processos)
+    t_trabalhadores = [threading.Thread(target=trabalhador, name=f"boletos-pdf-{i}", daemon=True) for i in range(trabalhadores)]
+    t_gravador.start()
+    for t in t_trabalhadores: t.start()
+
+    if produtores <= 1:
+        produtor(compartilha_sessao=True)
+    else:
+        # Tokens lidos aqui, na thread que listou as pastas: os objetos COM delas não podem ser usados em outro apartment
+        referencias = [pasta.referencia() for pasta in pastas]
+        t_produtores = [threading.Thread(target=produtor, args=(False,), name=f"boletos-com-{i}", daemon=True) for i in range(produtores)]
+        for t in t_produtores: t.start()
+        for t in t_produtores: t.join()
+
+    for _ in t_trabalhadores: fila_pdf.put(_FIM)
+    for t in t_trabalhadores: t.join()
+    fila_escrita.put(_FIM)
+    t_gravador.join()
+
+    logging.info(f"RESUMO DA GRAVAÇÃO: Sucesso={resultado['sucesso']}, Falha={resultado['falha']}, "
+                 f"Duplicatas={motivos_gravacao['duplicata_hash']}, Falhas de UC={motivos_gravacao['falha_uc']}")
+
+    if marcas is not None:
+        if erros:
+            logging.warning("Marcas de sincronização mantidas: houve erros durante o pipeline.")
+        else:
+            gravador_disco().aguardar()
+            for pasta, nova_marca in marcas_pendentes:
+                marcas.atualizar(pasta, nova_marca)
+            marcas.salvar()
+
+    if not fila_pastas.empty():
+        raise Exception("Nem todas as pastas foram processadas (todos os produtores falharam). Veja o log.")
+    return resultado["sucesso"], resultado["falha"]
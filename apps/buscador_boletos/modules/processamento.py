@@ -0,0 +1,521 @@
+import os
+import re
+import time
+import shutil
+import sqlite3
+import logging
+import threading
+
+from .config import (PASTA_SAIDA_BOLETOS, PASTA_SAIDA_FALHAS, DOMINIO_REMETENTE_VALIDO, PASTAS_BANIDAS,
+                     LIMITES_TAMANHO_ANEXO, MIME_ANEXO_REJEITADOS, ACERVO_ATIVO)
+from .utils import normaliza
+from .processos_pdf import analisador_pdf
+from .pdf_processor import extrair_uc_do_texto, extrair_nome_do_texto
+from .fila_ocr import fila_ocr
+from .indice_hashes import indice_hashes
+from .gravacao_disco import gravador_disco
+from .acervo import acervo
+from .expansor_zip import expandir_zip, eh_boleto_pdf
+from .tabela_mapi import triar_linha
+from .marcas import MarcaPasta, MODO_COMPLETO, MODO_INCREMENTAL, id_item
+from .metricas import medir, medir_iteracao, na_pasta, pasta_atual
+
+# Janelas simultâneas gravam no mesmo diretório: checagem de hash e gravação são atômicas entre si
+_lock_gravacao = threading.Lock()
+
+
+def novos_motivos():
+    return {"nao_mail": 0, "fora_periodo": 0, "remetente": 0, "corpo": 0, "sem_anexo_valido": 0, "duplicata_hash": 0, "falha_uc": 0, "ja_sincronizado": 0, "pasta_banida": 0, "duplicata_mensagem": 0,
+            "anexo_tipo": 0, "anexo_tamanho": 0, "anexo_adiado": 0}
+
+
+ADIAR = "adiar"
+
+
+def _eh_anexo_candidato(nome):
+    return eh_boleto_pdf(nome) or str(nome or "").lower().endswith(".zip")
+
+
+def triar_anexo(att):
+    """
+    Pré-filtro só com metadados (nada é baixado). Retorna None (baixar), ``ADIAR`` (acima do
+    tamanho máximo: baixar só se o e-mail não tiver outro boleto), ``""`` (nome não é de
+    boleto) ou o motivo da rejeição (``"anexo_tipo"``/``"anexo_tamanho"``).
+    """
+    if not _eh_anexo_candidato(att.nome):
+        return ""
+    mime = att.mime
+    if mime.startswith(MIME_ANEXO_REJEITADOS) or (att.content_id and mime and not mime.startswith("application/")):
+        # Imagem/texto com nome de boleto ou conteúdo embutido no corpo (Content-ID)
+        return "anexo_tipo"
+    if att.tamanho is not None:
+        minimo, maximo = LIMITES_TAMANHO_ANEXO.get(os.path.splitext(str(att.nome).lower())[1], (0, None))
+        if att.tamanho < minimo:
+            return "anexo_tamanho"
+        if maximo is not None and att.tamanho > maximo:
+            return ADIAR
+    return None
+
+
+def _baixar_boletos(anexos, email_id):
+    encontrados = []
+    for att in anexos:
+        with medir("anexo"):
+            conteudo = att.conteudo()
+        if conteudo is None:
+            continue
+        if not str(att.nome).lower().endswith(".zip"):
+            if conteudo.tamanho: encontrados.append((conteudo, att, att.nome))
+            else: conteudo.fechar()
+            continue
+        # O zip é lido direto da visão de arquivo; só os membros de boleto são copiados
+        with conteudo, medir("zip"):
+            for nome, membro in expandir_zip(conteudo, att.nome, email_id):
+                if membro.tamanho: encontrados.append((membro, att, nome))
+                else: membro.fechar()
+    return encontrados
+
+
+def extrair_anexos_alvo(item, email_id, motivos=None, ja_salvos=()):
+    """
+    Devolve ``[(conteudo, anexo, nome), ...]`` com todos os boleto*.pdf do e-mail, anexados
+    direto ou dentro de .zip (``expansor_zip.expandir_zip``: vários membros, zips aninhados e
+    senhas comuns). Cada ``conteudo`` é um ``conteudo.ConteudoAnexo``: quem recebe deve fechá-lo.
+    Antes de baixar, ``triar_anexo`` rejeita ou adia anexos pelos metadados (contados em ``motivos``);
+    os anexos em ``ja_salvos`` (no índice de mensagens) nem são considerados.
+    """
+    motivos = motivos if motivos is not None else novos_motivos()
+    candidatos, adiados = [], []
+    for att in item.anexos:
+        if any(att is salvo for salvo in ja_salvos):
+            continue
+        decisao = triar_anexo(att)
+        if decisao is None: candidatos.append(att)
+        elif decisao == ADIAR: adiados.append(att); motivos["anexo_adiado"] += 1
+        elif decisao: motivos[decisao] += 1
+
+    encontrados = _baixar_boletos(candidatos, email_id)
+    if not encontrados and adiados:
+        logging.info(f"Nenhum boleto nos anexos de tamanho normal de {email_id}; baixando {len(adiados)} anexo(s) grande(s) adiado(s).")
+        encontrados = _baixar_boletos(adiados, email_id)
+    return encontrados
+
+
+class OrigemAnexo:
+    """Anexo do e-mail de onde saíram uma ou mais cargas (um .zip pode trazer vários boletos)."""
+
+    def __init__(self, chave, total, mensagem=None):
+        # Chave no índice de mensagens: (Message-ID, nome do anexo, tamanho)
+        self.chave = chave
+        self.pendentes = total
+        self.hashes = []
+        # OrigemAnexo de todo o e-mail (chave = (Message-ID,)): só entra no índice com todos os boletos salvos
+        self.mensagem = mensagem
+
+
+class CargaBoleto:
+    """Anexo aprovado pelos filtros do e-mail, trafegando entre as etapas (hash, PDF, gravação)."""
+
+    def __init__(self, conteudo, recebido_em, assunto, nome_anexo=None, sequencia=0):
+        # conteudo.ConteudoAnexo; fechado por gravar_carga, a última etapa, ou pelo gravacao_disco se agendado
+        self.conteudo = conteudo
+        self.agendada = False
+        self.recebido_em = recebido_em
+        self.assunto = assunto or ""
+        self.email_id = f"Assunto: '{self.assunto or 'N/A'}'" + (f" [{nome_anexo}]" if nome_anexo else "")
+        # Posição do boleto entre os do mesmo e-mail (distingue os arquivos de falha)
+        self.sequencia = sequencia
+        self.hash = None
+        self.uc = None
+        self.nome_cliente = None
+        # PDF escaneado (vai para o OCR em segundo plano) e senha que o abriu, se criptografado
+        self.somente_imagem = False
+        self.senha_pdf = None
+        self.origem = None
+        # Pasta de origem: as métricas das etapas feitas em outras threads vão para ela
+        self.pasta = pasta_atual()
+
+
+def selecionar_anexos(item, dt_inicio, dt_fim, motivos, indice=None):
+    """
+    Filtros do e-mail (classe, período, remetente, corpo, anexo). Retorna a lista de
+    CargaBoleto do e-mail (uma por boleto; vazia se descartado).
+    Com ``indice`` (``indice_mensagens.IndiceMensagens``), anexos já processados são descartados
+    antes de qualquer byte ser baixado.
+    """
+    email_id = f"Assunto: '{item.assunto or 'N/A'}'"
+
+    if not item.eh_email:
+        motivos["nao_mail"] += 1; return []
+
+    received_time = item.recebido_em
+    if received_time is None or not (dt_inicio <= received_time <= dt_fim):
+        motivos["fora_periodo"] += 1; return []
+
+    with medir("remetente"):
+        remetente = item.remetente
+    if not remetente.endswith(DOMINIO_REMETENTE_VALIDO):
+        motivos["remetente"] += 1; return []
+
+    ja_salvos = []
+    if indice is not None and item.message_id:
+        # Só metadados do anexo (nome/tamanho): nada é baixado. Só os anexos já salvos são pulados;
+        # os demais (ex.: falha de UC) voltam a ser processados
+        candidatos = [att for att in item.anexos if _eh_anexo_candidato(att.nome)]
+        ja_salvos = [att for att in candidatos if indice.contem_anexo(item.message_id, att.nome, att.tamanho)]
+        if ja_salvos and len(ja_salvos) == len(candidatos):
+            motivos["duplicata_mensagem"] += 1; return []
+
+    with medir("corpo"):
+        corpo = normaliza(item.corpo)
+    if "solicitacao de pagamento" not in corpo:
+        motivos["corpo"] += 1; return []
+
+    encontrados = extrair_anexos_alvo(item, email_id, motivos, ja_salvos)
+    if not encontrados:
+        motivos["sem_anexo_valido"] += 1; return []
+
+    cargas, origens = [], {}
+    mensagem = OrigemAnexo((item.message_id,), len(encontrados))
+    # Anexos já salvos contam na numeração: o arquivo de falha refeito mantém o nome da 1ª tentativa
+    varios = len(encontrados) + len(ja_salvos) > 1
+    for sequencia, (conteudo, anexo, nome) in enumerate(encontrados, start=len(ja_salvos)):
+        carga = CargaBoleto(conteudo, received_time, item.assunto, nome if varios else None, sequencia)
+        if id(anexo) not in origens:
+            total = sum(1 for _, a, _ in encontrados if a is anexo)
+            origens[id(anexo)] = OrigemAnexo((item.message_id, anexo.nome, anexo.tamanho), total, mensagem)
+        carga.origem = origens[id(anexo)]
+        cargas.append(carga)
+    if len(cargas) > 1:
+        logging.info(f"{len(cargas)} boletos encontrados nos anexos de {email_id}.")
+    return cargas
+
+
+def analisar_carga(carga):
+    """
+    Etapa de CPU: UC e, se houver UC, nome do cliente (um único ``BoletoPdf`` para os dois),
+    em um processo auxiliar quando disponível (``processos_pdf``).
+    """
+    logging.info(f"PROCESSANDO ANEXO VÁLIDO de {carga.email_id}")
+    resultado = analisador_pdf().analisar(carga.conteudo, carga.hash)
+    carga.uc = resultado["uc"]
+    carga.somente_imagem = resultado["somente_imagem"]
+    carga.senha_pdf = (resultado["decifragem"] or {}).get("senha")
+    if carga.uc:
+        carga.nome_cliente = resultado["nome_cliente"]
+        logging.info(f"UC '{carga.uc}' (página {resultado['pagina_uc']}, padrão {resultado['padrao_uc']}), cliente '{carga.nome_cliente}'.")
+    return carga
+
+
+def gravar_carga(carga, motivos, arquivos_salvos, hashes_salvos, indice=None):
+    """
+    Etapa de disco: agenda a gravação do boleto (ou da falha de UC) no ``gravacao_disco`` e
+    atualiza os conjuntos de dedup. Retorna (sucesso, falha). Com ``indice``, o anexo de origem
+    entra no índice quando o conteúdo de todas as suas cargas já está salvo ou agendado (novo ou
+    duplicata), e o e-mail inteiro quando o de todos os seus anexos está. O conteúdo da carga é
+    fechado ao final, se não foi entregue ao gravador.
+    """
+    tamanho = carga.conteudo.tamanho
+    try:
+        with _lock_gravacao:
+            resultado = _gravar_carga(carga, motivos, arquivos_salvos, hashes_salvos)
+            if indice is not None and carga.origem is not None and hashes_salvos.contem(carga.hash, tamanho):
+                for origem in (carga.origem, carga.origem.mensagem):
+                    if origem is None: continue
+                    origem.hashes.append(carga.hash); origem.pendentes -= 1
+                    if origem.pendentes == 0:
+                        for hash_conteudo in origem.hashes:
+                            indice.registrar(*origem.chave, hash_conteudo=hash_conteudo)
+            return resultado
+    finally:
+        if not carga.agendada:
+            carga.conteudo.fechar()
+
+
+def _nome_boleto(uc, nome_cliente, recebido_em):
+    nome_cliente_safe = re.sub(r'[\\/*?:"<>|]', "", nome_cliente)[:50].strip()
+    # Data do recebimento do e-mail para evitar duplicatas de competência
+    return f"{uc}_{nome_cliente_safe}_{recebido_em.strftime('%Y%m%d')}.pdf"
+
+
+def _agendar(carga, caminho, ao_confirmar, enderecado=False):
+    with medir("gravacao"):
+        gravador_disco().agendar(caminho, carga.conteudo, carga.hash, carga.uc, ao_confirmar, enderecado)
+    carga.agendada = True
+
+
+def _gravar_carga(carga, motivos, arquivos_salvos, hashes_salvos):
+    if hashes_salvos.contem(carga.hash, carga.conteudo.tamanho):
+        motivos["duplicata_hash"] += 1; return 0, 0
+
+    if carga.uc:
+        nome_arquivo = _nome_boleto(carga.uc, carga.nome_cliente, carga.recebido_em)
+        caminho = os.path.join(PASTA_SAIDA_BOLETOS, nome_arquivo)
+        # arquivos_salvos (listagem da pasta no início da busca + nomes já agendados) evita ir ao disco
+        if nome_arquivo in arquivos_salvos:
+            logging.warning(f"-> AVISO: O arquivo com nome '{nome_arquivo}' já existe no disco.")
+            return 0, 0
+        # Reservados já: outra cópia do conteúdo ou do nome nesta busca é duplicata mesmo antes de o arquivo existir
+        arquivos_salvos.add(nome_arquivo); hashes_salvos.add(carga.hash)
+        if ACERVO_ATIVO:
+            # O PDF vai para o acervo pelo hash; o nome legível em boletos_baixados é materializado na confirmação
+            _agendar(carga, acervo().caminho_objeto(carga.hash), _confirmar_no_acervo(carga, nome_arquivo, hashes_salvos),
+                     enderecado=True)
+        else:
+            _agendar(carga, caminho, _confirmar_boleto(carga.hash, hashes_salvos))
+        return 1, 0
+
+    motivos["falha_uc"] += 1
+    timestamp = carga.recebido_em.strftime("%Y%m%d_%H%M%S"); safe_subject = re.sub(r'[\\/*?:"<>|]', "", carga.assunto)[:50]
+    sufixo = f"_{carga.sequencia + 1}" if carga.sequencia else ""
+    nome_arquivo_falha = f"{timestamp}_{safe_subject}{sufixo}.pdf"; caminho_falha = os.path.join(PASTA_SAIDA_FALHAS, nome_arquivo_falha)
+    _agendar(carga, caminho_falha, _confirmar_falha(carga, arquivos_salvos, hashes_salvos))
+    return 0, 1
+
+
+def _confirmar_boleto(hash_conteudo, hashes_salvos):
+    """Confirmação da gravação de um boleto com UC (roda na thread do ``gravacao_disco``; recebe o nome final)."""
+    def confirmar(gravado_em):
+        if gravado_em:
+            logging.info(f"-> SUCESSO: Boleto salvo em: {gravado_em}")
+        else:
+            hashes_salvos.descartar(hash_conteudo)
+    return confirmar
+
+
+def _origem(carga):
+    """``(message_id, nome_do_anexo)`` do e-mail da carga, para o catálogo do acervo."""
+    return carga.origem.chave[:2] if carga.origem is not None else None
+
+
+def _confirmar_no_acervo(carga, nome_arquivo, hashes_salvos):
+    """Confirmação de um boleto gravado no acervo: cataloga e materializa ``nome_arquivo`` em boletos_baixados."""
+    def confirmar(gravado_em):
+        if gravado_em:
+            try:
+                acervo().catalogar(carga.hash, carga.conteudo.tamanho, carga.uc, carga.nome_cliente, carga.recebido_em, _origem(carga))
+                caminho = acervo().vincular(carga.hash, nome_arquivo, carga.uc)
+                logging.info(f"-> SUCESSO: Boleto salvo em: {caminho}")
+                return
+            except (OSError, sqlite3.Error) as e:
+                logging.error(f"Boleto gravado no acervo, mas não materializado como '{nome_arquivo}': {e}")
+        hashes_salvos.descartar(carga.hash)
+    return confirmar
+
+
+def _confirmar_falha(carga, arquivos_salvos, hashes_salvos):
+    """Confirmação da gravação de uma falha de UC: escaneados seguem para o OCR só com o arquivo no disco."""
+    def confirmar(gravado_em):
+        if not gravado_em:
+            return
+        logging.warning(f"-> FALHA DE UC: Salvo para análise em: {gravado_em}")
+        if carga.somente_imagem:
+            concluir = _concluir_ocr(gravado_em, carga.hash, carga.recebido_em, arquivos_salvos, hashes_salvos, _origem(carga))
+            if not fila_ocr().enfileirar(gravado_em, carga.hash, concluir, carga.senha_pdf):
+                logging.info("PDF escaneado sem OCR disponível (OCR_ATIVO, pdf2image/pytesseract); fica na pasta de falhas.")
+    return confirmar
+
+
+def _concluir_ocr(caminho_falha, hash_conteudo, recebido_em, arquivos_salvos, hashes_salvos, origem=None):
+    """Conclusão do OCR de um escaneado: com UC, o PDF sai da pasta de falhas para a de boletos."""
+    def concluir(texto):
+        uc = extrair_uc_do_texto(texto)
+        if not uc:
+            logging.warning(f"OCR sem UC em '{caminho_falha}'. Arquivo mantido na pasta de falhas.")
+            return False
+        nome_cliente = extrair_nome_do_texto(texto)
+        nome_arquivo = _nome_boleto(uc, nome_cliente, recebido_em)
+        caminho = os.path.join(PASTA_SAIDA_BOLETOS, nome_arquivo)
+        with _lock_gravacao:
+            if hashes_salvos.contem(hash_conteudo, os.path.getsize(caminho_falha)):
+                os.remove(caminho_falha)
+                logging.info(f"OCR: '{caminho_falha}' já estava salvo como boleto; cópia da pasta de falhas removida.")
+            elif os.path.exists(caminho):
+                logging.warning(f"OCR: UC '{uc}' encontrada, mas '{nome_arquivo}' já existe. Arquivo mantido na pasta de falhas.")
+                return False
+            else:
+                if ACERVO_ATIVO:
+                    acervo().incorporar(caminho_falha, hash_conteudo, nome_arquivo, uc, nome_cliente, recebido_em, origem)
+                else:
+                    shutil.move(caminho_falha, caminho)
+                    indice_hashes().registrar(caminho, hash_conteudo, uc)
+                arquivos_salvos.add(nome_arquivo); hashes_salvos.add(hash_conteudo)
+                logging.info(f"-> SUCESSO (OCR): UC '{uc}'; boleto movido para: {caminho}")
+        return True
+    return concluir
+
+
+def processar_mensagem(item, dt_inicio, dt_fim, motivos, arquivos_salvos, hashes_salvos, indice=None):
+    """Aplica os filtros e salva os boletos de uma mensagem, tudo na thread atual. Retorna (sucesso, falha)."""
+    sucesso, falha, erro = 0, 0, None
+    for carga in selecionar_anexos(item, dt_inicio, dt_fim, motivos, indice):
+        try:
+            with medir("hash"):
+                carga.hash = carga.conteudo.hash()
+            if not hashes_salvos.contem(carga.hash, carga.conteudo.tamanho):
+                analisar_carga(carga)
+            # Duplicata: gravar_carga contabiliza e registra a mensagem no índice sem abrir o PDF
+            s, f = gravar_carga(carga, motivos, arquivos_salvos, hashes_salvos, indice)
+        except Exception as e:
+            # Como no pipeline: o conteúdo (temporário em disco) é liberado e os demais anexos seguem
+            if not carga.agendada:
+                carga.conteudo.fechar()
+            logging.error(f"Erro ao processar o PDF de {carga.email_id}: {e}")
+            erro = e
+            continue
+        sucesso += s; falha += f
+    if erro is not None:
+        # A pasta fica com erro (a marca não avança), como no pipeline
+        raise erro
+    return sucesso, falha
+
+
+def varrer_pasta(pasta, dt_inicio, dt_fim, motivos, consumir, status_callback, progress_callback, marcas=None, modo=MODO_COMPLETO,
+                 indice=None):
+    """
+    Percorre os itens de UMA pasta (sem subpastas): marca incremental, triagem por metadados
+    e abertura dos itens aprovados. Cada mensagem aprovada vai para ``consumir(item)``, que
+    devolve ``(sucesso, falha)``. Retorna ``(sucesso, falha, nova_marca)``; ``nova_marca`` é
+    None quando houve erro na pasta (a marca antiga deve ser mantida). Com ``indice``, linhas da
+    triagem cujo Message-ID já está no índice de mensagens nem são abertas. As etapas são
+    cronometradas em nome da pasta (``metricas``).
+    """
+    with na_pasta(pasta.caminho):
+        return _varrer_pasta(pasta, dt_inicio, dt_fim, motivos, consumir, status_callback, progress_callback, marcas, modo, indice)
+
+
+def _varrer_pasta(pasta, dt_inicio, dt_fim, motivos, consumir, status_callback, progress_callback, marcas, modo, indice):
+    sucesso_total, falha_total = 0, 0
+    marca = marcas.marca(pasta) if marcas is not None else MarcaPasta()
+    incremental = marcas is not None and marcas.aplica(pasta, dt_inicio, modo)
+    dt_inicio_pasta = marcas.inicio_efetivo(pasta, dt_inicio, modo) if marcas is not None else dt_inicio
+    if dt_inicio_pasta != dt_inicio:
+        logging.info(f"Modo incremental: '{pasta.nome}' já sincronizada até {marca.ultimo_recebido:%d/%m/%Y %H:%M:%S}.")
+    elif modo == MODO_INCREMENTAL and marca.ultimo_recebido is not None and not incremental:
+        logging.info(f"Modo incremental: o período pedido começa antes do já varrido em '{pasta.nome}'; lendo o período inteiro.")
+    nova_marca = MarcaPasta(marca.ultimo_recebido, marca.ids_no_limite, marca.coberto)
+    houve_erro = False
+
+    with medir("restrict"):
+        triagem = pasta.metadados(dt_inicio_pasta, dt_fim) if dt_inicio_pasta <= dt_fim else (iter(()), 0)
+        if triagem is None:
+            elementos, total_filtrado = pasta.itens(dt_inicio_pasta, dt_fim)
+    if triagem is not None:
+        # Triagem em lote: só as linhas aprovadas têm o item completo aberto
+        elementos, total_filtrado = triagem
+        status_callback(f"   {total_filtrado} e-mails no período (triagem por metadados). Processando...")
+    else:
+        status_callback(f"   {total_filtrado} e-mails no período (pré-filtro por data). Processando...")
+
+    progress_callback(0, total_filtrado, "")
+    abertos = 0
+    try:
+        for i, elemento in enumerate(medir_iteracao(elementos, "enumeracao")):
+            progress_callback(i + 1, total_filtrado, f"Analisando e-mail {i+1} de {total_filtrado}")
+            try:
+                if triagem is not None:
+                    recebido, identificador = elemento.recebido_em, elemento.entry_id
+                elif elemento.eh_email:
+                    recebido, identificador = elemento.recebido_em, id_item(elemento)
+                else:
+                    recebido, identificador = None, ""
+
+                if incremental and marca.ja_processado(recebido, identificador):
+                    motivos["ja_sincronizado"] += 1; continue
+
+                if triagem is None:
+                    s, f = consumir(elemento)
+                elif not triar_linha(elemento, dt_inicio, dt_fim, motivos):
+                    s, f = 0, 0
+                elif indice is not None and indice.contem_mensagem(elemento.message_id):
+                    # Mesma mensagem já processada (outra pasta ou execução anterior): nem abre o item
+                    motivos["duplicata_mensagem"] += 1; s, f = 0, 0
+                else:
+                    abertos += 1
+                    with medir("abrir_item"):
+                        item = pasta.abrir(elemento)
+                    if item is None:
+                        # Resultado de busca na conta inteira vindo de uma pasta em PASTAS_BANIDAS
+                        motivos["pasta_banida"] += 1; s, f = 0, 0
+                    else:
+                        s, f = consumir(item)
+                sucesso_total += s; falha_total += f
+
+                if recebido is not None and dt_inicio_pasta <= recebido <= dt_fim:
+                    nova_marca.avancar(recebido, identificador)
+            except Exception as e_item:
+                houve_erro = True
+                logging.error(f"Erro inesperado ao processar um item individual: {e_item}")
+    except Exception as e:
+        houve_erro = True
+        logging.error(f"Erro ao ler os itens de '{pasta.nome}': {e}")
+    if triagem is not None:
+        logging.info(f"Triagem por metadados em '{pasta.nome}': {abertos} de {total_filtrado} itens abertos por EntryID.")
+
+    if houve_erro:
+        # Não avança a marca: os itens com erro precisam ser revistos na próxima execução
+        if marcas is not None:
+            logging.warning(f"Marca de sincronização de '{pasta.nome}' mantida por causa de erros na pasta.")
+        nova_marca = None
+    else:
+        # Com a marca, o trecho antes de dt_inicio_pasta já estava coberto: a pasta fica varrida desde dt_inicio
+        nova_marca.cobrir(dt_inicio, dt_fim)
+    return sucesso_total, falha_total, nova_marca
+
+
+def listar_pastas(raiz):
+    """A pasta raiz e todas as subpastas não banidas, em profundidade (mesma ordem da varredura recursiva)."""
+    pastas = [raiz]
+    for subpasta in raiz.subpastas():
+        if str(subpasta.nome).strip().lower() in PASTAS_BANIDAS:
+            logging.info(f"Ignorando pasta banida: {subpasta.caminho}")
+            continue
+        pastas.extend(listar_pastas(subpasta))
+    return pastas
+
+
+def percorrer_e_processar_pasta(pasta, dt_inicio, dt_fim, status_callback, progress_callback, arquivos_salvos, hashes_salvos,
+                                marcas=None, modo=MODO_COMPLETO, perfis=None, indice=None, pastas_com_erro=None):
+    """
+    Processa uma pasta (``mail_source.PastaEmails``) e, recursivamente, suas subpastas não banidas.
+    Com ``marcas`` (``marcas.RegistroMarcas``) a marca de sincronização de cada pasta é atualizada;
+    em ``MODO_INCREMENTAL`` só são lidos os e-mails posteriores à marca. Com ``perfis``
+    (``perfis.RegistroPerfis``) as pastas que o cache manda pular não são lidas (as subpastas sim);
+    com ``indice`` (``indice_mensagens.IndiceMensagens``) mensagens já processadas não são baixadas.
+    Com ``pastas_com_erro`` (lista), recebe o caminho das pastas que não terminaram sem erros.
+    """
+    sucesso_total, falha_total = 0, 0
+    estado = pasta.estado() if perfis is not None else None
+    motivo_pular = perfis.motivo_para_pular(pasta, modo, estado, (dt_inicio, dt_fim)) if perfis is not None else None
+    if motivo_pular:
+        perfis.pular(pasta, motivo_pular)
+    else:
+        status_callback(f"Analisando pasta: {pasta.caminho}")
+        logging.info(f"--- ANALISANDO PASTA: {pasta.caminho} ---")
+
+        motivos = novos_motivos()
+        consumir = lambda item: processar_mensagem(item, dt_inicio, dt_fim, motivos, arquivos_salvos, hashes_salvos, indice)
+        inicio = time.perf_counter()
+        sucesso_total, falha_total, nova_marca = varrer_pasta(pasta, dt_inicio, dt_fim, motivos, consumir, status_callback,
+                                                              progress_callback, marcas=marcas, modo=modo, indice=indice)
+        if nova_marca is None and pastas_com_erro is not None:
+            pastas_com_erro.append(pasta.caminho)
+        if marcas is not None and nova_marca is not None:
+            # A marca só avança com os boletos da pasta já no disco
+            gravador_disco().aguardar()
+            marcas.atualizar(pasta, nova_marca); marcas.salvar()
+        if perfis is not None and nova_marca is not None:
+            perfis.registrar(pasta, estado, sucesso_total + falha_total + motivos["duplicata_hash"], time.perf_counter() - inicio,
+                             (dt_inicio, dt_fim))
+
+        logging.info(f"RESUMO DA PASTA '{pasta.nome}': Sucesso={sucesso_total}, Falha={falha_total}, Descartes={motivos}")
+        if sum(motivos.values()) > 0: status_callback(f"Descartes em '{pasta.nome}': {sum(motivos.values())} (Ver log)")
+
+    for subpasta in pasta.subpastas():
+        if str(subpasta.nome).strip().lower() in PASTAS_BANIDAS:
+            logging.info(f"Ignorando pasta banida: {subpasta.caminho}")
+            continue
+        s, f = percorrer_e_processar_pasta(subpasta, dt_inicio, dt_fim, status_callback, progress_callback, arquivos_salvos, hashes_salvos,
+                                           marcas=marcas, modo=modo, perfis=perfis, indice=indice, pastas_com_erro=pastas_com_erro)
+        sucesso_total += s; falha_total += f
+    return sucesso_total, falha_total
@@ -0,0 +1,151 @@
+"""
+Análise dos PDFs (UC e nome do cliente) em processos separados.
+
+PyPDF2 e as regex são Python puro: em threads, disputam o GIL entre si e com a thread que
+conversa com o Outlook. ``AnalisadorPdf`` envia os bytes do anexo (ou o caminho do arquivo
+temporário, ver ``conteudo.ConteudoAnexo``) para um ``ProcessPoolExecutor`` com
+``PROCESSOS_PDF`` processos e recebe de volta só um registro pequeno com o resultado e as
+medições (e a senha usada, que o registro de ``senhas_pdf`` aprende aqui). Se o pool não puder ser criado ou quebrar, a análise volta a ser feita na própria
+thread. O pool é criado na primeira análise e reaproveitado nas buscas seguintes (serviço
+residente).
+"""
+
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .config import PROCESSOS_PDF
+from .pdf_processor import BoletoPdf
+from .senhas_pdf import registro_senhas
+from . import metricas
+
+
+def _iniciar_processo():
+    # O log do processo auxiliar não iria para o arquivo do buscador: quem registra é o processo principal
+    logging.getLogger().handlers[:] = [logging.NullHandler()]
+
+
+def _resultado(boleto):
+    uc = boleto.uc
+    return {"uc": uc, "nome_cliente": boleto.nome_cliente if uc else None, "legivel": boleto.legivel,
+            "pagina_uc": boleto.pagina_uc, "padrao_uc": boleto.padrao_uc, "decifragem": boleto.decifragem,
+            "somente_imagem": boleto.somente_imagem}
+
+
+def _analisar_no_processo(origem, ordem_senhas):
+    coleta = metricas.iniciar_coleta()
+    if isinstance(origem, str):
+        with open(origem, "rb") as f:
+            resultado = _resultado(BoletoPdf(f, ordem_senhas))
+    else:
+        resultado = _resultado(BoletoPdf(BytesIO(origem), ordem_senhas))
+    resultado.update(amostras=coleta.amostras, contagens=coleta.contagens)
+    return resultado
+
+
+def processos_configurados(processos=None):
+    processos = PROCESSOS_PDF if processos is None else processos
+    if processos is None:
+        processos = min(8, max(1, (os.cpu_count() or 2) - 1))
+    return max(0, processos)
+
+
+class AnalisadorPdf:
+    """Encaminha as análises ao pool de processos, com volta para a própria thread (thread-safe)."""
+
+    def __init__(self, processos=None):
+        self.processos = processos_configurados(processos)
+        self._pool = None
+        self._lock = threading.Lock()
+        self.reiniciar_estatisticas()
+
+    def reiniciar_estatisticas(self):
+        self._analisados = 0
+        self._em_processo = 0
+        self._inicio = None
+        self._fim = None
+
+    def _obter_pool(self):
+        with self._lock:
+            if self._pool is None and self.processos > 0:
+                try:
+                    # spawn também fora do Windows: fork com threads (COM, pipeline) pode herdar locks presos
+                    self._pool = ProcessPoolExecutor(self.processos, mp_context=multiprocessing.get_context("spawn"),
+                                                     initializer=_iniciar_processo)
+                    logging.info(f"Leitura de PDFs em {self.processos} processos auxiliares.")
+                except (OSError, ValueError, NotImplementedError) as e:
+                    logging.warning(f"Processos auxiliares indisponíveis ({e}); PDFs lidos na própria thread.")
+                    self.processos = 0
+            return self._pool
+
+    def _desativar(self, erro):
+        with self._lock:
+            if self._pool is None: return
+            logging.warning(f"Pool de processos de PDF interrompido ({erro}); PDFs passam a ser lidos na própria thread.")
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool, self.processos = None, 0
+
+    def analisar(self, conteudo, hash_conteudo=None, aprender=True):
+        """
+        Analisa um ``conteudo.ConteudoAnexo`` e devolve o dicionário de ``_resultado``. Com
+        ``hash_conteudo``, um PDF que nenhuma senha abriu antes nem chega a ser lido. Com
+        ``aprender=False`` (simulação) o resultado da decifragem não entra no ``registro_senhas``.
+        """
+        senhas = registro_senhas()
+        if senhas.sem_senha(hash_conteudo):
+            senhas.pular(hash_conteudo)
+            return {"uc": None, "nome_cliente": None, "legivel": False, "pagina_uc": None, "padrao_uc": None,
+                    "decifragem": None, "somente_imagem": False}
+        inicio = time.perf_counter()
+        with self._lock:
+            self._inicio = self._inicio or inicio
+        resultado, pool = None, self._obter_pool()
+        if pool is not None:
+            try:
+                resultado = pool.submit(_analisar_no_processo, conteudo.caminho or conteudo.ler(), senhas.ordens()).result()
+                metricas.incorporar(resultado.pop("amostras"), resultado.pop("contagens"))
+            except BrokenProcessPool as e:
+                self._desativar(e)
+                resultado = None
+        if resultado is None:
+            resultado = _resultado(BoletoPdf(conteudo.abrir(), senhas.ordens()))
+        else:
+            with self._lock:
+                self._em_processo += 1
+        if aprender:
+            senhas.aprender(resultado["decifragem"], hash_conteudo)
+        with self._lock:
+            self._analisados += 1
+            self._fim = time.perf_counter()
+        return resultado
+
+    def resumo(self):
+        if not self._analisados:
+            return None
+        duracao = max(self._fim - self._inicio, 1e-6)
+        onde = f"{self._em_processo} em processos auxiliares" if self._em_processo else "todos na própria thread"
+        return (f"Análise de PDFs: {self._analisados} em {duracao:.1f}s ({self._analisados / duracao:.1f} PDFs/s; {onde}, "
+                f"{self.processos} processos ativos).")
+
+    def encerrar(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+
+_analisador = None
+_lock_analisador = threading.Lock()
+
+
+def analisador_pdf():
+    global _analisador
+    with _lock_analisador:
+        if _analisador is None:
+            _analisador = AnalisadorPdf()
+        return _analisador
@@ -0,0 +1,142 @@
+"""
+Senhas aprendidas dos boletos em PDF criptografados.
+
+Cada PDF criptografado é identificado por uma impressão do modelo que o gerou, tirada do
+dicionário ``/Encrypt`` (filtro, versão, revisão, tamanho da chave e permissões). Produtor,
+criador e tamanho da página não servem: ficam cifrados (ou inacessíveis ao PyPDF2) até o
+PDF ser aberto. Para cada modelo o registro guarda a última senha que funcionou e quantas
+vezes cada senha acertou; ``ordens`` devolve as ``SENHAS_COMUNS`` nessa ordem (modelo novo:
+ordem geral de acertos). Documentos que nenhuma senha abriu ficam anotados pelo SHA-256 e
+vão direto para as falhas nas próximas execuções, até ``SENHAS_COMUNS`` ganhar senha nova.
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+
+from .config import ARQUIVO_SENHAS_PDF, SENHAS_COMUNS
+from .metricas import contar
+
+_CAMPOS_IMPRESSAO = ("/Filter", "/V", "/R", "/Length", "/P")
+
+
+def impressao_modelo(reader):
+    """Impressão do modelo de um ``PyPDF2.PdfReader`` criptografado (antes de descriptografar)."""
+    try:
+        cifra = reader.trailer["/Encrypt"].get_object()
+        return "|".join(f"{campo[1:]}={cifra.get(campo)}" for campo in _CAMPOS_IMPRESSAO)
+    except Exception:
+        return "desconhecido"
+
+
+def ordenar_senhas(acertos, ultima=None, senhas=None):
+    """``senhas`` (padrão ``SENHAS_COMUNS``) com ``ultima`` primeiro e as demais por acertos; empates na ordem original."""
+    senhas = list(SENHAS_COMUNS if senhas is None else senhas)
+    return sorted(senhas, key=lambda s: (s != ultima, -acertos.get(s, 0), senhas.index(s)))
+
+
+class RegistroSenhas:
+    """
+    Senhas que abriram cada modelo e documentos sem senha conhecida (JSON, thread-safe).
+    ``ordens`` é pequeno e vai junto com cada PDF para os processos auxiliares (``processos_pdf``);
+    quem aprende é sempre o processo principal, em ``aprender``.
+    """
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or ARQUIVO_SENHAS_PDF
+        self._lock = threading.Lock()
+        self._dados = {"modelos": {}, "sem_senha": {}}
+        if os.path.exists(self.caminho):
+            try:
+                with open(self.caminho, "r", encoding="utf-8") as f:
+                    self._dados = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Senhas aprendidas ilegíveis em '{self.caminho}' ({e}). Iniciando do zero.")
+        self._ordens = None
+        self.reiniciar_estatisticas()
+
+    def reiniciar_estatisticas(self):
+        with self._lock:
+            self._criptografados = 0
+            self._tentativas = 0
+            self._economizadas = 0
+            self._pulados = 0
+
+    def ordens(self):
+        """``{impressao: [senhas]}`` para cada modelo conhecido, mais ``""`` com a ordem geral (modelos novos)."""
+        with self._lock:
+            if self._ordens is None:
+                geral = {}
+                for modelo in self._dados["modelos"].values():
+                    for senha, n in modelo["acertos"].items():
+                        geral[senha] = geral.get(senha, 0) + n
+                self._ordens = {impressao: ordenar_senhas(m["acertos"], m.get("ultima"))
+                                for impressao, m in self._dados["modelos"].items()}
+                self._ordens[""] = ordenar_senhas(geral)
+            return self._ordens
+
+    def sem_senha(self, hash_conteudo):
+        """True se o documento já foi testado com todas as ``SENHAS_COMUNS`` atuais sem abrir."""
+        testadas = self._dados["sem_senha"].get(hash_conteudo) if hash_conteudo else None
+        return testadas is not None and set(SENHAS_COMUNS) <= set(testadas)
+
+    def pular(self, hash_conteudo):
+        """Contabiliza um documento que foi direto para as falhas por ``sem_senha``."""
+        with self._lock:
+            self._pulados += 1
+            self._economizadas += len(SENHAS_COMUNS)
+        contar("senhas_pdf_economizadas", len(SENHAS_COMUNS))
+        logging.warning(f"PDF {hash_conteudo[:12]} já testado com todas as senhas sem abrir; vai direto para as falhas.")
+
+    def aprender(self, decifragem, hash_conteudo=None):
+        """Registra o resultado de ``BoletoPdf.decifragem`` (None: PDF sem criptografia)."""
+        if not decifragem:
+            return
+        senha, tentativas = decifragem["senha"], decifragem["tentativas"]
+        # Referência: as SENHAS_COMUNS tentadas na ordem da configuração
+        referencia = SENHAS_COMUNS.index(senha) + 1 if senha in SENHAS_COMUNS else len(SENHAS_COMUNS)
+        with self._lock:
+            self._criptografados += 1
+            self._tentativas += tentativas
+            self._economizadas += referencia - tentativas
+            if senha is None:
+                if hash_conteudo:
+                    self._dados["sem_senha"][hash_conteudo] = sorted(SENHAS_COMUNS)
+            else:
+                modelo = self._dados["modelos"].setdefault(decifragem["impressao"], {"acertos": {}})
+                modelo["acertos"][senha] = modelo["acertos"].get(senha, 0) + 1
+                modelo["ultima"] = senha
+                modelo["visto_em"] = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+                if hash_conteudo:
+                    self._dados["sem_senha"].pop(hash_conteudo, None)
+                self._ordens = None
+        contar("senhas_pdf_tentativas", tentativas)
+        contar("senhas_pdf_economizadas", referencia - tentativas)
+
+    def resumo(self):
+        if not (self._criptografados or self._pulados):
+            return None
+        return (f"PDFs criptografados: {self._criptografados} lidos com {self._tentativas} tentativas de senha, "
+                f"{self._pulados} sem senha conhecida pulados ({self._economizadas} tentativas economizadas).")
+
+    def salvar(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+            tmp = self.caminho + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._dados, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.caminho)
+
+
+_registro = None
+_lock_registro = threading.Lock()
+
+
+def registro_senhas():
+    global _registro
+    with _lock_registro:
+        if _registro is None:
+            _registro = RegistroSenhas()
+        return _registro
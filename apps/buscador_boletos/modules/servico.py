@@ -0,0 +1,255 @@
+"""
+Serviço residente do buscador de boletos.
+
+Mantém aquecidos entre uma busca e outra:
+
+- a sessão do Outlook (Application, namespace, conta e Caixa de Entrada já resolvidos);
+- o índice de hashes dos PDFs salvos (``indice_hashes``: só arquivos novos são lidos);
+- os processos auxiliares de leitura de PDF (``processos_pdf``).
+
+O OCR dos boletos escaneados (``fila_ocr``) continua em segundo plano depois de cada busca;
+o encerramento do serviço espera a fila esvaziar.
+
+A GUI e a linha de comando enviam buscas por um canal local (``multiprocessing.connection``
+em ``HOST_SERVICO:PORTA_SERVICO``, autenticado pela chave em ``ARQUIVO_CHAVE_SERVICO``) e
+recebem status e progresso enquanto a busca anda. As buscas rodam uma de cada vez, numa
+thread própria que detém o apartment COM.
+"""
+
+import os
+import queue
+import logging
+import threading
+from datetime import datetime
+from multiprocessing.connection import Listener, Client
+
+from .config import HOST_SERVICO, PORTA_SERVICO, ARQUIVO_CHAVE_SERVICO, CONTAS_OUTLOOK
+from .indice_hashes import indice_hashes
+from .mail_source import FonteArquivos
+from .outlook_service import buscar_e_salvar_boletos, FonteOutlook, pythoncom
+from .processos_pdf import analisador_pdf
+from .fila_ocr import fila_ocr
+from .gravacao_disco import gravador_disco
+
+
+def _chave(criar=False):
+    caminho = ARQUIVO_CHAVE_SERVICO
+    if not os.path.exists(caminho):
+        if not criar:
+            raise FileNotFoundError("Serviço residente nunca foi iniciado (chave de acesso inexistente).")
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with open(caminho, "wb") as f:
+            f.write(os.urandom(32))
+    with open(caminho, "rb") as f:
+        return f.read()
+
+
+class ServicoBuscador:
+    def __init__(self, endereco=None):
+        self.endereco = endereco or (HOST_SERVICO, PORTA_SERVICO)
+        self._fila = queue.Queue()
+        self._fontes = {}  # conta -> FonteOutlook conectada na thread de buscas
+        self._hashes = indice_hashes()
+        self._listener = None
+        self._encerrando = threading.Event()
+        self.iniciado_em = datetime.now()
+        self.buscas_atendidas = 0
+        self.busca_em_andamento = None
+
+    def estado(self):
+        return {
+            "pid": os.getpid(),
+            "iniciado_em": self.iniciado_em.isoformat(timespec="seconds"),
+            "buscas_atendidas": self.buscas_atendidas,
+            "busca_em_andamento": self.busca_em_andamento,
+            "buscas_na_fila": self._fila.qsize(),
+            "outlook": {conta: fonte.namespace is not None for conta, fonte in self._fontes.items()},
+            "hashes_em_cache": len(self._hashes),
+            "hashes_atualizados_em": self._hashes.atualizado_em.isoformat(timespec="seconds") if self._hashes.atualizado_em else None,
+        }
+
+    # ---------------- Thread de buscas (dona do apartment COM) ----------------
+
+    def _fonte_outlook(self, conta, status_callback):
+        fonte = self._fontes.get(conta)
+        if fonte is not None and fonte.conectada():
+            status_callback(f"Sessão do Outlook já aberta para '{fonte.nome}'.")
+            return fonte
+        status_callback("Conectando ao Outlook...")
+        fonte = FonteOutlook(conta).conectar()
+        self._fontes[conta] = fonte
+        return fonte
+
+    def _executar_busca(self, pedido, enviar):
+        status = lambda mensagem: enviar({"tipo": "status", "mensagem": mensagem})
+        progresso = lambda valor, maximo, texto: enviar({"tipo": "progresso", "valor": valor, "maximo": maximo, "texto": texto})
+        resultado = {"sucesso": 0, "falha": 0, "erro": False}
+
+        def concluir(sucesso, falha, erro=False):
+            resultado.update(sucesso=sucesso, falha=falha, erro=erro)
+
+        try:
+            contas = pedido.get("contas") or CONTAS_OUTLOOK
+            if pedido.get("arquivos"):
+                fonte = [FonteArquivos(caminho) for caminho in pedido["arquivos"]]
+            elif len(contas) == 1:
+                fonte = self._fonte_outlook(contas[0], status)
+            else:
+                # Cada caixa roda na sua própria thread/apartment: a sessão não pode ser reaproveitada
+                fonte = None
+            hashes = self._hashes.reconciliar()
+            status(f"Índice de hashes: {len(hashes)} boletos já salvos.")
+            opcoes = {k: pedido[k] for k in ("modo", "estrategia", "paralelo", "janela", "janelas_simultaneas") if k in pedido}
+            buscar_e_salvar_boletos(pedido["inicio"], pedido["fim"], status, progresso, concluir, fonte=fonte, contas=contas,
+                                    hashes_salvos=hashes, **opcoes)
+        except Exception as e:
+            logging.error(f"Erro no serviço ao executar a busca: {e}", exc_info=True)
+            status(f"ERRO no serviço: {e}")
+            resultado["erro"] = True
+        enviar({"tipo": "fim", **resultado})
+
+    def _trabalhador(self):
+        if pythoncom is not None: pythoncom.CoInitialize()
+        try:
+            while True:
+                pacote = self._fila.get()
+                if pacote is None: break
+                pedido, enviar, concluida = pacote
+                self.busca_em_andamento = f"{pedido['inicio']} a {pedido['fim']}"
+                try:
+                    self._executar_busca(pedido, enviar)
+                finally:
+                    self.busca_em_andamento = None
+                    self.buscas_atendidas += 1
+                    concluida.set()
+        finally:
+            if pythoncom is not None: pythoncom.CoUninitialize()
+
+    # ---------------- Atendimento dos clientes ----------------
+
+    def _atender(self, conn):
+        try:
+            pedido = conn.recv()
+            tipo = pedido.get("tipo")
+            if tipo == "estado":
+                conn.send({"tipo": "estado", **self.estado()})
+            elif tipo == "encerrar":
+                conn.send({"tipo": "ok"})
+                self.encerrar()
+            elif tipo == "buscar":
+                lock, desconectado = threading.Lock(), [False]
+
+                def enviar(mensagem):
+                    # Cliente fechado no meio da busca: a busca continua, só deixa de reportar
+                    with lock:
+                        if desconectado[0]: return
+                        try: conn.send(mensagem)
+                        except (OSError, EOFError): desconectado[0] = True
+
+                if self.busca_em_andamento or not self._fila.empty():
+                    enviar({"tipo": "status", "mensagem": "Aguardando a busca em andamento terminar..."})
+                concluida = threading.Event()
+                self._fila.put((pedido, enviar, concluida))
+                concluida.wait()
+            else:
+                conn.send({"tipo": "erro", "mensagem": f"Pedido desconhecido: {tipo!r}"})
+        except (OSError, EOFError) as e:
+            logging.warning(f"Conexão com cliente do serviço encerrada: {e}")
+        finally:
+            conn.close()
+
+    def executar(self):
+        """Atende pedidos até receber ``encerrar`` (bloqueia a thread chamadora)."""
+        self._listener = Listener(self.endereco, authkey=_chave(criar=True))
+        logging.info(f"Serviço do buscador de boletos ouvindo em {self.endereco[0]}:{self.endereco[1]} (pid {os.getpid()}).")
+        trabalhador = threading.Thread(target=self._trabalhador, name="boletos-servico", daemon=True)
+        trabalhador.start()
+        try:
+            while not self._encerrando.is_set():
+                try:
+                    conn = self._listener.accept()
+                except (OSError, EOFError) as e:
+                    if self._encerrando.is_set(): break
+                    logging.warning(f"Conexão recusada pelo serviço: {e}")
+                    continue
+                if self._encerrando.is_set():
+                    conn.close(); break
+                threading.Thread(target=self._atender, args=(conn,), name="boletos-servico-cliente", daemon=True).start()
+        finally:
+            self._listener.close()
+            self._fila.put(None)
+            trabalhador.join()
+            analisador_pdf().encerrar()
+            gravador_disco().aguardar()
+            fila_ocr().aguardar()
+            logging.info("Serviço do buscador de boletos encerrado.")
+
+    def encerrar(self):
+        self._encerrando.set()
+        # Conexão de si para si: desbloqueia o accept() da thread principal
+        try:
+            Client(self.endereco, authkey=_chave()).close()
+        except (OSError, EOFError, FileNotFoundError):
+            pass
+
+
+class ClienteServico:
+    """Acesso ao serviço residente; ``buscar`` tem a mesma assinatura de ``buscar_e_salvar_boletos``."""
+
+    def __init__(self, endereco=None):
+        self.endereco = endereco or (HOST_SERVICO, PORTA_SERVICO)
+
+    def _conectar(self):
+        return Client(self.endereco, authkey=_chave())
+
+    def _pedir(self, pedido):
+        with self._conectar() as conn:
+            conn.send(pedido)
+            return conn.recv()
+
+    def disponivel(self):
+        try:
+            self.estado()
+            return True
+        except Exception:
+            return False
+
+    def estado(self):
+        return self._pedir({"tipo": "estado"})
+
+    def encerrar(self):
+        return self._pedir({"tipo": "encerrar"})
+
+    def buscar(self, data_inicio_str, data_fim_str, status_callback, progress_callback, completion_callback, **opcoes):
+        try:
+            with self._conectar() as conn:
+                conn.send({"tipo": "buscar", "inicio": data_inicio_str, "fim": data_fim_str, **opcoes})
+                while True:
+                    mensagem = conn.recv()
+                    if mensagem["tipo"] == "status":
+                        status_callback(mensagem["mensagem"])
+                    elif mensagem["tipo"] == "progresso":
+                        progress_callback(mensagem["valor"], mensagem["maximo"], mensagem["texto"])
+                    elif mensagem["tipo"] == "fim":
+                        break
+        except (OSError, EOFError) as e:
+            logging.error(f"Conexão com o serviço residente perdida: {e}")
+            status_callback(f"ERRO: conexão com o serviço residente perdida ({e}).")
+            completion_callback(0, 0, erro=True)
+            return
+        if mensagem["erro"]:
+            completion_callback(mensagem["sucesso"], mensagem["falha"], erro=True)
+        else:
+            completion_callback(mensagem["sucesso"], mensagem["falha"])
+
+
+def formatar_estado(estado):
+    linhas = [f"Serviço residente ativo (pid {estado['pid']}, desde {estado['iniciado_em']})",
+              f"  Buscas atendidas: {estado['buscas_atendidas']}; na fila: {estado['buscas_na_fila']}",
+              f"  Busca em andamento: {estado['busca_em_andamento'] or 'nenhuma'}",
+              f"  Hashes em cache: {estado['hashes_em_cache']} (atualizados em {estado['hashes_atualizados_em'] or 'nunca'})"]
+    for conta, conectada in estado["outlook"].items():
+        linhas.append(f"  Outlook '{conta}': {'sessão aberta' if conectada else 'desconectado'}")
+    if not estado["outlook"]:
+        linhas.append("  Outlook: nenhuma sessão aberta ainda")
+    return "\n".join(linhas)
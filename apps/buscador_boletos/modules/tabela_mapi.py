@@ -0,0 +1,143 @@
+"""
+Triagem de metadados em lote via Table do Outlook (Folder.GetTable).
+
+Em vez de abrir cada item e ler ``Class``, ``ReceivedTime``, remetente e anexos
+propriedade a propriedade pelo COM, a tabela traz apenas as colunas necessárias
+em blocos (``GetArray``). Somente as linhas que passam pela triagem são abertas
+por EntryID.
+
+``ProvedorTabelaFake`` reproduz a mesma interface (GetTable/Columns/GetArray)
+sobre registros em memória, para rodar e medir a triagem sem Outlook
+(``mail_source.PastaMemoria`` e ``benchmark_triagem.py``).
+"""
+
+from collections import namedtuple
+
+from .config import DOMINIO_REMETENTE_VALIDO
+
+COL_ENTRY_ID = "EntryID"
+COL_RECEBIDO = "ReceivedTime"
+COL_CLASSE = "MessageClass"
+COL_REMETENTE_SMTP = "http://schemas.microsoft.com/mapi/proptag/0x5D01001F"
+COL_REMETENTE = "SenderEmailAddress"
+COL_TEM_ANEXO = "urn:schemas:httpmail:hasattachment"
+COL_MESSAGE_ID = "http://schemas.microsoft.com/mapi/proptag/0x1035001F"  # PR_INTERNET_MESSAGE_ID
+
+COLUNAS = (COL_ENTRY_ID, COL_RECEBIDO, COL_CLASSE, COL_REMETENTE_SMTP, COL_REMETENTE, COL_TEM_ANEXO, COL_MESSAGE_ID)
+TAMANHO_LOTE = 500
+OL_USER_ITEMS = 0
+
+LinhaMetadados = namedtuple("LinhaMetadados", "entry_id recebido_em remetente classe_mensagem tem_anexo message_id")
+
+
+def _remetente_da_linha(smtp, endereco):
+    """Endereço SMTP em minúsculas, ou "" se a tabela só trouxe um endereço Exchange (X.500)."""
+    for valor in (smtp, endereco):
+        valor = str(valor or "").strip().lower()
+        if "@" in valor:
+            return valor
+    return ""
+
+
+def ler_tabela(tabela, tamanho_lote=TAMANHO_LOTE):
+    """
+    Lê as colunas de triagem de uma Table já aberta (Folder.GetTable ou Search.GetTable).
+    Retorna ``(gerador de LinhaMetadados, total de linhas)``.
+    """
+    tabela.Columns.RemoveAll()
+    for coluna in COLUNAS:
+        tabela.Columns.Add(coluna)
+    tabela.Sort(COL_RECEBIDO, True)
+    total = tabela.GetRowCount()
+
+    def gerar():
+        while not tabela.EndOfTable:
+            bloco = tabela.GetArray(tamanho_lote)
+            if not bloco:
+                break
+            for entry_id, recebido, classe, smtp, endereco, tem_anexo, message_id in bloco:
+                if recebido is not None:
+                    recebido = recebido.replace(tzinfo=None)
+                yield LinhaMetadados(str(entry_id), recebido, _remetente_da_linha(smtp, endereco),
+                                     str(classe or ""), bool(tem_anexo), str(message_id or "").strip())
+
+    return gerar(), total
+
+
+def ler_metadados(provedor, filtro, tamanho_lote=TAMANHO_LOTE):
+    """Abre a tabela de ``provedor`` (uma pasta do Outlook ou um fake) restrita por ``filtro``."""
+    return ler_tabela(provedor.GetTable(filtro, OL_USER_ITEMS), tamanho_lote)
+
+
+def triar_linha(linha, dt_inicio, dt_fim, motivos):
+    """Mesmos descartes de ``processar_mensagem``, mas só com as colunas da tabela."""
+    if not linha.classe_mensagem.startswith("IPM.Note"):
+        motivos["nao_mail"] += 1; return False
+    if linha.recebido_em is None or not (dt_inicio <= linha.recebido_em <= dt_fim):
+        motivos["fora_periodo"] += 1; return False
+    # Remetente vazio = endereço Exchange; a resolução fica para o item completo
+    if linha.remetente and not linha.remetente.endswith(DOMINIO_REMETENTE_VALIDO):
+        motivos["remetente"] += 1; return False
+    if not linha.tem_anexo:
+        motivos["sem_anexo_valido"] += 1; return False
+    return True
+
+
+# ---------------- Fake com a mesma interface do Outlook ----------------
+
+class _ColunasFake:
+    def __init__(self):
+        self.nomes = []
+
+    def RemoveAll(self):
+        self.nomes = []
+
+    def Add(self, nome):
+        self.nomes.append(nome)
+
+
+class TabelaFake:
+    def __init__(self, registros):
+        self._registros = list(registros)
+        self._pos = 0
+        self.Columns = _ColunasFake()
+
+    @property
+    def EndOfTable(self):
+        return self._pos >= len(self._registros)
+
+    def GetRowCount(self):
+        return len(self._registros)
+
+    def Sort(self, coluna, decrescente=False):
+        self._registros.sort(key=lambda r: (r.get(coluna) is None, r.get(coluna)), reverse=decrescente)
+
+    def GetArray(self, max_linhas):
+        bloco = self._registros[self._pos:self._pos + max_linhas]
+        self._pos += len(bloco)
+        return tuple(tuple(r.get(c) for c in self.Columns.nomes) for r in bloco)
+
+
+class ProvedorTabelaFake:
+    """Substituto de ``Folder`` para ``ler_metadados``: registros são dicts indexados pelo nome da coluna."""
+
+    def __init__(self, registros):
+        self.registros = list(registros)
+        self.chamadas_get_table = 0
+
+    def GetTable(self, filtro="", tipo=OL_USER_ITEMS):
+        self.chamadas_get_table += 1
+        return TabelaFake(self.registros)
+
+    @staticmethod
+    def registro_de(mensagem, entry_id):
+        """Monta o registro de tabela equivalente a uma ``mail_source.MensagemEmail``."""
+        return {
+            COL_ENTRY_ID: entry_id,
+            COL_RECEBIDO: mensagem.recebido_em,
+            COL_CLASSE: "IPM.Note" if mensagem.eh_email else "IPM.Appointment",
+            COL_REMETENTE_SMTP: mensagem.remetente,
+            COL_REMETENTE: mensagem.remetente,
+            COL_TEM_ANEXO: bool(mensagem.anexos),
+            COL_MESSAGE_ID: mensagem.message_id,
+        }
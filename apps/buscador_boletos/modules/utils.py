@@ -22,4 +22,7 @@ def _to_bytes(x):
 def _iso(dt):
     return dt.strftime("%Y-%m-%dT%H:%M:%S")
 
-def hash_bytes(b): return hashlib.sha256(b).hexdigest()
+def hash_fluxo(f, bloco=1024 * 1024):
+    h = hashlib.sha256()
+    for parte in iter(lambda: f.read(bloco), b""): h.update(parte)
+    return h.hexdigest()